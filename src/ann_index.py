@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Approximate nearest-neighbour index for "See Also" suggestions.
+
+Notes are embedded as hashed TF-IDF vectors: each weighted term (see
+connection_index.note_terms / page_terms) is hashed to one of a fixed number
+of columns with a random sign, so vectors need no shared vocabulary and stay
+comparable across imports. Columns are weighted by an idf over the notes
+indexed so far (taken when a note is added) and rows scaled to unit length.
+
+A random-projection forest finds candidates: each tree splits the notes
+recursively by a hyperplane (the direction between two centroids of the
+node, found by 2-means steps from two random notes, cut at the median
+projection) until the leaves hold about leaf_size notes,
+so notes at a small angle tend to share a leaf in some tree. A query reranks
+the notes of its leaves by exact cosine, which keeps the cost per query
+bounded by the leaf size instead of the index size.
+
+The index (names, float16 vectors, leaf keys, split planes, column document
+frequencies) is saved to an .npz file and updated in place: notes already
+present are re-embedded and new ones appended, both routed down the
+existing trees; the trees are regrown once the index has doubled since they
+were built, so leaves stay small.
+"""
+
+import math
+import zlib
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+import logging
+
+from connection_index import concat_ranges
+
+logger = logging.getLogger(__name__)
+
+ANN_FORMAT_VERSION = 1
+
+DEFAULT_DIMENSIONS = 512
+DEFAULT_TREES = 8
+DEFAULT_LEAF_SIZE = 64
+
+# 2-means steps choosing each split direction
+SPLIT_ITERATIONS = 2
+
+DEFAULT_TOP_K = 5
+DEFAULT_MIN_SIMILARITY = 0.2
+
+# Notes taken from one leaf per query; notes with identical vectors
+# (templates) cannot be split and can fill a leaf far beyond leaf_size
+MAX_LEAF_CANDIDATES = 256
+
+# Queries looked up per block, (query, candidate) pairs reranked at once,
+# and vectors routed down a tree at once
+QUERY_BLOCK_SIZE = 256
+_PAIR_BLOCK = 16384
+_ROUTE_BLOCK = 4096
+
+
+def _hash_term(term: str, dimensions: int) -> Tuple[int, float]:
+    """Column and sign of a term (stable across processes)."""
+    value = zlib.crc32(term.encode('utf-8'))
+    return value % dimensions, (1.0 if value & 0x80000000 else -1.0)
+
+
+class AnnIndex:
+    """Hashed TF-IDF vectors in a random-projection forest, persisted to .npz."""
+
+    def __init__(self, path: Path = None, dimensions: int = DEFAULT_DIMENSIONS,
+                 trees: int = DEFAULT_TREES, leaf_size: int = DEFAULT_LEAF_SIZE, seed: int = 0):
+        """
+        Args:
+            path: .npz file to load from and save to (None keeps the index
+                in memory only); a file built with other parameters is
+                ignored and replaced on save
+            dimensions: Hashed vector columns
+            trees: Trees in the forest (more find more neighbours, at more
+                cost per query)
+            leaf_size: Notes per leaf the trees are grown to
+            seed: Seed of the split choices
+        """
+        self.path = Path(path) if path else None
+        self.dimensions = dimensions
+        self.trees = trees
+        self.leaf_size = max(1, leaf_size)
+        self.seed = seed
+        self.names: List[str] = []
+        self._ids: Dict[str, int] = {}
+        self.vectors = np.zeros((0, dimensions), dtype=np.float16)
+        self.keys = np.zeros((0, trees), dtype=np.uint32)
+        self.df = np.zeros(dimensions, dtype=np.int64)
+        self.num_documents = 0
+        self.depth = 0
+        self.built_size = 0
+        self._planes = np.zeros((trees, 0, dimensions), dtype=np.float16)
+        self._thresholds = np.zeros((trees, 0), dtype=np.float32)
+        self._leaves = None
+        self._query_vectors = None
+        self._dirty = False
+        if self.path:
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._ids
+
+    def _embed(self, term_dicts: Sequence[Dict[str, float]]) -> np.ndarray:
+        """Unit-length hashed TF-IDF rows; counts the rows' columns into df."""
+        rows, cols, values = [], [], []
+        for row, terms in enumerate(term_dicts):
+            for term, weight in terms.items():
+                col, sign = _hash_term(term, self.dimensions)
+                rows.append(row)
+                cols.append(col)
+                values.append(sign * weight)
+        matrix = np.zeros((len(term_dicts), self.dimensions), dtype=np.float32)
+        np.add.at(matrix, (np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)), values)
+
+        self.df += np.count_nonzero(matrix, axis=0)
+        self.num_documents += len(term_dicts)
+        matrix *= (np.log((1 + self.num_documents) / (1 + self.df)) + 1).astype(np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def _grow(self) -> None:
+        """Grow the forest over all notes and recompute every leaf key."""
+        n_docs = len(self.names)
+        self.depth = max(0, math.ceil(math.log2(n_docs / self.leaf_size))) if n_docs else 0
+        self.built_size = n_docs
+        internal = 2 ** self.depth - 1
+        self._planes = np.zeros((self.trees, internal, self.dimensions), dtype=np.float16)
+        self._thresholds = np.zeros((self.trees, internal), dtype=np.float32)
+        rng = np.random.default_rng(self.seed)
+
+        vectors = self.vectors.astype(np.float32)
+
+        for tree in range(self.trees):
+            members = {0: np.arange(n_docs)}
+            for node in range(internal):
+                ids = members.pop(node)
+                node_vectors = vectors[ids]
+                direction = np.zeros(self.dimensions, dtype=np.float32)
+                if len(ids) >= 2:
+                    # A couple of 2-means steps from two random notes: on sparse
+                    # vectors the difference of two notes alone is orthogonal to
+                    # most others, while centroids span the node's vocabulary
+                    first, second = node_vectors[rng.choice(len(ids), 2, replace=False)]
+                    for _ in range(SPLIT_ITERATIONS):
+                        side = node_vectors @ (first - second) > (first @ first - second @ second) / 2
+                        if side.all() or not side.any():
+                            break
+                        first, second = node_vectors[side].mean(axis=0), node_vectors[~side].mean(axis=0)
+                    direction = first - second
+                if not direction.any():
+                    direction = rng.standard_normal(self.dimensions).astype(np.float32)
+                self._planes[tree, node] = direction
+                projections = node_vectors @ self._planes[tree, node].astype(np.float32)
+                threshold = float(np.median(projections)) if len(ids) else 0.0
+                self._thresholds[tree, node] = threshold
+                members[2 * node + 1] = ids[projections <= threshold]
+                members[2 * node + 2] = ids[projections > threshold]
+        self.keys = self._route(self.vectors)
+
+    def _route(self, vectors: np.ndarray) -> np.ndarray:
+        """Leaf of each vector in each tree."""
+        keys = np.zeros((len(vectors), self.trees), dtype=np.uint32)
+        if self.depth == 0:
+            return keys
+        for start in range(0, len(vectors), _ROUTE_BLOCK):
+            block = vectors[start:start + _ROUTE_BLOCK].astype(np.float32)
+            for tree in range(self.trees):
+                node = np.zeros(len(block), dtype=np.int64)
+                for _ in range(self.depth):
+                    projections = np.einsum('ij,ij->i', block, self._planes[tree, node].astype(np.float32))
+                    node = 2 * node + 1 + (projections > self._thresholds[tree, node])
+                keys[start:start + len(block), tree] = node - (2 ** self.depth - 1)
+        return keys
+
+    def update(self, names: Sequence[str], term_dicts: Sequence[Dict[str, float]]) -> None:
+        """
+        Add notes, or re-embed notes already in the index.
+
+        Args:
+            names: Page names (a name given twice keeps its last terms)
+            term_dicts: Weighted terms of each note
+        """
+        if not len(names):
+            return
+        latest = {name: i for i, name in enumerate(names)}
+        names = list(latest)
+        existing = [i for i, name in enumerate(names) if name in self._ids]
+        new = [i for i, name in enumerate(names) if name not in self._ids]
+        existing_ids = [self._ids[names[i]] for i in existing]
+
+        # A re-embedded note's earlier columns leave df before its new ones
+        # are counted, so re-importing the same notes does not shift the idf
+        if existing_ids:
+            self.df -= np.count_nonzero(self.vectors[existing_ids], axis=0)
+            self.num_documents -= len(existing_ids)
+        vectors = self._embed([term_dicts[i] for i in latest.values()]).astype(np.float16)
+        if existing:
+            self.vectors[existing_ids] = vectors[existing]
+        for i in new:
+            self._ids[names[i]] = len(self.names)
+            self.names.append(names[i])
+        self.vectors = np.concatenate([self.vectors, vectors[new]])
+
+        if len(self.names) > 2 * self.built_size:
+            self._grow()
+        else:
+            if existing:
+                self.keys[existing_ids] = self._route(vectors[existing])
+            self.keys = np.concatenate([self.keys, self._route(vectors[new])])
+        self._leaves = None
+        self._dirty = True
+
+    def _lookup(self) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Per tree, note ids sorted by leaf and the sorted leaf keys; also
+        keeps a float32 copy of the vectors for reranking.
+        """
+        if self._leaves is None:
+            self._leaves = []
+            for tree in range(self.trees):
+                order = np.argsort(self.keys[:, tree], kind='stable')
+                self._leaves.append((order, self.keys[order, tree]))
+            self._query_vectors = self.vectors.astype(np.float32)
+        return self._leaves
+
+    def query(self, names: Sequence[str], top_k: int = DEFAULT_TOP_K,
+              min_similarity: float = DEFAULT_MIN_SIMILARITY) -> List[List[Tuple[str, float]]]:
+        """
+        Approximate most similar notes of notes in the index.
+
+        Args:
+            names: Notes to find neighbours for (unknown names get none)
+            top_k: Neighbours kept per note
+            min_similarity: Minimum cosine similarity
+
+        Returns:
+            Per name, (page name, similarity) pairs, best first
+        """
+        results = [[] for _ in names]
+        known = [(i, self._ids[name]) for i, name in enumerate(names) if name in self._ids]
+        leaves = self._lookup()
+        n_docs = len(self.names)
+
+        for first in range(0, len(known), QUERY_BLOCK_SIZE):
+            positions, block = zip(*known[first:first + QUERY_BLOCK_SIZE])
+            block = np.asarray(block, dtype=np.int64)
+
+            # Candidates: the notes sharing a leaf in any tree
+            queries, candidates = [], []
+            for tree, (order, sorted_keys) in enumerate(leaves):
+                keys = self.keys[block, tree]
+                starts = np.searchsorted(sorted_keys, keys, side='left')
+                lengths = np.minimum(np.searchsorted(sorted_keys, keys, side='right') - starts,
+                                     MAX_LEAF_CANDIDATES)
+                queries.append(np.repeat(np.arange(len(block)), lengths))
+                candidates.append(order[concat_ranges(starts, lengths)])
+            pairs = np.unique(np.concatenate(queries) * n_docs + np.concatenate(candidates))
+            query, candidate = pairs // n_docs, pairs % n_docs
+            keep = candidate != block[query]
+            query, candidate = query[keep], candidate[keep]
+
+            # Exact cosine of the candidates
+            scores = np.empty(len(query), dtype=np.float32)
+            for start in range(0, len(query), _PAIR_BLOCK):
+                end = start + _PAIR_BLOCK
+                scores[start:end] = np.einsum('ij,ij->i', self._query_vectors[block[query[start:end]]],
+                                              self._query_vectors[candidate[start:end]])
+
+            keep = scores >= min_similarity
+            query, candidate, scores = query[keep], candidate[keep], scores[keep]
+            order = np.lexsort((candidate, -scores, query))
+            query, candidate, scores = query[order], candidate[order], scores[order]
+            keep = np.arange(len(query)) - np.searchsorted(query, query) < top_k
+            for q, c, s in zip(query[keep], candidate[keep], scores[keep]):
+                results[positions[q]].append((self.names[c], float(s)))
+        return results
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                params = tuple(int(value) for value in data['params'])
+                if params != (ANN_FORMAT_VERSION, self.dimensions, self.trees, self.leaf_size, self.seed):
+                    logger.info(f"ANN index {self.path} was built with other parameters; rebuilding")
+                    return
+                names = [str(name) for name in data['names']]
+                vectors, keys, df = data['vectors'], data['keys'], data['df']
+                planes, thresholds = data['planes'], data['thresholds']
+                num_documents, depth, built_size = (int(value) for value in data['sizes'])
+        except Exception as e:
+            logger.warning(f"Could not read ANN index {self.path}: {str(e)}")
+            return
+        self.names, self.vectors, self.keys, self.df = names, vectors, keys, df
+        self._planes, self._thresholds = planes, thresholds
+        self.num_documents, self.depth, self.built_size = num_documents, depth, built_size
+        self._ids = {name: i for i, name in enumerate(self.names)}
+
+    def save(self) -> bool:
+        """
+        Write the index back if it changed.
+
+        Returns:
+            True if the file was written
+        """
+        if not self.path or not self._dirty:
+            return False
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, params=np.array([ANN_FORMAT_VERSION, self.dimensions, self.trees,
+                                         self.leaf_size, self.seed]),
+                     names=np.array(self.names, dtype=str), vectors=self.vectors, keys=self.keys,
+                     df=self.df, planes=self._planes, thresholds=self._thresholds,
+                     sizes=np.array([self.num_documents, self.depth, self.built_size]))
+        tmp_path.replace(self.path)
+        self._dirty = False
+        logger.info(f"ANN index saved: {len(self.names)} notes")
+        return True
+
+
+if __name__ == '__main__':
+    import random
+    import tempfile
+    import time
+
+    # Notes drawn from topics; neighbours should come from the same topic
+    rng = random.Random(3)
+    topics = [[f"t{topic}w{word}" for word in range(30)] for topic in range(500)]
+    common = [f"common{i}" for i in range(40)]
+
+    def note(topic):
+        terms = {word: 1.0 for word in rng.sample(topics[topic], 8) + rng.sample(common, 3)}
+        terms[topics[topic][0]] = 2.0
+        return terms
+
+    labels = [rng.randrange(len(topics)) for _ in range(20000)]
+    notes = [note(topic) for topic in labels]
+    names = [f"note{i}" for i in range(len(notes))]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'ann.npz'
+        start = time.perf_counter()
+        index = AnnIndex(path)
+        index.update(names[:15000], notes[:15000])
+        assert index.save() and not index.save()
+
+        # Incremental: reload, add the rest (routed, not regrown), re-embed one note
+        index = AnnIndex(path)
+        assert len(index) == 15000 and index.built_size == 15000
+        index.update(names[15000:] + ['note0'], notes[15000:] + [notes[0]])
+        assert len(index) == 20000 and index.built_size == 15000 and index.save()
+        assert index.num_documents == len(index)
+        built = time.perf_counter() - start
+
+        # Re-importing the same notes leaves the idf, and so the neighbours, as they were
+        repeat = AnnIndex()
+        repeat.update(names[:2000], notes[:2000])
+        before = repeat.query(names[:200])
+        for _ in range(3):
+            repeat.update(names[:2000], notes[:2000])
+        assert repeat.num_documents == 2000 and repeat.query(names[:200]) == before
+
+        index = AnnIndex(path)
+        sample = rng.sample(range(len(names)), 1000)
+        start = time.perf_counter()
+        found = index.query([names[i] for i in sample], top_k=5, min_similarity=0.0)
+        elapsed = time.perf_counter() - start
+
+    # Recall against exact cosine on the same vectors
+    vectors = index.vectors.astype(np.float32)
+    hits = same_topic = 0
+    for i, neighbours in zip(sample, found):
+        similarity = vectors @ vectors[i]
+        similarity[i] = -1
+        exact = set(np.argsort(-similarity)[:5])
+        hits += len(exact & {index._ids[name] for name, _ in neighbours})
+        same_topic += bool(neighbours) and labels[index._ids[neighbours[0][0]]] == labels[i]
+    recall = hits / (5 * len(sample))
+    assert recall > 0.8, recall
+    assert index.query(['missing']) == [[]]
+    print(f"ann index: ok (recall@5 {recall:.2f}, top-1 same topic {same_topic / len(sample):.2f})")
+    print(f"20000 notes: build+save {built:.1f}s, 1000 queries {elapsed:.2f}s")
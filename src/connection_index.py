@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""
+Layer 3 connection candidates from an inverted index.
+
+Every note of the batch and every page of the existing Logseq graph becomes
+a weighted bag of terms: title words (weighted up), Stage 3 keywords and
+technical terms for batch notes, the most frequent keyword tokens for graph
+pages. The index keeps term -> notes postings as CSR arrays. Scoring a block
+of notes gathers the postings of their terms, sums idf-weighted products per
+(note, candidate) pair and normalises them to a cosine, so the work follows
+the postings actually shared instead of comparing every pair of notes.
+Terms found in more than a small share of all notes are left out of the
+postings: they link everything to everything and dominate the cost.
+
+A related candidate becomes a prerequisite when it is more general (its
+domain is an ancestor of the note's domain, or it sits at a lower level in
+the same domain), an enabled topic when it is more specific, and otherwise
+a See Also suggestion.
+
+Used by Stage 4 (detect_layer3_connections).
+"""
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from collections import Counter
+import numpy as np
+import logging
+
+from keyword_scoring import keyword_tokens
+from layer2_results import join_list, split_list
+from tokenizer import tokenize
+
+logger = logging.getLogger(__name__)
+
+# Title words say most about what a note is about
+TITLE_WEIGHT = 2.0
+
+# Keyword tokens kept per graph page (pages carry no Stage 3 keywords)
+MAX_PAGE_TERMS = 30
+
+# Terms in more than this share of notes (but at least MIN_POSTINGS_CAP
+# notes) are not indexed
+DEFAULT_MAX_DOCUMENT_SHARE = 0.05
+MIN_POSTINGS_CAP = 50
+
+DEFAULT_TOP_K = 3
+DEFAULT_MIN_SCORE = 0.15
+
+# Best candidate score from which a note's connections count as confident
+HIGH_CONFIDENCE_SCORE = 0.35
+
+# Notes scored per block; bounds the gathered postings held at once
+QUERY_BLOCK_SIZE = 256
+
+# Proficiency and activity levels, from general to specific
+LEVEL_RANK = {
+    'novice': 0, 'beginner': 1, 'intermediate': 2, 'competent': 3,
+    'advanced': 3, 'expert': 4,
+}
+
+
+def page_name(file_name: str) -> str:
+    """Logseq page name of a page file ('a___b.md' is page 'a/b')."""
+    return Path(file_name).stem.replace('___', '/').replace('%2F', '/')
+
+
+def tag_features(tags: Iterable[str]) -> Tuple[str, Optional[int]]:
+    """
+    Domain path and level of a note from its tags.
+
+    Returns:
+        (domain path without '#domain/', or '', level rank or None); the
+        proficiency level wins over the activity level
+    """
+    domain, levels = '', {}
+    for tag in tags:
+        dimension, _, rest = tag.lstrip('#').partition('/')
+        if dimension == 'domain' and rest and not domain:
+            domain = rest.split('::', 1)[0].strip('/')
+        elif dimension in ('proficiency', 'activity') and '::' in rest:
+            rank = LEVEL_RANK.get(rest.rsplit('::', 1)[1])
+            if rank is not None:
+                levels.setdefault(dimension, rank)
+    return domain, levels.get('proficiency', levels.get('activity'))
+
+
+def note_terms(title: str, keywords: Iterable[str] = (),
+               technical_terms: Iterable[str] = ()) -> Dict[str, float]:
+    """Weighted terms of a batch note from its Stage 3 keywords."""
+    terms = {term.lower(): 1.0 for term in list(keywords) + list(technical_terms) if term}
+    for token in keyword_tokens(title or ''):
+        terms[token] = TITLE_WEIGHT
+    return terms
+
+
+def page_terms(name: str, content: str) -> Dict[str, float]:
+    """Weighted terms of a page read from disk (no Stage 3 keywords)."""
+    counts = Counter(keyword_tokens(content))
+    return note_terms(name.replace('/', ' '), [term for term, _ in counts.most_common(MAX_PAGE_TERMS)])
+
+
+@dataclass
+class NoteConnections:
+    """Task 4.1 output for one note: linked page names per section."""
+
+    file_name: str
+    prerequisites: List[str] = field(default_factory=list)
+    enables: List[str] = field(default_factory=list)
+    see_also: List[str] = field(default_factory=list)
+    confidence: str = 'low'
+
+    def count(self) -> int:
+        return len(self.prerequisites) + len(self.enables) + len(self.see_also)
+
+    def to_row(self) -> Dict:
+        """Report row for layer3-candidates.csv."""
+        return {
+            'file_name': self.file_name,
+            'potential_prerequisites': join_list(self.prerequisites),
+            'potential_enables': join_list(self.enables),
+            'potential_project_connections': '',
+            'potential_goal_connections': '',
+            'potential_see_also': join_list(self.see_also),
+            'confidence': self.confidence,
+        }
+
+    @classmethod
+    def from_row(cls, row: Dict) -> 'NoteConnections':
+        """Read a layer3-candidates.csv row back."""
+        return cls(
+            file_name=row['file_name'],
+            prerequisites=split_list(row.get('potential_prerequisites')),
+            enables=split_list(row.get('potential_enables')),
+            see_also=split_list(row.get('potential_see_also')),
+            confidence=row.get('confidence') if isinstance(row.get('confidence'), str) else 'low',
+        )
+
+
+def concat_ranges(starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Concatenation of arange(start, start + length) for every pair."""
+    ends = np.cumsum(lengths)
+    return np.repeat(starts - ends + lengths, lengths) + np.arange(ends[-1] if len(ends) else 0)
+
+
+class ConnectionIndex:
+    """Inverted index of weighted note terms, scored in blocks."""
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.domains: List[str] = []
+        self.levels: List[Optional[int]] = []
+        self._ids: Dict[str, int] = {}
+        self._vocabulary: Dict[str, int] = {}
+        self._doc_ids: List[int] = []
+        self._term_ids: List[int] = []
+        self._weights: List[float] = []
+        self._built = False
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return name.lower() in self._ids
+
+    def add(self, name: str, terms: Dict[str, float], domain: str = '',
+            level: int = None) -> int:
+        """
+        Add a note or page; a page name already in the index is kept once.
+
+        Returns:
+            Document id
+        """
+        key = name.lower()
+        if key in self._ids:
+            return self._ids[key]
+        doc = len(self.names)
+        self._ids[key] = doc
+        self.names.append(name)
+        self.domains.append(domain)
+        self.levels.append(level)
+        for term, weight in terms.items():
+            self._doc_ids.append(doc)
+            self._term_ids.append(self._vocabulary.setdefault(term, len(self._vocabulary)))
+            self._weights.append(weight)
+        self._built = False
+        return doc
+
+    def doc_id(self, name: str) -> Optional[int]:
+        return self._ids.get(name.lower())
+
+    def build(self, max_document_share: float = DEFAULT_MAX_DOCUMENT_SHARE) -> None:
+        """Compute idf weights and the CSR postings (called by related())."""
+        docs = np.asarray(self._doc_ids, dtype=np.int64)
+        terms = np.asarray(self._term_ids, dtype=np.int64)
+        n_docs, n_terms = len(self.names), len(self._vocabulary)
+
+        df = np.bincount(terms, minlength=n_terms)
+        idf = np.log((1 + n_docs) / (1 + df)) + 1
+        values = np.asarray(self._weights, dtype=np.float64) * idf[terms]
+        self._norms = np.sqrt(np.bincount(docs, weights=values ** 2, minlength=n_docs))
+        self._norms[self._norms == 0] = 1.0
+
+        # A term shared by one note links nothing; one in most notes links everything
+        cap = max(MIN_POSTINGS_CAP, int(max_document_share * n_docs))
+        indexed = (df[terms] >= 2) & (df[terms] <= cap)
+        docs, terms, values = docs[indexed], terms[indexed], values[indexed]
+
+        by_term = np.argsort(terms, kind='stable')
+        self._post_ptr = np.concatenate(([0], np.cumsum(np.bincount(terms, minlength=n_terms))))
+        self._post_docs = docs[by_term]
+        self._post_values = values[by_term]
+
+        by_doc = np.argsort(docs, kind='stable')
+        self._doc_ptr = np.concatenate(([0], np.cumsum(np.bincount(docs, minlength=n_docs))))
+        self._doc_terms = terms[by_doc]
+        self._doc_values = values[by_doc]
+        self._built = True
+
+    def related(self, doc_ids: List[int], top_k: int = DEFAULT_TOP_K,
+                min_score: float = DEFAULT_MIN_SCORE,
+                max_document_share: float = DEFAULT_MAX_DOCUMENT_SHARE) -> List[List[Tuple[int, float]]]:
+        """
+        Most similar other documents of each given document.
+
+        Args:
+            doc_ids: Documents to find candidates for
+            top_k: Candidates kept per document
+            min_score: Minimum cosine similarity
+            max_document_share: Indexing cutoff for common terms
+
+        Returns:
+            Per document, (document id, score) pairs, best first
+        """
+        if not self._built:
+            self.build(max_document_share)
+        n_docs = len(self.names)
+        results = []
+        for first in range(0, len(doc_ids), QUERY_BLOCK_SIZE):
+            block = np.asarray(doc_ids[first:first + QUERY_BLOCK_SIZE], dtype=np.int64)
+            results.extend([] for _ in block)
+            if not len(block) or not len(self._post_docs):
+                continue
+
+            # Terms of the block's documents...
+            starts, lengths = self._doc_ptr[block], self._doc_ptr[block + 1] - self._doc_ptr[block]
+            entries = concat_ranges(starts, lengths)
+            if not len(entries):
+                continue
+            queries = np.repeat(np.arange(len(block)), lengths)
+            terms, query_values = self._doc_terms[entries], self._doc_values[entries]
+
+            # ...joined with the postings of those terms
+            post_starts = self._post_ptr[terms]
+            post_lengths = self._post_ptr[terms + 1] - post_starts
+            postings = concat_ranges(post_starts, post_lengths)
+            owner = np.repeat(np.arange(len(terms)), post_lengths)
+            pairs = queries[owner] * n_docs + self._post_docs[postings]
+            products = query_values[owner] * self._post_values[postings]
+
+            pairs, inverse = np.unique(pairs, return_inverse=True)
+            scores = np.bincount(inverse.ravel(), weights=products)
+            query, candidate = pairs // n_docs, pairs % n_docs
+            scores /= self._norms[block][query] * self._norms[candidate]
+
+            keep = (candidate != block[query]) & (scores >= min_score)
+            query, candidate, scores = query[keep], candidate[keep], scores[keep]
+            order = np.lexsort((candidate, -scores, query))
+            query, candidate, scores = query[order], candidate[order], scores[order]
+            rank = np.arange(len(query)) - np.searchsorted(query, query)
+            keep = rank < top_k
+            for q, c, s in zip(query[keep], candidate[keep], scores[keep]):
+                results[first + q].append((int(c), float(s)))
+        return results
+
+    def relation(self, doc: int, other: int) -> str:
+        """'prerequisite', 'enables' or 'see_also': how other relates to doc."""
+        domain, other_domain = self.domains[doc], self.domains[other]
+        if domain and other_domain and domain != other_domain:
+            if domain.startswith(other_domain + '/'):
+                return 'prerequisite'
+            if other_domain.startswith(domain + '/'):
+                return 'enables'
+            return 'see_also'
+        level, other_level = self.levels[doc], self.levels[other]
+        if level is not None and other_level is not None and level != other_level:
+            return 'prerequisite' if other_level < level else 'enables'
+        return 'see_also'
+
+    def connections(self, file_names: List[str], top_k: int = DEFAULT_TOP_K,
+                    min_score: float = DEFAULT_MIN_SCORE,
+                    max_document_share: float = DEFAULT_MAX_DOCUMENT_SHARE) -> List[NoteConnections]:
+        """
+        Layer 3 candidates of batch notes (added under page_name(file_name)).
+
+        Args:
+            file_names: Batch files to find connections for
+            top_k: Candidates per section
+            min_score: Minimum cosine similarity of a candidate
+
+        Returns:
+            NoteConnections per file, in input order
+        """
+        doc_ids = [self.doc_id(page_name(file_name)) for file_name in file_names]
+        present = [doc for doc in doc_ids if doc is not None]
+        ranked = iter(self.related(present, top_k * 3, min_score, max_document_share))
+
+        results = []
+        for file_name, doc in zip(file_names, doc_ids):
+            connections = NoteConnections(file_name=file_name)
+            candidates = next(ranked) if doc is not None else []
+            for other, score in candidates:
+                section = getattr(connections, {'prerequisite': 'prerequisites', 'enables': 'enables',
+                                                 'see_also': 'see_also'}[self.relation(doc, other)])
+                if len(section) < top_k:
+                    section.append(self.names[other])
+            if candidates:
+                connections.confidence = 'high' if candidates[0][1] >= HIGH_CONFIDENCE_SCORE else 'medium'
+            results.append(connections)
+        return results
+
+
+def iter_graph_pages(graph_pages: str, skip=()) -> Iterator[Tuple[str, Dict[str, float], str, Optional[int]]]:
+    """
+    (page name, weighted terms, domain, level) of every page of an existing
+    Logseq graph.
+
+    Args:
+        graph_pages: Pages directory of the graph
+        skip: Page names not to read (e.g. already indexed)
+    """
+    pages_dir = Path(graph_pages).expanduser() if graph_pages else None
+    if pages_dir is None or not pages_dir.is_dir():
+        logger.warning(f"Connection index: graph pages not found: {graph_pages}")
+        return
+    for page in sorted(pages_dir.glob('*.md')):
+        name = page_name(page.name)
+        if name in skip:
+            continue
+        try:
+            content = page.read_text(encoding='utf-8')
+        except (OSError, UnicodeDecodeError) as e:
+            logger.warning(f"Connection index: skipping {page.name}: {str(e)}")
+            continue
+        domain, level = tag_features(tag for tag, _, _, _ in tokenize(content).tags)
+        yield name, page_terms(name, content), domain, level
+
+
+if __name__ == '__main__':
+    import random
+    import time
+
+    index = ConnectionIndex()
+    index.add('Networking basics', note_terms('Networking basics', ['packet', 'router', 'subnet']),
+              'networking', LEVEL_RANK['beginner'])
+    index.add('Firewalls', note_terms('Firewalls', ['packet', 'iptables', 'ruleset', 'router']),
+              'networking/firewalls', LEVEL_RANK['beginner'])
+    index.add('Advanced iptables', note_terms('Advanced iptables', ['iptables', 'ruleset', 'netfilter']),
+              'networking/firewalls', LEVEL_RANK['expert'])
+    index.add('Firewall lab', note_terms('Firewall lab', ['iptables', 'ruleset', 'packet']),
+              'networking/firewalls', None)
+    index.add('Baking bread', note_terms('Baking bread', ['flour', 'yeast']), 'cooking', None)
+    firewalls, = index.connections(['Firewalls.md'], min_score=0.05)
+    assert firewalls.prerequisites == ['Networking basics'], firewalls
+    assert firewalls.enables == ['Advanced iptables'], firewalls
+    assert firewalls.see_also == ['Firewall lab'], firewalls
+    assert NoteConnections.from_row(firewalls.to_row()) == firewalls
+    assert index.connections(['Baking bread.md'])[0].count() == 0
+
+    # Brute-force cosine on a small random corpus
+    rng = random.Random(5)
+    vocabulary = [f"term{i}" for i in range(300)]
+    index = ConnectionIndex()
+    for i in range(400):
+        index.add(f"note{i}", {term: rng.choice([1.0, 2.0]) for term in rng.sample(vocabulary, 12)})
+    index.build(max_document_share=1.0)
+    dense = np.zeros((len(index), len(index._vocabulary)))
+    np.add.at(dense, (np.asarray(index._doc_ids), np.asarray(index._term_ids)),
+              np.asarray(index._weights) * (np.log((1 + len(index)) / (1 + np.bincount(index._term_ids))) + 1)[index._term_ids])
+    dense /= np.linalg.norm(dense, axis=1, keepdims=True)
+    similarity = dense @ dense.T
+    np.fill_diagonal(similarity, -1)
+    for doc, found in enumerate(index.related(list(range(len(index))), top_k=3, min_score=0.0,
+                                              max_document_share=1.0)):
+        expected = np.sort(similarity[doc])[::-1][:3]
+        assert np.allclose([score for _, score in found], expected), doc
+    print("connection index: ok")
+
+    # 50k notes drawn from topics with Zipf-like vocabulary
+    topics = [[f"t{topic}w{word}" for word in range(40)] for topic in range(2000)]
+    common = [f"common{i}" for i in range(50)]
+    start = time.perf_counter()
+    index = ConnectionIndex()
+    for i in range(50000):
+        topic = topics[rng.randrange(len(topics))]
+        terms = {word: 1.0 for word in rng.sample(topic, 8) + rng.sample(common, 3)}
+        index.add(f"note{i}", terms, domain=f"d{i % 20}", level=rng.randrange(4))
+    results = index.connections([f"note{i}.md" for i in range(50000)])
+    elapsed = time.perf_counter() - start
+    linked = sum(1 for connections in results if connections.count())
+    print(f"50000 notes: {elapsed:.1f}s, {linked} with candidates")
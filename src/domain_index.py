@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Domain inference from keywords through a taxonomy trie.
+
+Domains form a taxonomy, #domain/{primary}/{secondary}/{tertiary}. Its nodes
+and their rules are compiled once per source type:
+
+- schemas/tag-schema.json, dimensions.domain.keywords: domain path
+  ('cybersecurity/network-security') -> words that point to it (weight 1
+  each); every segment name ('network-security', 'firewalls') is a word
+  for its own node too
+- the source type's domain_mappings CSV (pattern,domain_tag[,weight]):
+  phrases matched as whole words in the note title (default weight 3, so
+  explicit mappings outrank inferred ones)
+
+An inverted index maps each word straight to the taxonomy nodes it points
+to, at any depth, so a document's keywords, title and heading words are
+matched against every level in a single pass, with a constant number of
+hash lookups per token however large the taxonomy grows (exactly or by
+prefix, so 'virtual' also catches 'virtualization'). Node scores are
+accumulated for whole batches of documents with NumPy and propagated from
+children to ancestors; each document then descends from the root into the
+best child while that child is a confident choice, giving the deepest
+supported path (cybersecurity/network-security/firewalls).
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+import logging
+
+from term_matcher import TermMatcher
+from tokenizer import WORD_PATTERN
+
+logger = logging.getLogger(__name__)
+
+KEYWORD_WEIGHT = 1.0
+MAPPING_WEIGHT = 3.0
+
+# Index terms shorter than this ('ip', 'os', 'vm') only match whole keywords
+MIN_PREFIX_LENGTH = 4
+
+# Descending below the top level needs a child with at least this score,
+# holding at least this share of its parent's score, and no tied sibling
+MIN_SUBDOMAIN_SCORE = 1.0
+MIN_SUBDOMAIN_SHARE = 0.3
+
+# Documents scored per dense (documents x nodes) block
+SCORE_BATCH_SIZE = 1024
+
+
+def domain_from_tag(tag: str) -> str:
+    """'#domain/cybersecurity/network-security' -> 'cybersecurity/network-security'."""
+    tag = tag.strip().lstrip('#')
+    return tag[len('domain/'):] if tag.startswith('domain/') else tag
+
+
+def load_domain_mappings(mapping) -> List[Tuple[str, str, float]]:
+    """
+    Read source-specific domain rules.
+
+    Args:
+        mapping: Path to a CSV whose first column is the pattern and which
+            has a 'domain_tag' column (else the second column) and an
+            optional 'weight' column; or a dict of pattern -> domain tag
+
+    Returns:
+        List of (pattern, domain, weight)
+    """
+    if not mapping:
+        return []
+    if isinstance(mapping, dict):
+        return [(pattern, domain_from_tag(tag), MAPPING_WEIGHT) for pattern, tag in mapping.items()]
+
+    path = Path(mapping)
+    if not path.exists():
+        logger.warning(f"Domain mapping not found: {path}")
+        return []
+
+    df = pd.read_csv(path, dtype=str).dropna(how='all')
+    pattern_col = df.columns[0]
+    tag_col = 'domain_tag' if 'domain_tag' in df.columns else df.columns[1]
+    weights = (pd.to_numeric(df['weight'], errors='coerce').fillna(MAPPING_WEIGHT)
+               if 'weight' in df.columns else pd.Series(MAPPING_WEIGHT, index=df.index))
+
+    return [
+        (pattern.strip(), domain_from_tag(tag), float(weight))
+        for pattern, tag, weight in zip(df[pattern_col], df[tag_col], weights)
+        if isinstance(pattern, str) and isinstance(tag, str) and pattern.strip()
+    ]
+
+
+class TaxonomyNode:
+    """One domain of the taxonomy; the root has an empty path."""
+
+    __slots__ = ('path', 'parent', 'depth', 'children')
+
+    def __init__(self, path: str, parent: Optional[int], depth: int):
+        self.path = path
+        self.parent = parent
+        self.depth = depth
+        # Segment name -> node id
+        self.children: Dict[str, int] = {}
+
+
+class DomainIndex:
+    """Domain taxonomy trie with a compiled keyword -> weighted nodes index."""
+
+    def __init__(self, domain_keywords: Dict[str, List[str]],
+                 title_rules: Iterable[Tuple[str, str, float]] = ()):
+        """
+        Args:
+            domain_keywords: Domain path -> keywords pointing to it
+            title_rules: (phrase, domain path, weight) matched against titles
+        """
+        title_rules = list(title_rules)
+        self.nodes: List[TaxonomyNode] = [TaxonomyNode('', None, 0)]
+        for domain in list(domain_keywords) + [domain for _, domain, _ in title_rules]:
+            self._insert(domain)
+
+        # Inverted index: term -> (node, weight) entries, in CSR layout
+        postings: Dict[str, Dict[int, float]] = {}
+
+        def post(term: str, node_id: int, weight: float) -> None:
+            entries = postings.setdefault(term.lower(), {})
+            entries[node_id] = max(entries.get(node_id, 0.0), weight)
+
+        for node_id, node in enumerate(self.nodes[1:], 1):
+            segment = node.path.rsplit('/', 1)[-1].lower()
+            post(segment, node_id, KEYWORD_WEIGHT)
+            if segment.endswith('s') and len(segment) > MIN_PREFIX_LENGTH:
+                post(segment[:-1], node_id, KEYWORD_WEIGHT)
+        for domain, keywords in domain_keywords.items():
+            node_id = self._insert(domain)
+            for keyword in keywords:
+                post(keyword, node_id, KEYWORD_WEIGHT)
+
+        self._rows: Dict[str, int] = {term: row for row, term in enumerate(postings)}
+        lengths = [len(entries) for entries in postings.values()]
+        self._row_ptr = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+        self._row_nodes = np.fromiter((n for entries in postings.values() for n in entries),
+                                      dtype=np.int32, count=int(self._row_ptr[-1]))
+        self._row_weights = np.fromiter((w for entries in postings.values() for w in entries.values()),
+                                        dtype=np.float32, count=int(self._row_ptr[-1]))
+        self._max_term_length = max((len(term) for term in self._rows), default=0)
+
+        # Title phrases -> (node, weight)
+        self._title_rules: Dict[str, List[Tuple[int, float]]] = {}
+        for phrase, domain, weight in title_rules:
+            self._title_rules.setdefault(phrase.lower(), []).append((self._insert(domain), weight))
+        self._title_matcher = TermMatcher(self._title_rules)
+
+        # Propagation order (deepest level first) and child arrays for the descent
+        self._parents = np.array([node.parent or 0 for node in self.nodes], dtype=np.int32)
+        depths = np.array([node.depth for node in self.nodes])
+        self._levels = [np.flatnonzero(depths == depth) for depth in range(int(depths.max()), 0, -1)]
+        self._children = [np.fromiter(node.children.values(), dtype=np.int32, count=len(node.children))
+                          for node in self.nodes]
+
+    @property
+    def domains(self) -> List[str]:
+        """Every domain path of the taxonomy, parents before children."""
+        return [node.path for node in self.nodes[1:]]
+
+    def _insert(self, domain: str) -> int:
+        """Node id for a domain path, creating it and missing ancestors."""
+        node_id = 0
+        for segment in domain_from_tag(domain).strip('/').split('/'):
+            segment = segment.strip()
+            if not segment:
+                continue
+            node = self.nodes[node_id]
+            child = node.children.get(segment)
+            if child is None:
+                child = len(self.nodes)
+                path = f"{node.path}/{segment}" if node.path else segment
+                self.nodes.append(TaxonomyNode(path, node_id, node.depth + 1))
+                node.children[segment] = child
+            node_id = child
+        return node_id
+
+    @classmethod
+    def from_sources(cls, tag_schema: Dict = None, mapping=None) -> 'DomainIndex':
+        """Build from a loaded tag schema and a domain_mappings entry."""
+        domain_keywords = ((tag_schema or {}).get('dimensions', {})
+                           .get('domain', {}).get('keywords', {}))
+        return cls(domain_keywords, load_domain_mappings(mapping))
+
+    def _lookup(self, token: str) -> List[int]:
+        """Rows of index terms equal to token or (if long enough) a prefix of it."""
+        rows = []
+        row = self._rows.get(token)
+        if row is not None:
+            rows.append(row)
+        for length in range(MIN_PREFIX_LENGTH, min(len(token), self._max_term_length + 1)):
+            row = self._rows.get(token[:length])
+            if row is not None:
+                rows.append(row)
+        return rows
+
+    def score_batch(self, documents: Sequence[Tuple]) -> np.ndarray:
+        """
+        Score many documents at once.
+
+        Args:
+            documents: (keywords, title) or (keywords, title, headings) per
+                document
+
+        Returns:
+            Array of shape (documents, nodes): summed weights of each node
+            and its descendants (column 0 is the root)
+        """
+        doc_ids = []
+        rows = []
+        scores = np.zeros((len(documents), len(self.nodes)), dtype=np.float32)
+
+        for doc_id, document in enumerate(documents):
+            keywords, title = document[0], document[1] or ''
+            headings = document[2] if len(document) > 2 else ()
+            tokens = {keyword.lower() for keyword in keywords if keyword}
+            for text in (title, *headings):
+                tokens.update(WORD_PATTERN.findall(text.lower()))
+            for token in tokens:
+                for row in self._lookup(token):
+                    doc_ids.append(doc_id)
+                    rows.append(row)
+
+            for phrase in self._title_matcher.count(title):
+                for node_id, weight in self._title_rules[phrase]:
+                    scores[doc_id, node_id] += weight
+
+        if rows:
+            rows = np.asarray(rows)
+            starts = self._row_ptr[rows]
+            lengths = self._row_ptr[rows + 1] - starts
+            offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+            entries = np.repeat(starts - offsets, lengths) + np.arange(lengths.sum())
+            np.add.at(scores, (np.repeat(np.asarray(doc_ids), lengths), self._row_nodes[entries]),
+                      self._row_weights[entries])
+
+        # Children feed their ancestors, one taxonomy level at a time
+        by_node = scores.T
+        for level in self._levels:
+            np.add.at(by_node, self._parents[level], by_node[level])
+        return scores
+
+    def _descend(self, scores: np.ndarray) -> Optional[str]:
+        """Deepest confident path for one document's node scores."""
+        node_id = 0
+        while len(self._children[node_id]):
+            children = self._children[node_id]
+            child_scores = scores[children]
+            best = int(child_scores.argmax())
+            score = child_scores[best]
+            if node_id == 0:
+                # A top-level domain is picked whenever anything matched
+                if score <= 0:
+                    break
+            elif (score < MIN_SUBDOMAIN_SCORE or score < MIN_SUBDOMAIN_SHARE * scores[node_id]
+                  or np.count_nonzero(child_scores == score) > 1):
+                break
+            node_id = int(children[best])
+        return self.nodes[node_id].path or None
+
+    def best_domains(self, documents: Sequence[Tuple],
+                     batch_size: int = SCORE_BATCH_SIZE) -> List[Optional[str]]:
+        """Deepest confident domain path per document (None when nothing matched)."""
+        results: List[Optional[str]] = []
+        for first in range(0, len(documents), max(1, batch_size)):
+            scores = self.score_batch(documents[first:first + batch_size])
+            results.extend(self._descend(row) for row in scores)
+        return results
+
+
+if __name__ == '__main__':
+    import random
+    import time
+
+    schema_path = Path(__file__).parent / 'schemas' / 'tag-schema.json'
+    with open(schema_path, 'r') as f:
+        schema = json.load(f)
+    index = DomainIndex.from_sources(schema, {'Course 3': '#domain/cybersecurity'})
+    found = index.best_domains([
+        (['virtualization', 'hypervisor'], 'Intro to VMs'),
+        (['router', 'subnet'], 'Routing'),
+        (['misc'], 'Course 3 Recap'),
+        ([], 'Nothing here'),
+        (['iptables', 'rules'], 'Firewall Basics', ['Configuring a firewall', 'Network security zones']),
+        (['security', 'threat', 'attack'], 'Security Overview', ['Firewalls']),
+    ])
+    print(found)
+    assert found == ['virtualization', 'networking/routing', 'cybersecurity', None,
+                     'cybersecurity/network-security/firewalls', 'cybersecurity']
+
+    # A taxonomy of thousands of nodes keeps per-document cost flat
+    rng = random.Random(5)
+    words = [''.join(rng.choice('abcdefghijklmnop') for _ in range(7)) for _ in range(20000)]
+    taxonomy = {f"d{a}/s{b}/t{c}": rng.sample(words, 5)
+                for a in range(20) for b in range(10) for c in range(20)}
+    docs = [(rng.sample(words, 10), ' '.join(rng.sample(words, 4)), [' '.join(rng.sample(words, 3))])
+            for _ in range(5000)]
+    start = time.perf_counter()
+    big = DomainIndex(taxonomy)
+    built = time.perf_counter() - start
+    start = time.perf_counter()
+    big.best_domains(docs)
+    print(f"{len(big.nodes)} nodes: build {built:.2f}s, "
+          f"{len(docs)} documents {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Exact and near-duplicate detection for import batches.
+
+Exact duplicates share a SHA-256 content hash. Near duplicates are found
+with MinHash signatures over word shingles, bucketed by locality-sensitive
+hashing (LSH banding) so only files that collide in at least one band are
+ever compared - there is no pairwise pass over the whole batch.
+"""
+
+import hashlib
+import re
+import zlib
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Tuple
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Prime just above 2**32, so (a * x + b) stays inside uint64 for 32-bit a, b, x
+HASH_PRIME = np.uint64((1 << 32) + 15)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+NUM_PERM = 128
+LSH_BANDS = 16
+SHINGLE_SIZE = 5
+
+# Only the first part of very large files is shingled
+MINHASH_SAMPLE_BYTES = 1024 * 1024
+
+# Shingles permuted at once: bounds the NUM_PERM x block working arrays
+MINHASH_BLOCK = 8192
+
+_rng = np.random.RandomState(42)
+_PERM_A = _rng.randint(1, (1 << 32) - 1, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.randint(0, (1 << 32) - 1, size=NUM_PERM, dtype=np.uint64)
+
+
+def content_hash(file_path: Path, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 of the raw file bytes, read in chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def shingle_hashes(text: str, size: int = SHINGLE_SIZE) -> np.ndarray:
+    """32-bit hashes of the distinct word shingles in text."""
+    words = re.findall(r'\w+', text.lower())
+    if len(words) < size:
+        shingles = {' '.join(words)} if words else set()
+    else:
+        shingles = {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+    return np.fromiter(
+        (zlib.crc32(s.encode('utf-8')) for s in shingles),
+        dtype=np.uint64, count=len(shingles)
+    )
+
+
+def minhash_signature(text: str) -> np.ndarray:
+    """MinHash signature (NUM_PERM values) of the text's word shingles."""
+    hashes = shingle_hashes(text)
+    signature = np.full(NUM_PERM, MAX_HASH, dtype=np.uint64)
+    for start in range(0, hashes.size, MINHASH_BLOCK):
+        permuted = np.outer(_PERM_A, hashes[start:start + MINHASH_BLOCK])
+        permuted += _PERM_B[:, None]
+        permuted %= HASH_PRIME
+        permuted &= MAX_HASH
+        np.minimum(signature, permuted.min(axis=1), out=signature)
+    return signature
+
+
+def file_signature(file_path: Path) -> np.ndarray:
+    """MinHash signature of (the start of) a file."""
+    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+        text = f.read(MINHASH_SAMPLE_BYTES)
+    return minhash_signature(text)
+
+
+def estimated_similarity(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two MinHash signatures."""
+    return float(np.mean(sig_a == sig_b))
+
+
+def find_duplicates(files: List[Dict], threshold: float = 0.8,
+                    bands: int = LSH_BANDS) -> Dict[str, Tuple[str, str, float]]:
+    """
+    Find exact and near duplicates among manifest rows.
+
+    Args:
+        files: Manifest rows, already in priority order, each with
+            'source_file', 'content_hash' and 'minhash' keys
+        threshold: Minimum estimated Jaccard similarity for near duplicates
+        bands: Number of LSH bands (NUM_PERM must divide evenly)
+
+    Returns:
+        Mapping of duplicate source_file -> (canonical source_file,
+        'exact' or 'near', similarity). The first file of each group in
+        manifest order is the canonical copy and is not included.
+    """
+    duplicates = {}
+
+    # Exact duplicates: identical content hash
+    canonical_by_hash = {}
+    unique = []
+    for row in files:
+        canonical = canonical_by_hash.setdefault(row['content_hash'], row['source_file'])
+        if canonical != row['source_file']:
+            duplicates[row['source_file']] = (canonical, 'exact', 1.0)
+        else:
+            unique.append(row)
+
+    # Near duplicates: LSH banding over MinHash signatures
+    rows_per_band = NUM_PERM // bands
+    buckets = defaultdict(list)
+    for idx, row in enumerate(unique):
+        signature = row['minhash']
+        for band in range(bands):
+            band_slice = signature[band * rows_per_band:(band + 1) * rows_per_band]
+            buckets[(band, band_slice.tobytes())].append(idx)
+
+    # Union-find over verified candidate pairs; the lowest index (earliest
+    # in manifest order) becomes the root of each group
+    parent = list(range(len(unique)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    checked = set()
+    for members in buckets.values():
+        if len(members) < 2:
+            continue
+        for pos, first in enumerate(members):
+            for other in members[pos + 1:]:
+                if (first, other) in checked:
+                    continue
+                checked.add((first, other))
+                score = estimated_similarity(unique[first]['minhash'], unique[other]['minhash'])
+                if score >= threshold:
+                    root_a, root_b = find(first), find(other)
+                    if root_a != root_b:
+                        parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    for idx, row in enumerate(unique):
+        root = find(idx)
+        if root != idx:
+            score = estimated_similarity(unique[root]['minhash'], row['minhash'])
+            duplicates[row['source_file']] = (unique[root]['source_file'], 'near', round(score, 3))
+
+    logger.info(f"Duplicate detection: {sum(1 for d in duplicates.values() if d[1] == 'exact')} exact, "
+                f"{sum(1 for d in duplicates.values() if d[1] == 'near')} near duplicates")
+
+    return duplicates
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+File writing helpers shared by the pipeline stages.
+
+Writes go to a temp file in the destination directory and are moved into
+place with os.replace, so a crash never leaves a half-written note behind.
+write_if_changed additionally skips the write when the file already holds
+the same content, which keeps mtimes (and every mtime-based cache
+downstream, Logseq's included) stable.
+"""
+
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+
+def _read_umask() -> int:
+    """Current process umask (mkstemp always creates files as 0600)."""
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+# Read once at import: changing the umask is process-wide and not thread-safe
+_UMASK = _read_umask()
+
+
+def atomic_write_text(path: Path, content: str, encoding: str = 'utf-8') -> None:
+    """Atomically replace path with content, keeping its permissions."""
+    path = Path(path)
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix='.tmp', dir=path.parent)
+    try:
+        with os.fdopen(fd, 'w', encoding=encoding) as f:
+            f.write(content)
+        if path.exists():
+            shutil.copymode(path, tmp_name)
+        else:
+            os.chmod(tmp_name, 0o666 & ~_UMASK)
+        os.replace(tmp_name, path)
+    except BaseException:
+        if os.path.exists(tmp_name):
+            os.unlink(tmp_name)
+        raise
+
+
+def write_if_changed(path: Path, content: str, encoding: str = 'utf-8') -> bool:
+    """
+    Atomically write content to path unless it already contains it.
+
+    Returns:
+        True if the file was written
+    """
+    path = Path(path)
+    try:
+        if path.read_text(encoding=encoding) == content:
+            return False
+    except (FileNotFoundError, UnicodeDecodeError):
+        pass
+
+    atomic_write_text(path, content, encoding)
+    return True
+
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Shared YAML frontmatter handling for all stages.
+
+Every stage used to locate the `---` block and call yaml.safe_load on its
+own, so the same frontmatter was parsed four or more times per run with the
+pure-Python loader. This module finds the block once, uses libyaml's
+CSafeLoader/CSafeDumper when PyYAML was built with it, and caches parse
+results keyed by the frontmatter text.
+"""
+
+import math
+import re
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import yaml
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeLoader, SafeDumper
+
+FRONTMATTER_START = '---'
+FRONTMATTER_END = '\n---\n'
+
+PARSE_CACHE_SIZE = 4096
+
+_parse_cache: 'OrderedDict[str, Tuple[bool, Any]]' = OrderedDict()
+
+
+def has_frontmatter(content: str) -> bool:
+    """True if the content opens with a frontmatter marker."""
+    return content.startswith(FRONTMATTER_START)
+
+
+def split_frontmatter(content: str) -> Tuple[Optional[str], str]:
+    """
+    Split content into its frontmatter YAML and the remaining body.
+
+    Returns:
+        Tuple of (yaml string or None, body). The yaml string is None when
+        there is no frontmatter or it is not properly closed; the body is
+        then the full content.
+    """
+    if not content.startswith(FRONTMATTER_START):
+        return None, content
+
+    end_marker = content.find(FRONTMATTER_END)
+    if end_marker == -1:
+        return None, content
+
+    return content[4:end_marker], content[end_marker + len(FRONTMATTER_END):]
+
+
+def frontmatter_end(content: str) -> int:
+    """Offset where the body starts (0 if there is no closed frontmatter)."""
+    if not content.startswith(FRONTMATTER_START):
+        return 0
+    end_marker = content.find(FRONTMATTER_END)
+    return end_marker + len(FRONTMATTER_END) if end_marker != -1 else 0
+
+
+def parse_frontmatter(yaml_str: str) -> Any:
+    """
+    Parse a frontmatter YAML string, reusing earlier results for identical
+    text. Parse errors (yaml.YAMLError, or ValueError from bad timestamps)
+    are cached too and re-raised on every call.
+
+    The returned object is shared between callers and must not be mutated.
+    """
+    cached = _parse_cache.get(yaml_str)
+    if cached is not None:
+        _parse_cache.move_to_end(yaml_str)
+        ok, value = cached
+        if ok:
+            return value
+        raise value
+
+    try:
+        value = yaml.load(yaml_str, Loader=SafeLoader)
+        result = (True, value)
+    except Exception as e:
+        result = (False, e)
+
+    _parse_cache[yaml_str] = result
+    if len(_parse_cache) > PARSE_CACHE_SIZE:
+        _parse_cache.popitem(last=False)
+
+    ok, value = result
+    if ok:
+        return value
+    raise value
+
+
+def load_frontmatter(content: str) -> Any:
+    """
+    Parse the frontmatter of a document.
+
+    Returns:
+        Parsed YAML (usually a dict), or None if there is no closed
+        frontmatter block. Raises yaml.YAMLError on invalid YAML.
+    """
+    yaml_str, _ = split_frontmatter(content)
+    if yaml_str is None:
+        return None
+    return parse_frontmatter(yaml_str)
+
+
+def dump_frontmatter(data: Any) -> str:
+    """Serialize frontmatter to YAML in block style, keeping key order."""
+    try:
+        return yaml.dump(data, Dumper=SafeDumper, default_flow_style=False,
+                         sort_keys=False)
+    except yaml.representer.RepresenterError:
+        # Non-builtin values (e.g. numpy scalars) need the full dumper
+        return yaml.dump(data, default_flow_style=False, sort_keys=False)
+
+
+# Template serializer
+# -------------------------------------------------------------------------
+# Layer 1 frontmatter always has the same shape: top-level scalars plus one
+# 'hierarchy' mapping holding scalars and a 'level' list. For such shapes a
+# format template is compiled once and only the scalars are escaped per
+# file. Anything else (nested lists, empty containers, unusual types or
+# characters) goes through dump_frontmatter instead.
+
+# Conservative subset of what PyYAML emits as a plain scalar in block context
+_PLAIN_SAFE = re.compile(r"[A-Za-z0-9_./(][A-Za-z0-9 _\-./()>,'+&]*\Z")
+
+_resolver = yaml.resolver.Resolver()
+_STR_TAG = 'tag:yaml.org,2002:str'
+
+_template_cache: Dict[tuple, Optional[str]] = {}
+
+
+def _emit_scalar(value: Any) -> Optional[str]:
+    """YAML text for a scalar, or None if the fast path cannot emit it."""
+    if value is None:
+        return 'null'
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, float):
+        text = repr(value)
+        if math.isfinite(value) and 'e' not in text:
+            return text
+        return None
+    if isinstance(value, str):
+        if not value:
+            return "''"
+        if (_PLAIN_SAFE.match(value) and not value.endswith(' ')
+                and _resolver.resolve(yaml.ScalarNode, value, (True, False)) == _STR_TAG):
+            return value
+        if value.isprintable():
+            return "'" + value.replace("'", "''") + "'"
+    return None
+
+
+def _is_scalar(value: Any) -> bool:
+    return not isinstance(value, (dict, list, tuple, set))
+
+
+def _shape(data: Dict) -> Optional[tuple]:
+    """Hashable description of the keys and container layout of data."""
+    shape = []
+    for key, value in data.items():
+        if not isinstance(key, str):
+            return None
+        if isinstance(value, dict):
+            if not value:
+                return None
+            nested = []
+            for sub_key, sub_value in value.items():
+                if not isinstance(sub_key, str):
+                    return None
+                if isinstance(sub_value, list):
+                    if not sub_value or not all(_is_scalar(v) for v in sub_value):
+                        return None
+                    nested.append((sub_key, len(sub_value)))
+                elif _is_scalar(sub_value):
+                    nested.append((sub_key, None))
+                else:
+                    return None
+            shape.append((key, tuple(nested)))
+        elif isinstance(value, list):
+            if not value or not all(_is_scalar(v) for v in value):
+                return None
+            shape.append((key, len(value)))
+        elif _is_scalar(value):
+            shape.append((key, None))
+        else:
+            return None
+    return tuple(shape)
+
+
+def _compile_template(shape: tuple) -> Optional[str]:
+    """Format template for a shape, with one {} per scalar value."""
+    lines = []
+    for key, layout in shape:
+        if _emit_scalar(key) != key:
+            return None
+        if layout is None:
+            lines.append(f"{key}: {{}}")
+        elif isinstance(layout, int):
+            lines.append(f"{key}:")
+            lines.extend(["- {}"] * layout)
+        else:
+            lines.append(f"{key}:")
+            for sub_key, sub_layout in layout:
+                if _emit_scalar(sub_key) != sub_key:
+                    return None
+                if sub_layout is None:
+                    lines.append(f"  {sub_key}: {{}}")
+                else:
+                    lines.append(f"  {sub_key}:")
+                    lines.extend(["  - {}"] * sub_layout)
+    return '\n'.join(lines) + '\n'
+
+
+def _flatten_values(data: Dict) -> List[Any]:
+    """Scalar values of data in template order."""
+    values = []
+    for value in data.values():
+        if isinstance(value, dict):
+            for sub_value in value.values():
+                if isinstance(sub_value, list):
+                    values.extend(sub_value)
+                else:
+                    values.append(sub_value)
+        elif isinstance(value, list):
+            values.extend(value)
+        else:
+            values.append(value)
+    return values
+
+
+def fast_dump_frontmatter(data: Dict) -> str:
+    """
+    Serialize fixed-shape frontmatter (such as Layer 1) through a cached
+    template, falling back to dump_frontmatter for anything unexpected.
+
+    Output is block-style YAML like dump_frontmatter produces, except that
+    long values are not folded across lines.
+    """
+    shape = _shape(data) if isinstance(data, dict) and data else None
+    if shape is None:
+        return dump_frontmatter(data)
+
+    if shape not in _template_cache:
+        _template_cache[shape] = _compile_template(shape)
+    template = _template_cache[shape]
+    if template is None:
+        return dump_frontmatter(data)
+
+    emitted = []
+    for value in _flatten_values(data):
+        text = _emit_scalar(value)
+        if text is None:
+            return dump_frontmatter(data)
+        emitted.append(text)
+
+    return template.format(*emitted)
+
+
+def clear_cache() -> None:
+    """Drop all cached parse results."""
+    _parse_cache.clear()
+
+
+if __name__ == '__main__':
+    # Round-trip check of the template serializer against yaml.safe_load
+    samples = [
+        {'source': 'lighthouse_labs', 'source-file-original': "Course_1/Week_2/it's_dns.md",
+         'hierarchy': {'level': ['course', 'week', 'topic'], 'course': 1, 'week': 2.0,
+                       'topic': "It'S Dns"},
+         'created-date': None, 'created-chronological': '2024-W05',
+         'last-modified': '2024-02-01T10:00:00.123456', 'import-date': '2024-02-01T10:00:00',
+         'import-batch': 'batch-1', 'status': 'imported',
+         'hierarchy-full': "Course 1 > Week 2.0 > It'S Dns"},
+        {'source': 'journals', 'hierarchy': {'level': ['year', 'month', 'day'], 'year': '2024',
+                                             'month': '01', 'day': '05'},
+         'created-date': '2024-01-05', 'hierarchy-full': '2024-01-05', 'status': 'yes'},
+        {'source': 'other', 'hierarchy': {'level': ['topic'], 'topic': 'Café: #1 — ünïcode'},
+         'hierarchy-full': '- leading dash', 'status': ' padded ', 'note': 'line\nbreak',
+         'count': float('nan'), 'empty': '', 'flag': True, 'tilde': '~'},
+    ]
+    for sample in samples:
+        text = fast_dump_frontmatter(sample)
+        reloaded = yaml.safe_load(text)
+        for key, value in sample.items():
+            if not (isinstance(value, float) and math.isnan(value)):
+                assert reloaded[key] == value, (key, value, reloaded[key])
+        print(text)
+    print("Round-trip OK")
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Layer 1 frontmatter validation.
+
+A FrontmatterValidator is compiled once from config.json's 'validation'
+section (required fields) and schemas/layer1-schema.json (per-field type,
+format and pattern rules). Each rule becomes a precompiled check, and
+validate_batch runs every check down the whole batch of parsed frontmatter
+dicts, reporting all issues per file.
+
+Used by Stage 2 (validate_layer1) and Stage 5 (validate_file_integrity).
+"""
+
+import json
+import re
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import logging
+
+from frontmatter import has_frontmatter, split_frontmatter, parse_frontmatter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCHEMA_PATH = Path(__file__).parent / 'schemas' / 'layer1-schema.json'
+
+DEFAULT_REQUIRED_FIELDS = [
+    'source', 'import-batch', 'import-date', 'status',
+    'created-chronological', 'hierarchy', 'hierarchy-full'
+]
+
+_TYPES = {
+    'string': str,
+    'object': dict,
+    'list': list,
+}
+
+
+def _is_datetime(value: Any) -> bool:
+    if isinstance(value, (datetime, date)):
+        return True
+    try:
+        datetime.fromisoformat(value.replace('Z', '+00:00'))
+        return True
+    except (AttributeError, TypeError, ValueError):
+        return False
+
+
+def _is_date(value: Any) -> bool:
+    if isinstance(value, date):
+        return True
+    try:
+        date.fromisoformat(value)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+_FORMATS = {
+    'datetime': _is_datetime,
+    'date': _is_date,
+}
+
+
+def _compile_rule(rule: Dict) -> Callable[[Any], bool]:
+    """Turn one schema field rule into a predicate over the field's value."""
+    checks = []
+    if 'type' in rule:
+        expected = _TYPES[rule['type']]
+        checks.append(lambda value: isinstance(value, expected))
+    if 'format' in rule:
+        checks.append(_FORMATS[rule['format']])
+    if 'pattern' in rule:
+        pattern = re.compile(rule['pattern'])
+        checks.append(lambda value: isinstance(value, str) and pattern.match(value) is not None)
+    if 'enum' in rule:
+        allowed = frozenset(rule['enum'])
+        checks.append(lambda value: value in allowed)
+
+    nullable = rule.get('nullable', False)
+
+    def check(value: Any) -> bool:
+        if value is None and nullable:
+            return True
+        return all(c(value) for c in checks)
+
+    return check
+
+
+def read_frontmatter(content: str) -> Tuple[Optional[Dict], Optional[str]]:
+    """
+    Extract and parse the frontmatter of a note.
+
+    Returns:
+        Tuple of (frontmatter dict, None) or (None, issue) when the
+        frontmatter is missing, unclosed or not valid YAML
+    """
+    if not has_frontmatter(content):
+        return None, 'No frontmatter found'
+
+    yaml_str, _ = split_frontmatter(content)
+    if yaml_str is None:
+        return None, 'Frontmatter not properly closed'
+
+    try:
+        frontmatter_dict = parse_frontmatter(yaml_str)
+    except Exception as e:
+        detail = str(e).splitlines()[0] if str(e) else type(e).__name__
+        return None, f"Invalid YAML frontmatter: {detail}"
+
+    if not isinstance(frontmatter_dict, dict):
+        return None, 'Frontmatter is not a mapping'
+
+    return frontmatter_dict, None
+
+
+class FrontmatterValidator:
+    """Precompiled Layer 1 frontmatter checks."""
+
+    def __init__(self, required_fields: List[str] = None, field_rules: Dict[str, Dict] = None):
+        """
+        Args:
+            required_fields: Fields every frontmatter must have
+            field_rules: Schema rules per field ('type', 'format',
+                'pattern', 'enum', 'nullable', 'message')
+        """
+        self.required_fields = list(required_fields or DEFAULT_REQUIRED_FIELDS)
+        self.checks = []
+        for field, rule in (field_rules or {}).items():
+            message = rule.get('message', f"Invalid {field}: {{value}}")
+            self.checks.append((field, _compile_rule(rule), message))
+
+    @classmethod
+    def from_config(cls, validation_config: Dict = None,
+                    schema_path: str = None) -> 'FrontmatterValidator':
+        """
+        Build a validator from config.json's 'validation' section and the
+        Layer 1 schema file.
+        """
+        validation_config = validation_config or {}
+        path = Path(schema_path) if schema_path else DEFAULT_SCHEMA_PATH
+
+        field_rules = {}
+        if path.exists():
+            with open(path, 'r', encoding='utf-8') as f:
+                field_rules = json.load(f).get('fields', {})
+        else:
+            logger.warning(f"Layer 1 schema not found: {path}; only checking required fields")
+
+        return cls(validation_config.get('required_frontmatter_fields'), field_rules)
+
+    def validate_batch(self, frontmatters: Iterable[Dict]) -> List[List[str]]:
+        """
+        Validate many parsed frontmatter dicts.
+
+        Returns:
+            List of issues for each frontmatter, in input order
+        """
+        frontmatters = list(frontmatters)
+        issues = [[] for _ in frontmatters]
+
+        for field in self.required_fields:
+            for idx, frontmatter_dict in enumerate(frontmatters):
+                if field not in frontmatter_dict:
+                    issues[idx].append(f"Missing required field: {field}")
+
+        for field, check, message in self.checks:
+            for idx, frontmatter_dict in enumerate(frontmatters):
+                if field in frontmatter_dict:
+                    value = frontmatter_dict[field]
+                    if not check(value):
+                        issues[idx].append(message.format(field=field, value=value))
+
+        return issues
+
+    def validate(self, frontmatter_dict: Dict) -> Tuple[bool, List[str]]:
+        """
+        Validate one parsed frontmatter dict.
+
+        Returns:
+            Tuple of (is_valid, list of issues)
+        """
+        issues = self.validate_batch([frontmatter_dict])[0]
+        return len(issues) == 0, issues
+
+
+_default_validator = None
+
+
+def default_validator() -> FrontmatterValidator:
+    """Validator with the default required fields and bundled schema."""
+    global _default_validator
+    if _default_validator is None:
+        _default_validator = FrontmatterValidator.from_config()
+    return _default_validator
+
+
+if __name__ == '__main__':
+    validator = default_validator()
+    good = {
+        'source': 'lighthouse_labs', 'import-batch': 'b1',
+        'import-date': '2024-01-15T10:00:00', 'status': 'imported',
+        'created-date': None, 'created-chronological': '2024-W03',
+        'hierarchy': {'level': ['topic'], 'topic': 'Docker'}, 'hierarchy-full': 'Docker'
+    }
+    bad = dict(good, **{'import-date': 'yesterday', 'created-chronological': '2024-3',
+                        'hierarchy': 'Docker', 'created-date': '2024-13-45'})
+    del bad['status']
+    for issues in validator.validate_batch([good, bad]):
+        print(issues or 'PASS')
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Bounded read -> transform -> write pipeline for per-file stage work.
+
+Stages that read a file, compute something and write a file spend most of
+their time waiting on storage (especially on network shares). This runs
+reads on a reader thread pool, prefetching a bounded number of files ahead,
+does the transform on the calling thread, and hands results to writer
+threads. Writes for the same output path always go to the same writer
+thread, so they land in submission order.
+
+Errors are collected per item instead of stopping the run.
+"""
+
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Hashable, Iterable, List, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def run_pipeline(items: Iterable[Any],
+                 read: Callable[[Any], Any],
+                 transform: Callable[[Any, Any], Any],
+                 write: Callable[[Any, Any], None],
+                 write_key: Callable[[Any], Hashable] = None,
+                 readers: int = 4,
+                 writers: int = 4,
+                 max_pending: int = 50) -> Tuple[int, List[Tuple[Any, Exception]]]:
+    """
+    Process items through read, transform and write steps concurrently.
+
+    Args:
+        items: Work items (e.g. manifest records)
+        read: read(item) -> data, run on reader threads
+        transform: transform(item, data) -> result, run on the calling thread
+        write: write(item, result), run on writer threads
+        write_key: Items with the same key are written by the same thread,
+            in order (e.g. the output path). By default items are spread
+            over the writers with no ordering guarantee.
+        readers: Reader threads
+        writers: Writer threads
+        max_pending: Maximum reads in flight and maximum queued writes
+
+    Returns:
+        Tuple of (items written successfully, list of (item, error))
+    """
+    readers = max(1, readers)
+    writers = max(1, writers)
+    max_pending = max(1, max_pending)
+    write_key = write_key or id
+
+    errors: List[Tuple[Any, Exception]] = []
+    written = 0
+    pending_reads: 'deque[Tuple[Any, Future]]' = deque()
+    pending_writes: 'deque[Tuple[Any, Future]]' = deque()
+
+    reader_pool = ThreadPoolExecutor(max_workers=readers, thread_name_prefix='pipeline-read')
+    writer_pools = [ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'pipeline-write-{i}')
+                    for i in range(writers)]
+
+    def finish_write():
+        nonlocal written
+        item, future = pending_writes.popleft()
+        try:
+            future.result()
+            written += 1
+        except Exception as e:
+            errors.append((item, e))
+
+    def finish_read():
+        item, future = pending_reads.popleft()
+        try:
+            result = transform(item, future.result())
+        except Exception as e:
+            errors.append((item, e))
+            return
+        while len(pending_writes) >= max_pending:
+            finish_write()
+        pool = writer_pools[hash(write_key(item)) % writers]
+        pending_writes.append((item, pool.submit(write, item, result)))
+
+    try:
+        for item in items:
+            if len(pending_reads) >= max_pending:
+                finish_read()
+            pending_reads.append((item, reader_pool.submit(read, item)))
+
+        while pending_reads:
+            finish_read()
+        while pending_writes:
+            finish_write()
+    finally:
+        reader_pool.shutdown(wait=True, cancel_futures=True)
+        for pool in writer_pools:
+            pool.shutdown(wait=True)
+
+    return written, errors
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Corpus-level TF-IDF keyword scoring.
+
+Every note in the batch is tokenized once into a sparse term-document
+matrix held as plain NumPy CSR arrays (indptr / term ids / counts). Document
+frequencies come from one bincount over the whole matrix, and TF-IDF scores
+and per-document top-k are computed for batches of documents at a time with
+array operations only - no Python loop over terms - so memory stays bounded
+and 100k notes take minutes, not hours.
+"""
+
+from typing import Dict, Iterable, List
+import numpy as np
+import logging
+
+from tokenizer import tokenize
+
+logger = logging.getLogger(__name__)
+
+# Words never worth a keyword slot, whatever their TF-IDF
+STOPWORDS = frozenset("""
+a about above after again against all also although always among an and another any are
+around as at be because been before being below between both but by can could did does
+doing done down during each either else even every few for from further get gets getting
+given gives go goes going had has have having here how however if in into is it its itself
+just know known like made make makes many may might more most much must need needs never
+new next no nor not now of off often on once one only onto or other others our ours out
+over own per rather really same see seem seems several shall she should since so some such
+than that the their theirs them then there these they thing things this those though
+through thus to too under until upon use used uses using very via was way ways we well
+were what when where whether which while who whom whose why will with within without would
+yet you your yours
+""".split())
+
+
+def keyword_tokens(text: str, min_length: int = 4) -> List[str]:
+    """
+    Lowercase word tokens that can be keywords (no stopwords, no short
+    words), from the shared tokenizer: frontmatter and code are skipped.
+    """
+    return [
+        token for token, _, _, _ in tokenize(text).words
+        if len(token) >= min_length and token not in STOPWORDS
+    ]
+
+
+class TermDocumentMatrix:
+    """Sparse term counts per document, in CSR layout."""
+
+    def __init__(self, vocabulary: List[str], indptr: np.ndarray,
+                 term_ids: np.ndarray, counts: np.ndarray):
+        self.vocabulary = vocabulary
+        self.indptr = indptr
+        self.term_ids = term_ids
+        self.counts = counts
+
+    @property
+    def num_documents(self) -> int:
+        return len(self.indptr) - 1
+
+    @classmethod
+    def from_token_lists(cls, documents: Iterable[List[str]]) -> 'TermDocumentMatrix':
+        """Build the matrix from each document's token list."""
+        term_index = {}
+        indptr = [0]
+        id_chunks = []
+        count_chunks = []
+
+        for tokens in documents:
+            ids = np.fromiter(
+                (term_index.setdefault(token, len(term_index)) for token in tokens),
+                dtype=np.int32, count=len(tokens)
+            )
+            unique_ids, counts = np.unique(ids, return_counts=True)
+            id_chunks.append(unique_ids.astype(np.int32))
+            count_chunks.append(counts.astype(np.int32))
+            indptr.append(indptr[-1] + len(unique_ids))
+
+        vocabulary = [None] * len(term_index)
+        for token, term_id in term_index.items():
+            vocabulary[term_id] = token
+
+        empty = np.zeros(0, dtype=np.int32)
+        return cls(
+            vocabulary,
+            np.asarray(indptr, dtype=np.int64),
+            np.concatenate(id_chunks) if id_chunks else empty,
+            np.concatenate(count_chunks) if count_chunks else empty
+        )
+
+    def idf(self) -> np.ndarray:
+        """Smoothed inverse document frequency per term."""
+        df = np.bincount(self.term_ids, minlength=len(self.vocabulary))
+        return np.log((1 + self.num_documents) / (1 + df)) + 1.0
+
+    def top_k_tfidf(self, k: int = 10, min_count: int = 2,
+                    batch_size: int = 1000, idf: np.ndarray = None) -> List[List[str]]:
+        """
+        Highest TF-IDF terms of every document.
+
+        Args:
+            k: Keywords per document
+            min_count: Ignore terms occurring fewer times in the document
+            batch_size: Documents scored per vectorized batch
+            idf: IDF per vocabulary term from a larger corpus (default: this
+                matrix's own documents)
+
+        Returns:
+            List (one per document) of up to k terms, best first
+        """
+        idf = (self.idf() if idf is None else idf).astype(np.float32)
+        vocabulary = np.asarray(self.vocabulary, dtype=object)
+        # Alphabetical rank of each term: ties break on the term itself, not
+        # on its id, which depends on the order documents were added in
+        term_rank = np.empty(len(vocabulary), dtype=np.int64)
+        term_rank[np.argsort(vocabulary, kind='stable')] = np.arange(len(vocabulary))
+        results: List[List[str]] = []
+
+        for first in range(0, self.num_documents, max(1, batch_size)):
+            last = min(first + batch_size, self.num_documents)
+            lo, hi = self.indptr[first], self.indptr[last]
+            term_ids = self.term_ids[lo:hi]
+            counts = self.counts[lo:hi]
+
+            # Document of each nonzero, relative to this batch
+            lengths = np.diff(self.indptr[first:last + 1])
+            docs = np.repeat(np.arange(last - first), lengths)
+
+            # Term frequency normalised by document length
+            totals = np.bincount(docs, weights=counts, minlength=last - first)
+            scores = counts / np.maximum(totals[docs], 1) * idf[term_ids]
+            scores[counts < min_count] = -1.0
+
+            # Sort by document, then score descending (term breaks ties),
+            # and keep the first k positive scores of each document
+            order = np.lexsort((term_rank[term_ids], -scores, docs))
+            starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+            rank = np.arange(len(order)) - starts[docs[order]]
+            keep = order[(rank < k) & (scores[order] > 0)]
+
+            kept_docs = docs[keep]
+            kept_terms = vocabulary[term_ids[keep]]
+            bounds = np.searchsorted(kept_docs, np.arange(last - first + 1))
+            results.extend(
+                list(kept_terms[bounds[i]:bounds[i + 1]]) for i in range(last - first)
+            )
+
+        return results
+
+
+class DocumentFrequencies:
+    """
+    Corpus document frequencies, accumulated one document at a time.
+
+    Lets a corpus be scored in chunks: a first streaming pass counts in how
+    many documents each term occurs, and each chunk's TermDocumentMatrix is
+    then ranked with the corpus-wide IDF, giving the same keywords as one
+    matrix over everything without holding it in memory.
+    """
+
+    def __init__(self):
+        self.counts: Dict[str, int] = {}
+        self.num_documents = 0
+
+    def add(self, tokens: Iterable[str]) -> None:
+        self.num_documents += 1
+        counts = self.counts
+        for token in set(tokens):
+            counts[token] = counts.get(token, 0) + 1
+
+    def idf(self, vocabulary: List[str]) -> np.ndarray:
+        """Smoothed inverse document frequency of each term (as TermDocumentMatrix.idf)."""
+        df = np.fromiter((self.counts.get(term, 0) for term in vocabulary),
+                         dtype=np.float64, count=len(vocabulary))
+        return np.log((1 + self.num_documents) / (1 + df)) + 1.0
+
+    def top_k_tfidf(self, token_lists: List[List[str]], k: int = 10, min_count: int = 2,
+                    batch_size: int = 1000) -> List[List[str]]:
+        """Top-k keywords of some of the corpus' documents, scored against all of it."""
+        matrix = TermDocumentMatrix.from_token_lists(token_lists)
+        return matrix.top_k_tfidf(k=k, min_count=min_count, batch_size=batch_size,
+                                  idf=self.idf(matrix.vocabulary))
+
+
+def tfidf_keywords(documents: List[str], k: int = 10, min_count: int = 2,
+                   batch_size: int = 1000) -> List[List[str]]:
+    """
+    Top-k TF-IDF keywords for each document of a corpus.
+
+    Args:
+        documents: Document texts (frontmatter already removed)
+        k: Keywords per document
+        min_count: Minimum occurrences of a keyword in its document
+        batch_size: Documents scored per vectorized batch
+
+    Returns:
+        List of keyword lists, in document order
+    """
+    matrix = TermDocumentMatrix.from_token_lists(keyword_tokens(text) for text in documents)
+    logger.info(f"TF-IDF: {matrix.num_documents} documents, {len(matrix.vocabulary)} terms, "
+                f"{len(matrix.term_ids)} nonzeros")
+    return matrix.top_k_tfidf(k=k, min_count=min_count, batch_size=batch_size)
+
+
+if __name__ == '__main__':
+    import math
+    import random
+    import time
+    from collections import Counter
+
+    # Check against a straightforward per-document implementation
+    rng = random.Random(3)
+    words = [''.join(rng.choice('abcdefghij') for _ in range(6)) for _ in range(300)]
+    docs = [' '.join(rng.choice(words[:rng.randint(5, 300)]) for _ in range(rng.randint(0, 200)))
+            for _ in range(300)]
+    tokens = [keyword_tokens(d) for d in docs]
+    df = Counter(t for toks in tokens for t in set(toks))
+
+    def check(results):
+        for toks, keywords in zip(tokens, results):
+            counts = Counter(toks)
+            score = {t: c / len(toks) * (math.log((1 + len(docs)) / (1 + df[t])) + 1)
+                     for t, c in counts.items() if c >= 2}
+            expected = sorted(score.values(), reverse=True)[:5]
+            assert np.allclose([score[t] for t in keywords], expected, rtol=1e-5), (keywords, expected)
+
+    check(tfidf_keywords(docs, k=5, batch_size=37))
+    print("matches reference: ok")
+
+    # Chunked scoring against corpus frequencies equals whole-corpus scoring
+    frequencies = DocumentFrequencies()
+    for toks in tokens:
+        frequencies.add(toks)
+    check([keywords for first in range(0, len(tokens), 41)
+           for keywords in frequencies.top_k_tfidf(tokens[first:first + 41], k=5)])
+    print("chunked matches whole corpus: ok")
+
+    # Tied scores break on the term, so a document's keywords do not depend
+    # on where it sits in the batch
+    tied = [['alpha', 'alpha', 'beta', 'beta'], ['beta', 'beta', 'alpha', 'alpha']]
+    assert TermDocumentMatrix.from_token_lists(tied).top_k_tfidf(k=1) == [['alpha'], ['alpha']]
+    expected = TermDocumentMatrix.from_token_lists(tokens).top_k_tfidf(k=5, batch_size=37)
+    order = list(range(len(tokens)))
+    for _ in range(5):
+        rng.shuffle(order)
+        shuffled = TermDocumentMatrix.from_token_lists([tokens[i] for i in order])
+        for position, keywords in enumerate(shuffled.top_k_tfidf(k=5, batch_size=37)):
+            assert keywords == expected[order[position]], order[position]
+    print("independent of document order: ok")
+
+    corpus = [' '.join(rng.choice(words) for _ in range(400)) for _ in range(20000)]
+    start = time.perf_counter()
+    tfidf_keywords(corpus)
+    print(f"20000 documents: {time.perf_counter() - start:.1f}s")
+
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Typed results handed from task to task within Stage 3.
+
+Task 3.1 produces a NoteKeywords per note, Task 3.2 a NoteTags per note, and
+the orchestrator passes these lists straight to the next task. The CSVs
+(content-keywords.csv, tags-mapped.csv, tags-validation-results.csv) are
+reports: lists are joined with '; ' for reading. ReportWriter writes them on
+a background thread while the next task runs; large batches append one chunk
+of rows at a time.
+
+from_row() reads a report row back: Stage 4 builds its connection index from
+content-keywords.csv and tags-mapped.csv, and a task can run on its own from
+an earlier run's CSV. join_list() escapes ';' and '\\' within items, so
+split_list() gives back exactly the list that was written (a keyword
+containing ';' does not split in two).
+"""
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field, fields
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List
+import pandas as pd
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+LIST_SEPARATOR = '; '
+
+TAG_DIMENSIONS = (
+    'domain_tags', 'activity_tags', 'proficiency_tags', 'project_tags',
+    'goal_tags', 'connection_tags', 'readiness_tags', 'source_tags',
+)
+
+
+# An item: escaped characters or anything but ';' and '\\'
+_ITEM_PATTERN = re.compile(r'(?:\\.|[^;\\])+', re.DOTALL)
+_ESCAPE_PATTERN = re.compile(r'\\(.)', re.DOTALL)
+
+
+def join_list(values: Iterable[str]) -> str:
+    """Join a list for a report column, escaping ';' and '\\' in items."""
+    return LIST_SEPARATOR.join(
+        str(value).replace('\\', '\\\\').replace(';', '\\;') for value in values
+    )
+
+
+def split_list(value) -> List[str]:
+    """Read back a list written by join_list (blank items are dropped)."""
+    if not isinstance(value, str):
+        return []
+    items = (_ESCAPE_PATTERN.sub(r'\1', item.strip()) for item in _ITEM_PATTERN.findall(value))
+    return [item for item in items if item]
+
+
+@dataclass
+class NoteKeywords:
+    """Task 3.1 output for one note."""
+
+    file_name: str
+    title: str = 'Untitled'
+    keywords: List[str] = field(default_factory=list)
+    technical_terms: List[str] = field(default_factory=list)
+    technical_term_counts: Dict[str, int] = field(default_factory=dict)
+    headings: List[str] = field(default_factory=list)
+    first_para: str = ''
+
+    def to_row(self) -> Dict:
+        """Report row for content-keywords.csv."""
+        return {
+            'title': self.title,
+            'keywords': join_list(self.keywords),
+            'technical_terms': join_list(self.technical_terms),
+            'technical_term_counts': join_list(f"{term}:{count}"
+                                           for term, count in self.technical_term_counts.items()),
+            'headings': join_list(self.headings),
+            'first_para': self.first_para,
+            'file_name': self.file_name,
+        }
+
+    @classmethod
+    def from_row(cls, row: Dict) -> 'NoteKeywords':
+        """Read a content-keywords.csv row back."""
+        counts = {}
+        for item in split_list(row.get('technical_term_counts')):
+            term, _, count = item.rpartition(':')
+            if term and count.isdigit():
+                counts[term] = int(count)
+        return cls(
+            file_name=row['file_name'],
+            title=row['title'] if isinstance(row.get('title'), str) else '',
+            keywords=split_list(row.get('keywords')),
+            technical_terms=split_list(row.get('technical_terms')),
+            technical_term_counts=counts,
+            headings=split_list(row.get('headings')),
+            first_para=row['first_para'] if isinstance(row.get('first_para'), str) else '',
+        )
+
+
+@dataclass
+class NoteTags:
+    """Task 3.2 output for one note: tags per dimension."""
+
+    file_name: str
+    domain_tags: List[str] = field(default_factory=list)
+    activity_tags: List[str] = field(default_factory=list)
+    proficiency_tags: List[str] = field(default_factory=list)
+    project_tags: List[str] = field(default_factory=list)
+    goal_tags: List[str] = field(default_factory=list)
+    connection_tags: List[str] = field(default_factory=list)
+    readiness_tags: List[str] = field(default_factory=list)
+    source_tags: List[str] = field(default_factory=list)
+
+    def dimensions(self) -> Dict[str, List[str]]:
+        """Tag lists keyed by dimension column."""
+        return {name: getattr(self, name) for name in TAG_DIMENSIONS}
+
+    def all_tags(self) -> List[str]:
+        """Every tag, dimension by dimension."""
+        return [tag for name in TAG_DIMENSIONS for tag in getattr(self, name) if tag]
+
+    def to_row(self) -> Dict:
+        """Report row for tags-mapped.csv."""
+        row = {name: join_list(tags) for name, tags in self.dimensions().items()}
+        row['file_name'] = self.file_name
+        return row
+
+    @classmethod
+    def from_row(cls, row: Dict) -> 'NoteTags':
+        """Read a tags-mapped.csv row back."""
+        names = {f.name for f in fields(cls)} - {'file_name'}
+        return cls(file_name=row['file_name'],
+                   **{name: split_list(row.get(name)) for name in names if name in row})
+
+
+def _has_header(path: Path) -> bool:
+    """Whether a CSV file exists and starts with a (non-blank) header line."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return bool(f.readline().strip())
+    except FileNotFoundError:
+        return False
+
+
+class ReportWriter:
+    """Writes CSV reports on a background thread."""
+
+    def __init__(self, max_pending: int = 8):
+        """
+        Args:
+            max_pending: Queued writes beyond this wait for the oldest one,
+                so a slow disk cannot make chunks of rows pile up in memory
+        """
+        self._pool = ThreadPoolExecutor(max_workers=1)
+        self._pending: List[Future] = []
+        self._failed = 0
+        self.max_pending = max(1, max_pending)
+
+    def write(self, rows: List[Dict], path: Path, append: bool = False) -> None:
+        """Queue rows to be written (or appended) to path as CSV."""
+        self._pending.append(self._pool.submit(self._write, list(rows), Path(path), append))
+        while len(self._pending) > self.max_pending:
+            self._wait(self._pending.pop(0))
+
+    def _wait(self, future: Future) -> None:
+        try:
+            future.result()
+        except Exception as e:
+            logger.error(f"Error writing report: {str(e)}")
+            self._failed += 1
+
+    @staticmethod
+    def _write(rows: List[Dict], path: Path, append: bool = False) -> None:
+        # An earlier chunk with no rows leaves a file without a header; the
+        # first chunk with rows then writes it afresh, header included
+        if append and _has_header(path):
+            if rows:
+                pd.DataFrame(rows).to_csv(path, index=False, mode='a', header=False)
+        elif rows or not append:
+            pd.DataFrame(rows).to_csv(path, index=False)
+
+    def close(self) -> int:
+        """
+        Wait for all queued reports.
+
+        Returns:
+            Number of reports that failed to write
+        """
+        for future in self._pending:
+            self._wait(future)
+        self._pending.clear()
+        self._pool.shutdown()
+        failed, self._failed = self._failed, 0
+        return failed
+
+    def __enter__(self) -> 'ReportWriter':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def write_report(rows: List[Dict], path: Path, reports: ReportWriter = None,
+                 append: bool = False) -> None:
+    """
+    Write a CSV report, in the background if a ReportWriter is given.
+
+    Args:
+        rows: Report rows (same columns for every chunk)
+        path: CSV file
+        reports: Background writer
+        append: Add the rows to the file written by an earlier chunk
+    """
+    if reports is not None:
+        reports.write(rows, path, append)
+    else:
+        ReportWriter._write(list(rows), Path(path), append)
+
+
+def iter_report(path: Path, chunk_size: int = 1000) -> Iterator[List[Dict]]:
+    """Read a CSV report back in chunks of rows (none for an empty report)."""
+    try:
+        reader = pd.read_csv(path, chunksize=max(1, chunk_size))
+    except pd.errors.EmptyDataError:
+        return
+    for chunk in reader:
+        yield chunk.to_dict('records')
+
+
+if __name__ == '__main__':
+    import tempfile
+
+    # Lists round-trip through a report column, ';' and '\' included
+    items = ['a;b', 'c\\', 'k8s: pods', 'plain']
+    assert split_list(join_list(items)) == items
+
+    # A first chunk without rows must not leave later chunks headerless
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'report.csv'
+        with ReportWriter() as reports:
+            write_report([], path, reports)
+            write_report([NoteKeywords('a.md', keywords=['x;y']).to_row()], path, reports, append=True)
+            write_report([NoteKeywords('b.md').to_row()], path, reports, append=True)
+        rows = [row for chunk in iter_report(path) for row in chunk]
+        assert [NoteKeywords.from_row(row).file_name for row in rows] == ['a.md', 'b.md']
+        assert NoteKeywords.from_row(rows[0]).keywords == ['x;y']
+    print("layer2 results: ok")
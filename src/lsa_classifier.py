@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""
+Optional latent-semantic (LSA) domain and activity classifier.
+
+The heuristic domain rules only see keywords. This classifier learns from
+pages already in the Logseq graph: every page carrying #domain/... or
+#activity/... tags is a labelled example.
+
+- Notes become TF-IDF vectors (sublinear tf, smoothed idf, unit length) over
+  the keyword tokens of the shared tokenizer, held as CSR arrays.
+- A truncated SVD (randomized range finder with power iterations, NumPy
+  only) maps them into a low-dimensional latent space where related
+  vocabulary ('iptables', 'firewall', 'netfilter') lands close together.
+- Each tag gets the normalised centroid of its labelled pages; a note is
+  assigned, per dimension, the tag of the most similar centroid if the
+  cosine similarity is high enough. All notes of a batch are scored with
+  one matrix multiply.
+
+The fitted model (vocabulary, idf, SVD components, centroids) is saved to an
+.npz file with a fingerprint of the graph pages it was trained on, so later
+imports only project their new notes; it is refitted when the graph changes.
+Everything runs offline on CPU.
+"""
+
+import hashlib
+from itertools import islice
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+import logging
+
+from keyword_scoring import TermDocumentMatrix, keyword_tokens
+from tokenizer import tokenize
+
+logger = logging.getLogger(__name__)
+
+LSA_FORMAT_VERSION = 1
+
+# Tag dimensions the classifier learns and assigns
+LABEL_DIMENSIONS = ('domain', 'activity')
+
+DEFAULT_DIMENSIONS = 100
+DEFAULT_MIN_SIMILARITY = 0.3
+
+# Terms in fewer training documents than this carry no latent signal
+MIN_DOCUMENT_FREQUENCY = 2
+
+# Unlabelled batch notes added to a fit; enough to shape the latent space
+# without holding a very large import in memory
+MAX_EXTRA_TEXTS = 5000
+
+# Nonzeros multiplied per block by the sparse products, bounding memory
+_BLOCK_NONZEROS = 200000
+
+
+def _sparse_dot(indptr: np.ndarray, indices: np.ndarray, data: np.ndarray,
+                dense: np.ndarray) -> np.ndarray:
+    """(rows x n) CSR matrix times a dense (n x k) matrix, in row blocks."""
+    rows = len(indptr) - 1
+    dense = np.asarray(dense, dtype=np.float32)
+    data = np.asarray(data, dtype=np.float32)
+    out = np.zeros((rows, dense.shape[1]), dtype=np.float32)
+    first = 0
+    while first < rows:
+        # Take rows until the block holds about _BLOCK_NONZEROS entries
+        last = int(np.searchsorted(indptr, indptr[first] + _BLOCK_NONZEROS, side='right')) - 1
+        last = min(max(last, first + 1), rows)
+        lo, hi = indptr[first], indptr[last]
+        if hi > lo:
+            starts = indptr[first:last] - lo
+            nonempty = np.diff(indptr[first:last + 1]) > 0
+            products = data[lo:hi, None] * dense[indices[lo:hi]]
+            out[first:last][nonempty] = np.add.reduceat(products, starts[nonempty], axis=0)
+        first = last
+    return out
+
+
+def _transpose(indptr: np.ndarray, indices: np.ndarray, data: np.ndarray, columns: int):
+    """CSR arrays of the transposed matrix."""
+    rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+    order = np.argsort(indices, kind='stable')
+    t_indptr = np.concatenate(([0], np.cumsum(np.bincount(indices, minlength=columns))))
+    return t_indptr, rows[order], data[order]
+
+
+def tfidf_rows(token_lists: Sequence[List[str]], vocabulary: Dict[str, int],
+               idf: np.ndarray):
+    """
+    Unit-length TF-IDF rows over a fixed vocabulary (unknown terms dropped).
+
+    Returns:
+        (indptr, term indices, values) CSR arrays
+    """
+    indptr = [0]
+    index_chunks = []
+    value_chunks = []
+    for tokens in token_lists:
+        ids = np.fromiter((vocabulary.get(token, -1) for token in tokens), dtype=np.int64, count=len(tokens))
+        ids, counts = np.unique(ids[ids >= 0], return_counts=True)
+        values = (1.0 + np.log(counts)) * idf[ids]
+        norm = np.linalg.norm(values)
+        index_chunks.append(ids)
+        value_chunks.append(values / norm if norm else values)
+        indptr.append(indptr[-1] + len(ids))
+
+    return (np.asarray(indptr, dtype=np.int64),
+            np.concatenate(index_chunks) if index_chunks else np.zeros(0, dtype=np.int64),
+            (np.concatenate(value_chunks) if value_chunks else np.zeros(0)).astype(np.float32))
+
+
+def page_labels(content: str) -> Dict[str, List[str]]:
+    """Domain and activity tags of a graph page, per dimension."""
+    labels = {dimension: [] for dimension in LABEL_DIMENSIONS}
+    for tag, _, _, _ in tokenize(content).tags:
+        dimension = tag[1:].split('/', 1)[0]
+        if dimension in labels and '/' in tag and tag not in labels[dimension]:
+            labels[dimension].append(tag)
+    return labels
+
+
+class LsaModel:
+    """Fitted TF-IDF + truncated SVD space with labelled centroids."""
+
+    def __init__(self, vocabulary: List[str], idf: np.ndarray, components: np.ndarray,
+                 centroids: Dict[str, tuple], fingerprint: str = None):
+        """
+        Args:
+            vocabulary: Term of each TF-IDF column
+            idf: Inverse document frequency per term
+            components: (terms x dimensions) SVD right singular vectors
+            centroids: Dimension -> (tags, unit-length centroid matrix)
+            fingerprint: Identifies the training pages
+        """
+        self.vocabulary = list(vocabulary)
+        self.term_index = {term: i for i, term in enumerate(self.vocabulary)}
+        self.idf = idf
+        self.components = components
+        self.centroids = centroids
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def fit(cls, token_lists: Sequence[List[str]], labels: Sequence[Dict[str, List[str]]],
+            dimensions: int = DEFAULT_DIMENSIONS, oversample: int = 10,
+            power_iterations: int = 2, seed: int = 0, fingerprint: str = None) -> 'LsaModel':
+        """
+        Fit the latent space and labelled centroids.
+
+        Args:
+            token_lists: Tokens of every training document (labelled graph
+                pages plus any unlabelled notes)
+            labels: Per document, tags per dimension (empty for unlabelled)
+            dimensions: Latent dimensions kept
+            oversample: Extra random directions for the range finder
+            power_iterations: Subspace iterations sharpening the spectrum
+            seed: Random seed (fits are reproducible)
+            fingerprint: Stored with the model for reuse checks
+
+        Returns:
+            Fitted model
+        """
+        matrix = TermDocumentMatrix.from_token_lists(token_lists)
+        df = np.bincount(matrix.term_ids, minlength=len(matrix.vocabulary))
+        keep = np.flatnonzero(df >= MIN_DOCUMENT_FREQUENCY)
+        vocabulary = [matrix.vocabulary[i] for i in keep]
+        idf = matrix.idf()[keep]
+        term_index = {term: i for i, term in enumerate(vocabulary)}
+
+        indptr, indices, data = tfidf_rows(token_lists, term_index, idf)
+        t_indptr, t_indices, t_data = _transpose(indptr, indices, data, len(vocabulary))
+        docs, terms = len(indptr) - 1, len(vocabulary)
+        k = max(1, min(dimensions, docs, terms))
+
+        if terms == 0:
+            # Nothing shared between documents: an empty space assigns nothing
+            components = np.zeros((0, 1), dtype=np.float32)
+        else:
+            # Randomized range finder: Q spans the dominant column space of X
+            rng = np.random.default_rng(seed)
+            sample = _sparse_dot(indptr, indices, data,
+                                 rng.standard_normal((terms, min(k + oversample, terms))))
+            for _ in range(power_iterations):
+                sample, _ = np.linalg.qr(sample)
+                sample, _ = np.linalg.qr(_sparse_dot(t_indptr, t_indices, t_data, sample))
+                sample = _sparse_dot(indptr, indices, data, sample)
+            basis, _ = np.linalg.qr(sample)
+
+            # SVD of the small projected matrix B = Q^T X
+            small = _sparse_dot(t_indptr, t_indices, t_data, basis).T
+            _, _, vt = np.linalg.svd(small, full_matrices=False)
+            components = vt[:k].T.astype(np.float32)
+
+        model = cls(vocabulary, idf, components, {}, fingerprint)
+        vectors = model._project_rows(indptr, indices, data)
+        for dimension in LABEL_DIMENSIONS:
+            members: Dict[str, List[int]] = {}
+            for doc, doc_labels in enumerate(labels):
+                for tag in doc_labels.get(dimension, []):
+                    members.setdefault(tag, []).append(doc)
+            if not members:
+                continue
+            tags = sorted(members)
+            centroids = np.stack([vectors[members[tag]].mean(axis=0) for tag in tags])
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            model.centroids[dimension] = (tags, centroids / np.where(norms > 0, norms, 1))
+
+        logger.info(f"LSA model: {docs} documents, {terms} terms, {k} dimensions, "
+                    + ", ".join(f"{len(tags)} {dimension} tags"
+                                for dimension, (tags, _) in model.centroids.items()))
+        return model
+
+    def _project_rows(self, indptr, indices, data) -> np.ndarray:
+        vectors = _sparse_dot(indptr, indices, data, self.components)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return (vectors / np.where(norms > 0, norms, 1)).astype(np.float32)
+
+    def project(self, token_lists: Sequence[List[str]]) -> np.ndarray:
+        """Unit-length latent vectors of new documents."""
+        return self._project_rows(*tfidf_rows(token_lists, self.term_index, self.idf))
+
+    def classify(self, token_lists: Sequence[List[str]],
+                 min_similarity: float = DEFAULT_MIN_SIMILARITY) -> List[Dict[str, str]]:
+        """
+        Nearest labelled centroid per dimension for every document.
+
+        Returns:
+            Per document, dimension -> tag for confident assignments
+        """
+        vectors = self.project(token_lists)
+        results: List[Dict[str, str]] = [{} for _ in token_lists]
+        for dimension, (tags, centroids) in self.centroids.items():
+            similarity = vectors @ centroids.T
+            best = similarity.argmax(axis=1)
+            scores = similarity[np.arange(len(best)), best]
+            for doc in np.flatnonzero(scores >= min_similarity):
+                results[doc][dimension] = tags[best[doc]]
+        return results
+
+    def save(self, model_path: Path) -> None:
+        """Serialize the model so later imports only project their notes."""
+        model_path = Path(model_path)
+        model_path.parent.mkdir(parents=True, exist_ok=True)
+        arrays = {
+            'version': np.array(LSA_FORMAT_VERSION),
+            'fingerprint': np.array(self.fingerprint or ''),
+            'vocabulary': np.array(self.vocabulary, dtype=str),
+            'idf': self.idf,
+            'components': self.components,
+        }
+        for dimension, (tags, centroids) in self.centroids.items():
+            arrays[f'tags_{dimension}'] = np.array(tags, dtype=str)
+            arrays[f'centroids_{dimension}'] = centroids
+        tmp_path = model_path.with_name(model_path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **arrays)
+        tmp_path.replace(model_path)
+
+    @classmethod
+    def load(cls, model_path: Path, fingerprint: str = None) -> Optional['LsaModel']:
+        """
+        Load a saved model. Returns None if it is missing, unreadable or was
+        trained on different pages.
+        """
+        model_path = Path(model_path)
+        if not model_path.exists():
+            return None
+        try:
+            with np.load(model_path, allow_pickle=False) as saved:
+                if int(saved['version']) != LSA_FORMAT_VERSION:
+                    return None
+                if fingerprint is not None and str(saved['fingerprint']) != fingerprint:
+                    return None
+                centroids = {
+                    dimension: (list(saved[f'tags_{dimension}']), saved[f'centroids_{dimension}'])
+                    for dimension in LABEL_DIMENSIONS if f'tags_{dimension}' in saved.files
+                }
+                return cls(list(saved['vocabulary']), saved['idf'], saved['components'],
+                           centroids, str(saved['fingerprint']))
+        except Exception as e:
+            logger.warning(f"Could not read LSA model {model_path}: {str(e)}")
+            return None
+
+
+def pages_fingerprint(page_files: Sequence[Path], dimensions: int) -> str:
+    """Fingerprint of the training pages (names, sizes, mtimes) and settings."""
+    digest = hashlib.sha256(f"v{LSA_FORMAT_VERSION}:{dimensions}".encode())
+    for page in sorted(page_files):
+        stat = page.stat()
+        digest.update(f"{page.name}\0{stat.st_size}\0{stat.st_mtime_ns}\0".encode('utf-8', 'surrogatepass'))
+    return digest.hexdigest()
+
+
+def load_or_fit_model(graph_pages: str, model_path: str = None, extra_texts: Sequence[str] = (),
+                      dimensions: int = DEFAULT_DIMENSIONS) -> Optional[LsaModel]:
+    """
+    Return the classifier for a graph, loading it from model_path when it
+    was trained on the current pages, otherwise fitting (and saving) it.
+
+    Args:
+        graph_pages: Directory of existing Logseq pages (labelled examples)
+        model_path: Where the fitted model lives (None disables persistence)
+        extra_texts: Unlabelled notes (the import batch) that also shape the
+            latent space when fitting; at most MAX_EXTRA_TEXTS are read
+        dimensions: Latent dimensions
+
+    Returns:
+        The model, or None if the graph has no labelled pages
+    """
+    pages_dir = Path(graph_pages).expanduser() if graph_pages else None
+    if pages_dir is None or not pages_dir.is_dir():
+        logger.warning(f"LSA classifier: graph pages not found: {graph_pages}")
+        return None
+
+    page_files = list(pages_dir.glob('*.md'))
+    fingerprint = pages_fingerprint(page_files, dimensions)
+    if model_path:
+        model = LsaModel.load(model_path, fingerprint)
+        if model is not None:
+            logger.info(f"Loaded LSA model: {model_path}")
+            return model
+
+    token_lists, labels = [], []
+    for page in page_files:
+        try:
+            content = page.read_text(encoding='utf-8')
+        except (OSError, UnicodeDecodeError) as e:
+            logger.warning(f"LSA classifier: skipping {page.name}: {str(e)}")
+            continue
+        token_lists.append(keyword_tokens(content))
+        labels.append(page_labels(content))
+    if not any(any(page.values()) for page in labels):
+        logger.warning(f"LSA classifier: no tagged pages in {pages_dir}")
+        return None
+
+    for text in islice(extra_texts, MAX_EXTRA_TEXTS):
+        token_lists.append(keyword_tokens(text))
+        labels.append({})
+
+    model = LsaModel.fit(token_lists, labels, dimensions=dimensions, fingerprint=fingerprint)
+    if model_path:
+        model.save(model_path)
+        logger.info(f"LSA model saved: {model_path}")
+    return model
+
+
+def classify_notes(notes, model: LsaModel, names: List[str] = None,
+                   min_similarity: float = DEFAULT_MIN_SIMILARITY) -> Dict[str, Dict[str, str]]:
+    """
+    Classify the notes of a note store or directory.
+
+    Args:
+        notes: NoteStore or DirectoryNotes with the batch
+        model: Fitted model (see load_or_fit_model)
+        names: Only classify these notes (one chunk of a larger batch)
+        min_similarity: Minimum cosine similarity to a tag centroid
+
+    Returns:
+        File name -> {dimension: tag} for confident assignments
+    """
+    names = notes.names() if names is None else names
+    predictions = model.classify([keyword_tokens(notes.read(name)) for name in names], min_similarity)
+    assigned = {name: tags for name, tags in zip(names, predictions) if tags}
+    logger.info(f"LSA classifier assigned tags to {len(assigned)}/{len(names)} notes")
+    return assigned
+
+
+if __name__ == '__main__':
+    import random
+    import tempfile
+    import time
+
+    # Three topics with overlapping vocabulary; pages are labelled, queries are not
+    rng = random.Random(11)
+    topics = {
+        '#domain/cybersecurity/network-security/firewalls':
+            'firewall iptables netfilter ruleset chain packet filter drop accept port'.split(),
+        '#domain/virtualization/containers':
+            'docker container image registry compose volume kubernetes pod port'.split(),
+        '#domain/networking/routing':
+            'router routing ospf gateway subnet packet table hop metric'.split(),
+    }
+    shared = 'system configure network server linux command setup'.split()
+
+    def page(tag):
+        words = [rng.choice(topics[tag]) for _ in range(60)] + [rng.choice(shared) for _ in range(40)]
+        return ' '.join(words)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pages_dir = Path(tmp) / 'pages'
+        pages_dir.mkdir()
+        for i in range(90):
+            tag = list(topics)[i % 3]
+            (pages_dir / f"page{i}.md").write_text(f"# Page {i}\n\n{page(tag)}\n\n## Tags\n\n{tag}\n")
+
+        model_path = Path(tmp) / 'lsa.npz'
+        model = load_or_fit_model(str(pages_dir), str(model_path), dimensions=20)
+        queries = [(tag, page(tag)) for tag in topics for _ in range(20)]
+        predicted = model.classify([keyword_tokens(text) for _, text in queries])
+        accuracy = np.mean([p.get('domain') == tag for (tag, _), p in zip(queries, predicted)])
+        assert accuracy > 0.95, accuracy
+
+        reloaded = load_or_fit_model(str(pages_dir), str(model_path), dimensions=20)
+        assert reloaded.classify([keyword_tokens(text) for _, text in queries]) == predicted
+        print(f"accuracy {accuracy:.2f}, reload: ok")
+
+    # Fitting and scoring cost at corpus scale
+    vocab = [''.join(rng.choice('abcdefghij') for _ in range(6)) for _ in range(5000)]
+    corpus = [[rng.choice(vocab[t * 50:(t + 1) * 50 + 500]) for _ in range(150)]
+              for t in (rng.randrange(90) for _ in range(10000))]
+    start = time.perf_counter()
+    big = LsaModel.fit(corpus, [{'domain': [f"#domain/t{i % 9}"]} for i in range(len(corpus))])
+    fitted = time.perf_counter() - start
+    start = time.perf_counter()
+    big.classify(corpus)
+    print(f"{len(corpus)} documents: fit {fitted:.1f}s, classify {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Where the notes of a batch live between stages.
+
+In the default staged layout every stage reads its notes from one directory
+and writes them to the next, so each note is written four times (Stage 2,
+Stage 3 in place, Stage 4, finalize). With fused writes the orchestrator
+keeps the notes in a NoteStore instead: Layer 1 frontmatter, the Layer 2
+tags section and the Layer 3 placeholder sections are applied as edits to
+the in-memory content, and each note is written once, to
+processed_batch_files, when the batch is finalized. Per-stage snapshots can
+still be written for debugging.
+
+Both classes expose the same small interface (names, read, write, size), so
+stage functions take an optional store and otherwise fall back to
+DirectoryNotes over their directory.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class DirectoryNotes:
+    """Notes stored as .md files in a directory."""
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+
+    def names(self) -> List[str]:
+        return [md_file.name for md_file in self.directory.glob("*.md")]
+
+    def read(self, name: str) -> str:
+        with open(self.directory / name, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def write(self, name: str, content: str) -> None:
+        with open(self.directory / name, 'w', encoding='utf-8') as f:
+            f.write(content)
+
+    def size(self, name: str) -> int:
+        return (self.directory / name).stat().st_size
+
+
+class NoteStore:
+    """Notes held in memory until the batch is written out once."""
+
+    def __init__(self):
+        self._notes: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._notes)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._notes
+
+    def names(self) -> List[str]:
+        return list(self._notes)
+
+    def read(self, name: str) -> str:
+        try:
+            return self._notes[name]
+        except KeyError:
+            raise FileNotFoundError(f"Note not in store: {name}") from None
+
+    def write(self, name: str, content: str) -> None:
+        self._notes[name] = content
+
+    def size(self, name: str) -> int:
+        return len(self.read(name).encode('utf-8'))
+
+    def write_to(self, directory: Path, max_workers: int = 4) -> int:
+        """
+        Write every note to directory.
+
+        Returns:
+            Number of notes written
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        target = DirectoryNotes(directory)
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+            list(pool.map(lambda item: target.write(*item), list(self._notes.items())))
+
+        return len(self._notes)
+
+    def snapshot(self, directory: Path, max_workers: int = 4) -> int:
+        """Write the current state of every note to directory (debugging)."""
+        written = self.write_to(directory, max_workers)
+        logger.info(f"Snapshot of {written} notes written to {directory}")
+        return written
+
+
+def open_notes(directory: Path, store: NoteStore = None):
+    """The store if one is given, otherwise the notes in directory."""
+    return store if store is not None else DirectoryNotes(directory)
@@ -22,6 +22,7 @@ import argparse
 import json
 import logging
 import sys
+from collections import Counter
 from pathlib import Path
 from datetime import datetime
 
@@ -37,7 +38,16 @@ from stage_2_layer1_metadata import (
     build_layer1_frontmatter,
     validate_layer1
 )
+from ann_index import AnnIndex
+from graph_index import open_graph_index
+from layer2_results import ReportWriter
+from result_cache import ResultCache
+from tag_validation import TagValidator
+from lsa_classifier import classify_notes, load_or_fit_model
 from stage_3_layer2_tagging import (
+    KeywordExtractor,
+    TagMapper,
+    corpus_frequencies,
     extract_keywords,
     map_keywords_to_tags,
     validate_tags
@@ -47,6 +57,10 @@ from stage_4_layer3_placeholders import (
     build_layer3_placeholders,
     validate_layer3
 )
+from source_types import available_source_types
+from frontmatter_schema import FrontmatterValidator
+from note_store import NoteStore, open_notes
+from tokenizer import clear_cache as clear_token_cache
 from stage_5_validation import (
     validate_file_integrity,
     validate_batch_consistency,
@@ -78,6 +92,20 @@ class ImportOrchestrator:
         self.config = self._load_config(config_path)
         self.import_date = datetime.now().isoformat()
         self.stage_outputs = {}
+        # Fused writes: keep notes in memory across stages, write them once
+        performance = self.config.get('performance', {})
+        self.note_store = NoteStore() if performance.get('fused_writes', False) else None
+        self.debug_snapshots = performance.get('debug_snapshots', False)
+        self.frontmatter_validator = FrontmatterValidator.from_config(
+            self.config.get('validation', {}),
+            self.config.get('layer1_schema')
+        )
+        self.tag_validator = TagValidator.from_config(
+            self.config.get('validation', {}),
+            self.config.get('tag_schema')
+        )
+        # Index of the existing Logseq graph, opened by the first stage using it
+        self.graph_index = None
         
         # Create output directories
         self.output_dir.mkdir(parents=True, exist_ok=True)
@@ -91,6 +119,15 @@ class ImportOrchestrator:
         
         logger.info(f"Orchestrator initialized: batch_id={batch_id}, source_type={source_type}")
     
+    def _open_graph_index(self):
+        """Open the existing-graph index, refreshed from graph_pages once per run."""
+        if self.graph_index is None:
+            self.graph_index = open_graph_index(
+                self.config.get('graph_index_dir'),
+                self.config.get('graph_pages')
+            )
+        return self.graph_index
+    
     def _load_config(self, config_path):
         """Load configuration from JSON file."""
         try:
@@ -117,19 +154,30 @@ class ImportOrchestrator:
         try:
             # Task 1.1: Identify files
             logger.info("Task 1.1: Identifying source files...")
+            dedup_config = self.config.get('deduplication', {})
             manifest_df = identify_files(
                 self.source_dir,
-                output_dir=self.output_dir / "stage_1_qa"
+                output_dir=self.output_dir / "stage_1_qa",
+                detect_duplicates=dedup_config.get('enabled', True),
+                near_duplicate_threshold=dedup_config.get('near_duplicate_threshold', 0.8)
             )
             logger.info(f"Found {len(manifest_df)} files")
+            duplicates = self._route_duplicates(manifest_df, dedup_config.get('action', 'manual_review'))
+            self.stage_outputs['duplicates'] = duplicates
+            if duplicates:
+                manifest_df = manifest_df[~manifest_df['source_file'].isin(duplicates)]
             self.stage_outputs['manifest'] = manifest_df
             
             # Task 1.2: Lint markdown
             logger.info("Task 1.2: Linting markdown...")
             linting_results = lint_markdown(
                 self.source_dir,
-                output_dir=self.output_dir / "stage_1_qa"
+                output_dir=self.output_dir / "stage_1_qa",
+                stream_threshold_kb=self.config.get('performance', {}).get('lint_stream_threshold_kb', 1024),
+                exclude=duplicates,
+                fix_mode=self.config.get('linting', {}).get('fix_mode', 'in_place')
             )
+            self.stage_outputs['lint_fixed_dir'] = linting_results.get('fixed_dir')
             logger.info(f"Linting complete: {linting_results['files_checked']} files")
             
             # Task 1.3: Normalize spelling
@@ -137,7 +185,11 @@ class ImportOrchestrator:
             spelling_results = normalize_spelling(
                 self.source_dir,
                 custom_dict=self.config.get('custom_dictionary'),
-                output_dir=self.output_dir / "stage_1_qa"
+                output_dir=self.output_dir / "stage_1_qa",
+                suggestion_engine=self.config.get('spelling', {}).get('suggestion_engine', 'symspell'),
+                index_path=self.config.get('spelling', {}).get('index_cache'),
+                max_edit_distance=self.config.get('spelling', {}).get('max_edit_distance', 2),
+                exclude=duplicates
             )
             logger.info(f"Spelling check complete: {spelling_results['issues_found']} issues")
             
@@ -157,6 +209,41 @@ class ImportOrchestrator:
             logger.error(f"❌ Stage 1 failed: {str(e)}")
             return False
     
+    def _route_duplicates(self, manifest_df, action):
+        """
+        Collect duplicates marked in the manifest so later stages skip them.
+        
+        With action 'manual_review' the duplicates are also copied to the
+        manual_review directory; with 'skip' they are only left out.
+        
+        Returns:
+            Set of duplicate source_file paths
+        """
+        if 'duplicate_of' not in manifest_df.columns:
+            return set()
+        
+        duplicate_rows = manifest_df[manifest_df['duplicate_of'].notna()]
+        duplicates = set(duplicate_rows['source_file'])
+        
+        if duplicates and action == 'manual_review':
+            import shutil
+            
+            review_dir = self.output_dir / "manual_review"
+            for source_file in duplicates:
+                dest = review_dir / source_file
+                dest.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(self.source_dir / source_file, dest)
+        
+        if duplicates:
+            logger.info(f"Skipping {len(duplicates)} duplicate files (action: {action})")
+        
+        return duplicates
+    
+    def _snapshot(self, stage_dir):
+        """With fused writes and debug snapshots on, dump the notes' current state."""
+        if self.note_store is not None and self.debug_snapshots:
+            self.note_store.snapshot(self.output_dir / stage_dir)
+    
     def run_stage_2_layer1(self):
         """
         Stage 2: Metadata Extraction & Layer 1 Population.
@@ -193,7 +280,12 @@ class ImportOrchestrator:
                 hierarchy_df=hierarchy_df,
                 batch_id=self.batch_id,
                 import_date=self.import_date,
-                output_dir=self.output_dir / "stage_2_layer1"
+                output_dir=self.output_dir / "stage_2_layer1",
+                fixed_dir=self.stage_outputs.get('lint_fixed_dir'),
+                source_type=self.source_type,
+                max_workers=self.config.get('performance', {}).get('max_workers', 4),
+                max_pending=self.config.get('performance', {}).get('batch_size', 50),
+                store=self.note_store
             )
             logger.info(f"Layer 1 frontmatter applied to {layer1_results['files_processed']} files")
             
@@ -201,10 +293,13 @@ class ImportOrchestrator:
             logger.info("Task 2.3: Validating Layer 1 integrity...")
             validation_results = validate_layer1(
                 self.output_dir / "stage_2_layer1",
-                output_dir=self.output_dir / "stage_2_layer1"
+                output_dir=self.output_dir / "stage_2_layer1",
+                validator=self.frontmatter_validator,
+                store=self.note_store
             )
             logger.info(f"Validation complete: {validation_results['files_passed']}/{validation_results['files_checked']} passed")
             self.stage_outputs['layer1_validation'] = validation_results
+            self._snapshot("stage_2_layer1")
             
             logger.info("✅ Stage 2 complete")
             return True
@@ -226,39 +321,122 @@ class ImportOrchestrator:
         logger.info("STAGE 3: SEMANTIC TAGGING & LAYER 2 POPULATION")
         logger.info("=" * 80)
         
+        # Results are handed from task to task in memory; the CSVs are
+        # reports, written in the background
+        reports = ReportWriter()
+        # Unchanged notes reuse keyword and tag results from earlier imports
+        cache_config = self.config.get('result_cache', {})
+        result_cache = ResultCache(cache_config.get('path'), cache_config.get('max_entries', 50000))
         try:
-            # Task 3.1: Extract keywords
-            logger.info("Task 3.1: Extracting content keywords...")
-            keywords_results = extract_keywords(
-                self.output_dir / "stage_2_layer1",
-                domain_db=self.config.get('domain_database'),
-                tech_terms_db=self.config.get('technical_terms_db'),
-                output_dir=self.output_dir / "stage_3_layer2"
-            )
-            logger.info(f"Keywords extracted for {keywords_results['files_processed']} files")
+            # Notes flow through Tasks 3.1-3.3 one chunk at a time; each chunk
+            # is appended to the reports, so memory stays flat on large batches
+            batch_size = max(1, self.config.get('performance', {}).get('batch_size', 50))
+            keywords_config = self.config.get('keywords', {})
+            method = keywords_config.get('method', 'tfidf')
+            notes = open_notes(self.output_dir / "stage_2_layer1", self.note_store)
+            # Sorted, so chunk membership does not depend on the order
+            # Stage 2 finished writing notes in
+            names = sorted(notes.names())
             
-            # Task 3.2: Map to tags
-            logger.info("Task 3.2: Mapping keywords to tags...")
-            tagging_results = map_keywords_to_tags(
-                self.output_dir / "stage_2_layer1",
-                keywords_file=self.output_dir / "stage_3_layer2" / "content-keywords.csv",
-                source_type=self.source_type,
-                tag_schema=self.config.get('tag_schema'),
-                source_mappings=self.config.get('domain_mappings'),
-                output_dir=self.output_dir / "stage_3_layer2"
-            )
-            logger.info(f"Tags mapped for {tagging_results['files_processed']} files")
-            self.stage_outputs['tagging'] = tagging_results
+            # TF-IDF ranks against the whole batch: count document frequencies first
+            frequencies = corpus_frequencies(notes, names) if method == 'tfidf' else None
             
-            # Task 3.3: Validate tags
-            logger.info("Task 3.3: Validating and applying tags...")
-            tag_validation = validate_tags(
-                self.output_dir / "stage_2_layer1",
-                tags_file=self.output_dir / "stage_3_layer2" / "tags-mapped.csv",
-                tag_schema=self.config.get('tag_schema'),
-                output_dir=self.output_dir / "stage_3_layer2"
+            # Optional: domain/activity tags from the latent-semantic classifier
+            lsa_model = None
+            lsa_config = self.config.get('lsa_classifier', {})
+            if lsa_config.get('enabled', False):
+                logger.info("Loading the LSA classifier for the existing graph...")
+                lsa_model = load_or_fit_model(
+                    lsa_config.get('graph_pages'),
+                    model_path=lsa_config.get('model_path'),
+                    extra_texts=(notes.read(name) for name in names),
+                    dimensions=lsa_config.get('dimensions', 100)
+                )
+            
+            # Term databases, schema and domain rules are loaded once, not per chunk
+            extractor = KeywordExtractor(
+                self.config.get('domain_database'),
+                self.config.get('technical_terms_db'),
+                result_cache
             )
-            logger.info(f"Tag validation complete: {tag_validation['files_passed']}/{tag_validation['files_checked']} passed")
+            mapper = TagMapper(
+                self.config.get('tag_schema'),
+                self.config.get('domain_mappings'),
+                result_cache
+            )
+            
+            totals = Counter()
+            for start in range(0, max(len(names), 1), batch_size):
+                chunk = names[start:start + batch_size]
+                append = start > 0
+                logger.info(f"Stage 3 chunk: notes {start + 1}-{start + len(chunk)} of {len(names)}")
+                
+                # Task 3.1: Extract keywords
+                keywords_results = extract_keywords(
+                    self.output_dir / "stage_2_layer1",
+                    domain_db=self.config.get('domain_database'),
+                    tech_terms_db=self.config.get('technical_terms_db'),
+                    output_dir=self.output_dir / "stage_3_layer2",
+                    store=self.note_store,
+                    method=method,
+                    top_k=keywords_config.get('top_k', 10),
+                    min_count=keywords_config.get('min_count', 2),
+                    reports=reports,
+                    cache=result_cache,
+                    names=chunk,
+                    frequencies=frequencies,
+                    append=append,
+                    extractor=extractor
+                )
+                
+                predicted_tags = None
+                if lsa_model is not None:
+                    predicted_tags = classify_notes(
+                        notes, lsa_model, names=chunk,
+                        min_similarity=lsa_config.get('min_similarity', 0.3)
+                    )
+                
+                # Task 3.2: Map to tags
+                tagging_results = map_keywords_to_tags(
+                    self.output_dir / "stage_2_layer1",
+                    source_type=self.source_type,
+                    tag_schema=self.config.get('tag_schema'),
+                    source_mappings=self.config.get('domain_mappings'),
+                    output_dir=self.output_dir / "stage_3_layer2",
+                    keywords=keywords_results.pop('results'),
+                    reports=reports,
+                    cache=result_cache,
+                    predicted_tags=predicted_tags,
+                    append=append,
+                    mapper=mapper
+                )
+                
+                # Task 3.3: Validate tags
+                tag_validation = validate_tags(
+                    self.output_dir / "stage_2_layer1",
+                    tag_schema=self.config.get('tag_schema'),
+                    output_dir=self.output_dir / "stage_3_layer2",
+                    store=self.note_store,
+                    tags=tagging_results.pop('results'),
+                    reports=reports,
+                    validator=self.tag_validator,
+                    append=append
+                )
+                totals.update(keywords_results)
+                totals.update(tagging_results)
+                totals.update(tag_validation)
+            
+            logger.info(f"Keywords extracted for {totals['keywords_extracted']} files")
+            logger.info(f"Tags mapped for {totals['tags_mapped']} files")
+            logger.info(f"Tag validation complete: {totals['files_passed']}/{totals['files_checked']} passed")
+            self.stage_outputs['tagging'] = {
+                'files_processed': totals['tags_mapped'],
+                'tags_mapped': totals['tags_mapped'],
+            }
+            if reports.close():
+                logger.warning("Some Stage 3 reports could not be written")
+            result_cache.save()
+            self._snapshot("stage_3_layer2")
             
             logger.info("✅ Stage 3 complete")
             return True
@@ -266,6 +444,9 @@ class ImportOrchestrator:
         except Exception as e:
             logger.error(f"❌ Stage 3 failed: {str(e)}")
             return False
+        
+        finally:
+            reports.close()
     
     def run_stage_4_layer3(self):
         """
@@ -280,14 +461,32 @@ class ImportOrchestrator:
         logger.info("STAGE 4: LAYER 3 PLACEHOLDER GENERATION")
         logger.info("=" * 80)
         
+        # See Also neighbours come from a nearest-neighbour index kept across imports
+        see_also_config = self.config.get('see_also', {})
+        ann_index = None
+        if see_also_config.get('enabled', False):
+            ann_index = AnnIndex(see_also_config.get('index_path'))
+        
         try:
             # Task 4.1: Detect connections
             logger.info("Task 4.1: Detecting potential Layer 3 connections...")
+            connections_config = self.config.get('connections', {})
             connection_results = detect_layer3_connections(
                 self.output_dir / "stage_3_layer2",
                 graph_structure=self.config.get('graph_structure'),
-                output_dir=self.output_dir / "stage_4_layer3"
+                output_dir=self.output_dir / "stage_4_layer3",
+                store=self.note_store,
+                graph_pages=self.config.get('graph_pages'),
+                graph_index=self._open_graph_index(),
+                top_k=connections_config.get('top_k', 3),
+                min_score=connections_config.get('min_score', 0.15),
+                max_document_share=connections_config.get('max_document_share', 0.05),
+                ann_index=ann_index,
+                see_also_top_k=see_also_config.get('top_k', 5),
+                see_also_min_similarity=see_also_config.get('min_similarity', 0.2)
             )
+            if ann_index is not None:
+                ann_index.save()
             logger.info(f"Connection detection complete: {connection_results['connections_found']} candidates")
             self.stage_outputs['connections'] = connection_results
             
@@ -296,7 +495,8 @@ class ImportOrchestrator:
             placeholder_results = build_layer3_placeholders(
                 self.output_dir / "stage_3_layer2",
                 candidates_file=self.output_dir / "stage_4_layer3" / "layer3-candidates.csv",
-                output_dir=self.output_dir / "stage_4_layer3"
+                output_dir=self.output_dir / "stage_4_layer3",
+                store=self.note_store
             )
             logger.info(f"Layer 3 placeholders created for {placeholder_results['files_processed']} files")
             
@@ -304,9 +504,11 @@ class ImportOrchestrator:
             logger.info("Task 4.3: Validating Layer 3 structure...")
             layer3_validation = validate_layer3(
                 self.output_dir / "stage_4_layer3",
-                output_dir=self.output_dir / "stage_4_layer3"
+                output_dir=self.output_dir / "stage_4_layer3",
+                store=self.note_store
             )
             logger.info(f"Layer 3 validation complete: {layer3_validation['files_passed']}/{layer3_validation['files_checked']} passed")
+            self._snapshot("stage_4_layer3")
             
             logger.info("✅ Stage 4 complete")
             return True
@@ -334,7 +536,10 @@ class ImportOrchestrator:
             logger.info("Task 5.1: Running file integrity validation...")
             integrity_results = validate_file_integrity(
                 self.output_dir / "stage_4_layer3",
-                output_dir=self.output_dir / "stage_5_validation"
+                output_dir=self.output_dir / "stage_5_validation",
+                validator=self.frontmatter_validator,
+                max_file_size_mb=self.config.get('validation', {}).get('max_file_size_mb', 5),
+                store=self.note_store
             )
             logger.info(f"Integrity validation: {integrity_results['files_passed']}/{integrity_results['files_checked']} passed")
             
@@ -342,7 +547,9 @@ class ImportOrchestrator:
             logger.info("Task 5.2: Running cross-file consistency check...")
             consistency_results = validate_batch_consistency(
                 self.output_dir / "stage_4_layer3",
-                output_dir=self.output_dir / "stage_5_validation"
+                output_dir=self.output_dir / "stage_5_validation",
+                store=self.note_store,
+                graph_index=self._open_graph_index()
             )
             logger.info(f"Consistency check: {consistency_results['checks_passed']}/{consistency_results['checks_total']} passed")
             
@@ -350,7 +557,8 @@ class ImportOrchestrator:
             logger.info("Task 5.3: Analyzing tag coverage...")
             coverage_results = analyze_tag_coverage(
                 self.output_dir / "stage_4_layer3",
-                output_dir=self.output_dir / "stage_5_validation"
+                output_dir=self.output_dir / "stage_5_validation",
+                store=self.note_store
             )
             logger.info(f"Tag coverage analysis complete")
             
@@ -387,6 +595,14 @@ class ImportOrchestrator:
             source = self.output_dir / "stage_4_layer3"
             dest = self.output_dir / "processed_batch_files"
             
+            if self.note_store is not None:
+                # Fused writes: the only write of each note
+                written = self.note_store.write_to(
+                    dest, max_workers=self.config.get('performance', {}).get('max_workers', 4)
+                )
+                logger.info(f"✅ {written} processed files written to {dest}")
+                return True
+            
             for md_file in source.glob("*.md"):
                 if md_file.is_file():
                     shutil.copy2(md_file, dest / md_file.name)
@@ -421,6 +637,8 @@ class ImportOrchestrator:
         for stage_name, stage_func in stages:
             success = stage_func()
             results[stage_name] = "✅ PASS" if success else "❌ FAIL"
+            # Notes change from stage to stage, so token scans are not reused across stages
+            clear_token_cache()
             
             if not success:
                 logger.error(f"\n❌ Pipeline stopped at {stage_name}")
@@ -450,7 +668,7 @@ def main():
     )
     parser.add_argument('--source-dir', required=True, help='Source directory with markdown files')
     parser.add_argument('--source-type', required=True, 
-                       choices=['lighthouse_labs', 'perplexity', 'vs_code_notes', 'journals', 'other'],
+                       choices=available_source_types(),
                        help='Type of source material')
     parser.add_argument('--batch-id', required=True, help='Unique batch identifier')
     parser.add_argument('--output-dir', required=True, help='Output directory for processed files')
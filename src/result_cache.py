@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Persistent cache of Stage 3 results.
+
+Keyword extraction and tag mapping depend only on a note's content (or
+extracted keywords) and on the dictionaries, schema and mappings they were
+computed with. Results are stored under a key that combines a hash of the
+input with a fingerprint of those dictionaries, so editing the technical
+terms or the tag schema simply stops old entries from matching; they age out
+as the cache fills.
+
+The cache is a pickled, size-capped LRU map, loaded once per run and saved
+(atomically) at the end of the stage when anything changed.
+"""
+
+import hashlib
+import json
+import pickle
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+CACHE_FORMAT_VERSION = 1
+DEFAULT_MAX_ENTRIES = 50000
+
+
+def fingerprint(*parts: Any) -> str:
+    """Stable hash of JSON-serializable parts (dictionaries, schema, options)."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(json.dumps(part, sort_keys=True, default=str).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def file_fingerprint(path) -> Optional[str]:
+    """Hash of a file's bytes, or None if there is no such file."""
+    if not path or not Path(path).is_file():
+        return None
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+class ResultCache:
+    """Size-capped LRU map persisted to a pickle file."""
+
+    def __init__(self, path: Path = None, max_entries: int = DEFAULT_MAX_ENTRIES):
+        """
+        Args:
+            path: Pickle file to load from and save to (None keeps the cache
+                in memory only)
+            max_entries: Least recently used entries beyond this are evicted
+        """
+        self.path = Path(path) if path else None
+        self.max_entries = max(1, max_entries)
+        self._entries: 'OrderedDict[bytes, Any]' = OrderedDict()
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+        if self.path:
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: bytes) -> bool:
+        return key in self._entries
+
+    @staticmethod
+    def key(namespace: str, dictionary_fingerprint: str, input_key: bytes) -> bytes:
+        """Cache key for one input under one set of dictionaries."""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(namespace.encode('utf-8') + b'\0')
+        digest.update(dictionary_fingerprint.encode('utf-8') + b'\0')
+        digest.update(input_key)
+        return digest.digest()
+
+    def get(self, key: bytes) -> Optional[Any]:
+        """Cached value, or None. Values are shared and must not be mutated."""
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: bytes, value: Any) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        self._dirty = True
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, 'rb') as f:
+                payload = pickle.load(f)
+        except Exception as e:
+            logger.warning(f"Could not read result cache {self.path}: {str(e)}")
+            return
+        if payload.get('version') != CACHE_FORMAT_VERSION:
+            return
+        self._entries = OrderedDict(payload['entries'])
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def save(self) -> bool:
+        """
+        Write the cache back if it changed.
+
+        Returns:
+            True if the file was written
+        """
+        if not self.path or not self._dirty:
+            return False
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {
+            'version': CACHE_FORMAT_VERSION,
+            'entries': list(self._entries.items()),
+        }
+        tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp_path.replace(self.path)
+        self._dirty = False
+        logger.info(f"Result cache saved: {len(self._entries)} entries "
+                    f"({self.hits} hits, {self.misses} misses this run)")
+        return True
+
+
+if __name__ == '__main__':
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'cache.pkl'
+        cache = ResultCache(path, max_entries=3)
+        keys = [ResultCache.key('kw', fingerprint('terms-v1'), bytes([i])) for i in range(4)]
+        for i, key in enumerate(keys[:3]):
+            cache.put(key, {'n': i})
+        cache.get(keys[0])
+        cache.put(keys[3], {'n': 3})
+        assert cache.get(keys[1]) is None and cache.get(keys[0]) == {'n': 0}
+        assert cache.save() and not cache.save()
+
+        reloaded = ResultCache(path, max_entries=3)
+        assert len(reloaded) == 3 and reloaded.get(keys[3]) == {'n': 3}
+        assert ResultCache.key('kw', fingerprint('terms-v2'), bytes([3])) != keys[3]
+    print("result cache: ok")
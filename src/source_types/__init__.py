@@ -0,0 +1,193 @@
+"""
+Source type registry.
+
+A source type describes one kind of import (Lighthouse Labs course files,
+Perplexity exports, journals, ...): a single compiled path grammar whose
+named groups are the raw hierarchy fields, how those fields become
+hierarchy columns, and how the Layer 1 hierarchy is built from them.
+
+Built-in types live in this package; extra types (e.g. Obsidian or Notion
+exports) can be installed as plugins that register a SourceType subclass
+under the 'knowledge_pipeline.source_types' entry point group:
+
+    [project.entry-points."knowledge_pipeline.source_types"]
+    obsidian = "kp_obsidian:ObsidianSource"
+
+Modules are only imported when their type is selected.
+"""
+
+import importlib
+import re
+from importlib.metadata import entry_points
+from typing import Dict, List, Tuple
+import pandas as pd
+import logging
+
+logger = logging.getLogger(__name__)
+
+ENTRY_POINT_GROUP = 'knowledge_pipeline.source_types'
+
+# name -> "module:attribute", imported on first use
+BUILTIN_SOURCE_TYPES = {
+    'lighthouse_labs': 'source_types.lighthouse_labs:LighthouseLabsSource',
+    'perplexity': 'source_types.perplexity:PerplexitySource',
+    'journals': 'source_types.journals:JournalSource',
+    'vs_code_notes': 'source_types:SourceType',
+    'other': 'source_types:SourceType',
+}
+
+# Last path segment without its final suffix, like Path.stem
+STEM_GRAMMAR = r'(?P<stem>[^/]+?)(?:\.[^./]+)?$'
+
+
+def present(hierarchy: Dict, key: str) -> bool:
+    """True if hierarchy has a real (non-null, non-NaN) value for key."""
+    value = hierarchy.get(key)
+    return value is not None and not (isinstance(value, float) and pd.isna(value))
+
+
+class SourceType:
+    """
+    Generic source type: the topic comes from the filename.
+
+    Subclasses set path_grammar and override build_fields (vectorized) and,
+    where useful, parse_path (per-path fallback) and build_layer1_hierarchy.
+    """
+
+    name = 'generic'
+    path_grammar = re.compile(r'(?:^|/)' + STEM_GRAMMAR)
+
+    def __init__(self, name: str = None):
+        if name:
+            self.name = name
+
+    def map_paths(self, paths: pd.Series) -> Tuple[pd.DataFrame, pd.Series]:
+        """
+        Map a whole column of relative paths to hierarchy columns.
+
+        Returns:
+            Tuple of (hierarchy columns, mask of irregular paths that must be
+            parsed individually with parse_path)
+        """
+        fields = paths.str.extract(self.path_grammar)
+        return self.build_fields(fields, paths), self.find_irregular(fields, paths)
+
+    def build_fields(self, fields: pd.DataFrame, paths: pd.Series) -> pd.DataFrame:
+        """Turn grammar captures into hierarchy columns."""
+        return pd.DataFrame({'topic': fields['stem'].str.replace('_', ' ', regex=False).str.title()})
+
+    def find_irregular(self, fields: pd.DataFrame, paths: pd.Series) -> pd.Series:
+        """Paths the grammar could not read."""
+        return fields.isna().all(axis=1)
+
+    def parse_path(self, file_path: str) -> Dict:
+        """Parse a single path (fallback for irregular paths)."""
+        match = self.path_grammar.search(file_path)
+        if not match:
+            return {}
+        paths = pd.Series([file_path])
+        row = self.build_fields(pd.DataFrame([match.groupdict()], dtype=object), paths).iloc[0]
+        return {key: value for key, value in row.items() if pd.notna(value)}
+
+    def build_layer1_hierarchy(self, hierarchy: Dict) -> Dict:
+        """
+        Build the Layer 1 'hierarchy' and 'hierarchy-full' fields (and
+        'created-date' when the path dates the note) from mapped fields.
+        """
+        if present(hierarchy, 'course') and present(hierarchy, 'week'):
+            return course_week_hierarchy(hierarchy)
+        if present(hierarchy, 'date'):
+            return date_hierarchy(hierarchy)
+        if present(hierarchy, 'category'):
+            return category_hierarchy(hierarchy)
+        return topic_hierarchy(hierarchy)
+
+
+def course_week_hierarchy(hierarchy: Dict) -> Dict:
+    """Course > Week > Topic."""
+    return {
+        'hierarchy': {
+            'level': ['course', 'week', 'topic'],
+            'course': hierarchy.get('course'),
+            'week': hierarchy.get('week'),
+            'topic': hierarchy.get('topic')
+        },
+        'hierarchy-full':
+            f"Course {hierarchy.get('course')} > Week {hierarchy.get('week')} > {hierarchy.get('topic')}"
+    }
+
+
+def date_hierarchy(hierarchy: Dict) -> Dict:
+    """Year > Month > Day, dated by the path."""
+    return {
+        'hierarchy': {
+            'level': ['year', 'month', 'day'],
+            'year': hierarchy.get('year'),
+            'month': hierarchy.get('month'),
+            'day': hierarchy.get('day')
+        },
+        'hierarchy-full': f"{hierarchy.get('year')}-{hierarchy.get('month')}-{hierarchy.get('day')}",
+        'created-date': hierarchy.get('date')
+    }
+
+
+def category_hierarchy(hierarchy: Dict) -> Dict:
+    """Category > Topic."""
+    return {
+        'hierarchy': {
+            'level': ['category', 'topic'],
+            'category': hierarchy.get('category'),
+            'topic': hierarchy.get('topic')
+        },
+        'hierarchy-full': f"{hierarchy.get('category')} > {hierarchy.get('topic')}"
+    }
+
+
+def topic_hierarchy(hierarchy: Dict) -> Dict:
+    """Topic only."""
+    return {
+        'hierarchy': {
+            'level': ['topic'],
+            'topic': hierarchy.get('topic')
+        },
+        'hierarchy-full': hierarchy.get('topic')
+    }
+
+
+_loaded: Dict[str, SourceType] = {}
+
+
+def available_source_types() -> List[str]:
+    """Names of built-in and installed source types (nothing is imported)."""
+    names = set(BUILTIN_SOURCE_TYPES)
+    names.update(ep.name for ep in entry_points(group=ENTRY_POINT_GROUP))
+    return sorted(names)
+
+
+def _load_object(spec: str):
+    module_name, _, attribute = spec.partition(':')
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+def get_source_type(name: str) -> SourceType:
+    """
+    Load the source type registered under name.
+
+    Unknown names fall back to the generic source type.
+    """
+    if name in _loaded:
+        return _loaded[name]
+
+    if name in BUILTIN_SOURCE_TYPES:
+        loaded = _load_object(BUILTIN_SOURCE_TYPES[name])
+    else:
+        matches = [ep for ep in entry_points(group=ENTRY_POINT_GROUP) if ep.name == name]
+        if matches:
+            loaded = matches[0].load()
+        else:
+            logger.debug(f"Unknown source type {name!r}, using generic parsing")
+            loaded = SourceType
+
+    source_type = loaded(name) if isinstance(loaded, type) else loaded
+    _loaded[name] = source_type
+    return source_type
@@ -0,0 +1,70 @@
+"""
+Journal files dated by their filename: YYYY_MM_DD, YYYY-MM-DD,
+daily.journal.YYYY_MM_DD, ...
+"""
+
+import re
+from pathlib import Path
+from typing import Dict
+import pandas as pd
+
+from source_types import STEM_GRAMMAR, SourceType, date_hierarchy, present, topic_hierarchy
+
+PATH_GRAMMAR = re.compile(r'(?:^|/)' + STEM_GRAMMAR)
+
+JOURNAL_DATE_PATTERN = re.compile(r'(\d{4})[_\-](\d{1,2})[_\-](\d{1,2})')
+
+
+def parse_journal_path(file_path: str) -> Dict:
+    """Parse journal file structure."""
+    hierarchy = {}
+    
+    filename = Path(file_path).stem
+    
+    # Look for date patterns: YYYY_MM_DD, YYYY-MM-DD, daily.journal.YYYY.MM.DD, etc.
+    date_match = JOURNAL_DATE_PATTERN.search(filename)
+    
+    if date_match:
+        year, month, day = date_match.groups()
+        hierarchy['year'] = year
+        hierarchy['month'] = month.zfill(2)
+        hierarchy['day'] = day.zfill(2)
+        hierarchy['date'] = f"{year}-{month.zfill(2)}-{day.zfill(2)}"
+        hierarchy['type'] = 'journal'
+    else:
+        hierarchy['type'] = 'note'
+        hierarchy['topic'] = filename.replace('_', ' ').replace('-', ' ').title()
+    
+    return hierarchy
+
+
+class JournalSource(SourceType):
+    """Year > Month > Day hierarchy for dated journal files."""
+
+    name = 'journals'
+    path_grammar = PATH_GRAMMAR
+
+    def build_fields(self, fields: pd.DataFrame, paths: pd.Series) -> pd.DataFrame:
+        stems = fields['stem']
+        dates = stems.str.extract(JOURNAL_DATE_PATTERN)
+        has_date = dates[0].notna()
+        year, month, day = dates[0], dates[1].str.zfill(2), dates[2].str.zfill(2)
+        return pd.DataFrame({
+            'year': year,
+            'month': month,
+            'day': day,
+            'date': year + '-' + month + '-' + day,
+            'type': has_date.map({True: 'journal', False: 'note'}),
+            'topic': stems.str.replace('_', ' ', regex=False)
+                          .str.replace('-', ' ', regex=False)
+                          .str.title()
+                          .where(~has_date),
+        })
+
+    def parse_path(self, file_path: str) -> Dict:
+        return parse_journal_path(file_path)
+
+    def build_layer1_hierarchy(self, hierarchy: Dict) -> Dict:
+        if present(hierarchy, 'date'):
+            return date_hierarchy(hierarchy)
+        return topic_hierarchy(hierarchy)
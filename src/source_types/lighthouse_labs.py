@@ -0,0 +1,80 @@
+"""
+Lighthouse Labs course files: Course_X/Week_Y/topic_name.md and variations.
+"""
+
+import re
+from pathlib import Path
+from typing import Dict
+import pandas as pd
+
+from source_types import (
+    STEM_GRAMMAR, SourceType, course_week_hierarchy, present, topic_hierarchy
+)
+
+COURSE_PATTERN = re.compile(r'course[_\s]*(\d+)', re.IGNORECASE)
+WEEK_PATTERN = re.compile(r'week[_\s]*(\d+)', re.IGNORECASE)
+
+# Course and week come from the last path segment that starts with
+# "course<N>" / "week<N>", wherever it sits in the path
+PATH_GRAMMAR = re.compile(
+    r'^(?:(?=(?:.*/)?course[_\s]*(?P<course>\d+)))?'
+    r'(?:(?=(?:.*/)?week[_\s]*(?P<week>\d+)))?'
+    r'(?:.*/)?' + STEM_GRAMMAR,
+    re.IGNORECASE
+)
+
+
+def parse_lighthouse_path(file_path: str) -> Dict:
+    """Parse Lighthouse Labs file structure."""
+    hierarchy = {}
+    
+    # Pattern: Course_X/Week_Y/filename.md or similar variations
+    parts = file_path.split('/')
+    
+    for part in parts:
+        if part.lower().startswith('course'):
+            match = COURSE_PATTERN.search(part)
+            if match:
+                hierarchy['course'] = int(match.group(1))
+        elif part.lower().startswith('week'):
+            match = WEEK_PATTERN.search(part)
+            if match:
+                hierarchy['week'] = int(match.group(1))
+    
+    # Extract topic from filename
+    filename = Path(file_path).stem
+    hierarchy['topic'] = filename.replace('_', ' ').title()
+    
+    return hierarchy
+
+
+class LighthouseLabsSource(SourceType):
+    """Course > Week > Topic hierarchy from Lighthouse Labs paths."""
+
+    name = 'lighthouse_labs'
+    path_grammar = PATH_GRAMMAR
+
+    def build_fields(self, fields: pd.DataFrame, paths: pd.Series) -> pd.DataFrame:
+        return pd.DataFrame({
+            'course': pd.to_numeric(fields['course'].map(int, na_action='ignore')),
+            'week': pd.to_numeric(fields['week'].map(int, na_action='ignore')),
+            'topic': fields['stem'].str.replace('_', ' ', regex=False).str.title(),
+        })
+
+    def find_irregular(self, fields: pd.DataFrame, paths: pd.Series) -> pd.Series:
+        # A segment starting with course/week that does not continue with the
+        # number (e.g. "course_notes_course_4") needs the segment-wise parser
+        irregular = fields['stem'].isna()
+        for word, pattern in (('course', COURSE_PATTERN), ('week', WEEK_PATTERN)):
+            segments = paths.str.count(rf'(?i)(?:^|/){word}')
+            numbered = paths.str.count(rf'(?i)(?:^|/){pattern.pattern}')
+            irregular |= segments != numbered
+        return irregular
+
+    def parse_path(self, file_path: str) -> Dict:
+        return parse_lighthouse_path(file_path)
+
+    def build_layer1_hierarchy(self, hierarchy: Dict) -> Dict:
+        if present(hierarchy, 'course') and present(hierarchy, 'week'):
+            return course_week_hierarchy(hierarchy)
+        return topic_hierarchy(hierarchy)
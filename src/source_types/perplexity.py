@@ -0,0 +1,56 @@
+"""
+Perplexity research exports: category/.../chat_topic.md
+"""
+
+import re
+from pathlib import Path
+from typing import Dict
+import pandas as pd
+
+from source_types import (
+    STEM_GRAMMAR, SourceType, category_hierarchy, present, topic_hierarchy
+)
+
+PATH_GRAMMAR = re.compile(r'^(?P<category>[^/]*)/(?:.*/)?' + STEM_GRAMMAR)
+
+
+def parse_perplexity_path(file_path: str) -> Dict:
+    """Parse Perplexity research file structure."""
+    hierarchy = {}
+    
+    parts = file_path.split('/')
+    
+    # Try to extract chat ID and topic
+    if len(parts) >= 2:
+        hierarchy['source'] = 'Perplexity'
+        hierarchy['category'] = parts[0].title()
+        hierarchy['topic'] = Path(parts[-1]).stem.replace('_', ' ').title()
+    
+    return hierarchy
+
+
+class PerplexitySource(SourceType):
+    """Category > Topic hierarchy from Perplexity export folders."""
+
+    name = 'perplexity'
+    path_grammar = PATH_GRAMMAR
+
+    def build_fields(self, fields: pd.DataFrame, paths: pd.Series) -> pd.DataFrame:
+        nested = fields['category'].notna()
+        return pd.DataFrame({
+            'source': 'Perplexity',
+            'category': fields['category'].str.title(),
+            'topic': fields['stem'].str.replace('_', ' ', regex=False).str.title(),
+        }).where(nested)
+
+    def find_irregular(self, fields: pd.DataFrame, paths: pd.Series) -> pd.Series:
+        # Top-level files simply have no hierarchy; nothing needs a fallback
+        return pd.Series(False, index=paths.index)
+
+    def parse_path(self, file_path: str) -> Dict:
+        return parse_perplexity_path(file_path)
+
+    def build_layer1_hierarchy(self, hierarchy: Dict) -> Dict:
+        if present(hierarchy, 'category'):
+            return category_hierarchy(hierarchy)
+        return topic_hierarchy(hierarchy)
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Symmetric-delete spelling suggestion index (SymSpell-style).
+
+pyspellchecker's correction() generates every edit-distance-2 candidate for a
+word, which grows with word length and is very slow on long technical tokens.
+This index precomputes the delete variants of every dictionary word once, so a
+lookup only needs the deletes of the (prefix of the) misspelled word plus a
+handful of distance checks.
+
+The built index is pickled next to the dictionaries and reused on the next
+run as long as its fingerprint (dictionary contents + index parameters)
+matches.
+"""
+
+import hashlib
+import json
+import pickle
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+INDEX_FORMAT_VERSION = 1
+
+
+def damerau_levenshtein(a: str, b: str, max_distance: int) -> int:
+    """
+    Optimal string alignment distance between two words.
+
+    Returns max_distance + 1 as soon as the distance is known to exceed
+    max_distance.
+    """
+    if a == b:
+        return 0
+    len_a, len_b = len(a), len(b)
+    if abs(len_a - len_b) > max_distance:
+        return max_distance + 1
+
+    prev_prev = None
+    prev = list(range(len_b + 1))
+    for i in range(1, len_a + 1):
+        current = [i] + [0] * len_b
+        row_min = i
+        for j in range(1, len_b + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(prev[j] + 1, current[j - 1] + 1, prev[j - 1] + cost)
+            if (prev_prev is not None and i > 1 and j > 1
+                    and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                value = min(value, prev_prev[j - 2] + 1)
+            current[j] = value
+            row_min = min(row_min, value)
+        if row_min > max_distance:
+            return max_distance + 1
+        prev_prev, prev = prev, current
+
+    return prev[len_b]
+
+
+class SymSpellIndex:
+    """Delete-variant index answering closest-word lookups."""
+
+    def __init__(self, max_edit_distance: int = 2, prefix_length: int = 7):
+        self.max_edit_distance = max_edit_distance
+        self.prefix_length = prefix_length
+        self.words: Dict[str, int] = {}
+        self.deletes: Dict[str, List[str]] = {}
+        self.fingerprint = None
+
+    def _edits(self, word: str) -> Set[str]:
+        """All deletes of word up to max_edit_distance (including word)."""
+        results = {word}
+        frontier = {word}
+        for _ in range(self.max_edit_distance):
+            next_frontier = set()
+            for candidate in frontier:
+                if len(candidate) <= 1:
+                    continue
+                for i in range(len(candidate)):
+                    deleted = candidate[:i] + candidate[i + 1:]
+                    if deleted not in results:
+                        next_frontier.add(deleted)
+            results.update(next_frontier)
+            frontier = next_frontier
+        return results
+
+    def add_word(self, word: str, count: int = 1) -> None:
+        """Add a word (or bump its count) and index its delete variants."""
+        if word in self.words:
+            self.words[word] += count
+            return
+        self.words[word] = count
+        for deleted in self._edits(word[:self.prefix_length]):
+            self.deletes.setdefault(deleted, []).append(word)
+
+    def add_words(self, word_counts: Dict[str, int]) -> None:
+        """Add many words at once."""
+        for word, count in word_counts.items():
+            self.add_word(word, count)
+
+    def lookup(self, word: str) -> Optional[str]:
+        """
+        Return the closest dictionary word, or None if nothing is within
+        max_edit_distance. Ties are broken by word frequency.
+        """
+        if word in self.words:
+            return word
+
+        best: Tuple[int, int] = (self.max_edit_distance + 1, 0)
+        best_word = None
+        checked = set()
+
+        for deleted in self._edits(word[:self.prefix_length]):
+            for suggestion in self.deletes.get(deleted, ()):
+                if suggestion in checked:
+                    continue
+                checked.add(suggestion)
+                distance = damerau_levenshtein(word, suggestion, self.max_edit_distance)
+                score = (distance, -self.words[suggestion])
+                if distance <= self.max_edit_distance and score < best:
+                    best = score
+                    best_word = suggestion
+
+        return best_word
+
+    def save(self, index_path: Path) -> None:
+        """Serialize the index so later runs can skip rebuilding it."""
+        index_path = Path(index_path)
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {
+            'version': INDEX_FORMAT_VERSION,
+            'fingerprint': self.fingerprint,
+            'max_edit_distance': self.max_edit_distance,
+            'prefix_length': self.prefix_length,
+            'words': self.words,
+            'deletes': self.deletes,
+        }
+        tmp_path = index_path.with_suffix(index_path.suffix + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp_path.replace(index_path)
+
+    @classmethod
+    def load(cls, index_path: Path, fingerprint: str = None) -> Optional['SymSpellIndex']:
+        """
+        Load a serialized index. Returns None if it is missing, unreadable or
+        was built from different dictionaries/parameters.
+        """
+        index_path = Path(index_path)
+        if not index_path.exists():
+            return None
+        try:
+            with open(index_path, 'rb') as f:
+                payload = pickle.load(f)
+        except Exception as e:
+            logger.warning(f"Could not read spelling index {index_path}: {str(e)}")
+            return None
+
+        if payload.get('version') != INDEX_FORMAT_VERSION:
+            return None
+        if fingerprint is not None and payload.get('fingerprint') != fingerprint:
+            return None
+
+        index = cls(payload['max_edit_distance'], payload['prefix_length'])
+        index.words = payload['words']
+        index.deletes = payload['deletes']
+        index.fingerprint = payload['fingerprint']
+        return index
+
+
+def load_custom_terms(custom_dict: str) -> List[str]:
+    """Lowercased single words from the custom dictionary's technical_terms."""
+    if not custom_dict or not Path(custom_dict).exists():
+        return []
+    with open(custom_dict, 'r') as f:
+        custom_terms = json.load(f)
+    words = []
+    for term in custom_terms.get('technical_terms', []):
+        words.extend(re.findall(r'[a-z]+', term.lower()))
+    return words
+
+
+def compute_fingerprint(word_counts: Dict[str, int], custom_words: Iterable[str],
+                        max_edit_distance: int, prefix_length: int) -> str:
+    """Fingerprint of everything the index is built from."""
+    digest = hashlib.sha256()
+    digest.update(f"v{INDEX_FORMAT_VERSION}:{max_edit_distance}:{prefix_length}:".encode())
+    digest.update(str(len(word_counts)).encode())
+    digest.update(str(sum(word_counts.values())).encode())
+    for word in sorted(set(custom_words)):
+        digest.update(word.encode('utf-8') + b'\0')
+    return digest.hexdigest()
+
+
+def load_or_build_index(word_counts: Dict[str, int], custom_dict: str = None,
+                        index_path: str = None, max_edit_distance: int = 2,
+                        prefix_length: int = 7) -> SymSpellIndex:
+    """
+    Return a SymSpell index over word_counts plus the custom technical terms,
+    loading it from index_path when the cached copy is still current.
+
+    Args:
+        word_counts: Base dictionary word -> frequency
+        custom_dict: Path to custom dictionary JSON
+        index_path: Where the serialized index lives (None disables caching)
+        max_edit_distance: Maximum edit distance for suggestions
+        prefix_length: Number of leading characters that are indexed
+
+    Returns:
+        Ready-to-query SymSpellIndex
+    """
+    custom_words = load_custom_terms(custom_dict)
+    fingerprint = compute_fingerprint(word_counts, custom_words,
+                                      max_edit_distance, prefix_length)
+
+    if index_path:
+        index = SymSpellIndex.load(index_path, fingerprint)
+        if index is not None:
+            logger.info(f"Loaded spelling index: {index_path}")
+            return index
+
+    logger.info(f"Building spelling index over {len(word_counts)} words...")
+    index = SymSpellIndex(max_edit_distance, prefix_length)
+    index.add_words(word_counts)
+    max_count = max(word_counts.values(), default=1)
+    for word in custom_words:
+        # Custom terms should win ties against ordinary dictionary words
+        index.add_word(word, max_count)
+    index.fingerprint = fingerprint
+
+    if index_path:
+        index.save(index_path)
+        logger.info(f"Spelling index saved: {index_path}")
+
+    return index
@@ -10,28 +10,46 @@ Tasks:
 """
 
 import os
+import io
 import re
+import shutil
+import tempfile
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
 import pandas as pd
 from spellchecker import SpellChecker
-import yaml
 import json
 import logging
 
+from duplicate_detection import content_hash, file_signature, find_duplicates
+from file_utils import write_if_changed
+from frontmatter import split_frontmatter, parse_frontmatter
+from spelling_index import load_or_build_index
+from tokenizer import tokenize
+
 logger = logging.getLogger(__name__)
 
 
 # Task 1.1: Identify Files
 # =========================================================================
 
-def identify_files(source_dir: Path, output_dir: Path) -> pd.DataFrame:
+def identify_files(source_dir: Path, output_dir: Path,
+                   detect_duplicates: bool = True,
+                   near_duplicate_threshold: float = 0.8) -> pd.DataFrame:
     """
     Identify all markdown files and create import manifest.
     
+    Exact duplicates (same content hash) and near duplicates (MinHash/LSH)
+    are marked with the source_file of the copy they duplicate in the
+    'duplicate_of' column; the first file in manifest order is kept as the
+    canonical copy.
+    
     Args:
         source_dir: Directory containing source markdown files
         output_dir: Directory to save manifest
+        detect_duplicates: Hash and MinHash every file to find duplicates
+        near_duplicate_threshold: Minimum estimated Jaccard similarity for
+            two files to count as near duplicates
     
     Returns:
         DataFrame with file manifest
@@ -42,18 +60,33 @@ def identify_files(source_dir: Path, output_dir: Path) -> pd.DataFrame:
     for md_file in Path(source_dir).rglob("*.md"):
         if md_file.is_file():
             size_kb = os.path.getsize(md_file) / 1024
-            files.append({
+            entry = {
                 'source_file': str(md_file.relative_to(source_dir)),
                 'full_path': str(md_file),
                 'file_size_kb': round(size_kb, 2),
                 'estimated_layer1_difficulty': 'auto',
                 'estimated_tags': '7',  # Default estimate
                 'priority': 1 if size_kb < 50 else 2  # Process smaller files first
-            })
+            }
+            if detect_duplicates:
+                entry['content_hash'] = content_hash(md_file)
+                entry['minhash'] = file_signature(md_file)
+            files.append(entry)
     
     # Sort by priority (smaller first) then by name
     files.sort(key=lambda x: (x['priority'], x['source_file']))
     
+    if detect_duplicates:
+        duplicates = find_duplicates(files, threshold=near_duplicate_threshold)
+        for entry in files:
+            del entry['minhash']
+            duplicate_of, duplicate_type, similarity = duplicates.get(
+                entry['source_file'], (None, None, None)
+            )
+            entry['duplicate_of'] = duplicate_of
+            entry['duplicate_type'] = duplicate_type
+            entry['duplicate_similarity'] = similarity
+    
     df = pd.DataFrame(files)
     manifest_path = output_dir / "import-manifest.csv"
     df.to_csv(manifest_path, index=False)
@@ -71,100 +104,89 @@ class MarkdownLinter:
     def __init__(self):
         self.issues = []
     
-    def check_heading_hierarchy(self, lines: List[str]) -> List[str]:
-        """Check that headings follow proper hierarchy (no skips)."""
-        issues = []
+    def lint_stream(self, lines: Iterable[str], write: Callable[[str], object],
+                    max_issues: int = None) -> Tuple[int, List[str], bool]:
+        """
+        Lint lines in a single pass, writing fixed lines as they are produced.
+        
+        Checks heading hierarchy, list markers, code blocks and bold/italic
+        style, and fixes trailing whitespace and extra blank lines. Only the
+        current line and a few counters are kept in memory, so it works on a
+        file iterator of any size.
+        
+        Args:
+            lines: Iterable of lines (with line endings)
+            write: Called with each fixed output line
+            max_issues: Keep at most this many issue messages (None keeps all)
+        
+        Returns:
+            Tuple of (total issue count, issue messages, content changed)
+        """
+        # One bucket per check, so messages are grouped by check rather
+        # than interleaved by line
+        headings, lists, code, formatting, trailing, blanks = buckets = [[] for _ in range(6)]
+        issue_count = 0
+        
+        def report(bucket: List[str], message: str):
+            nonlocal issue_count
+            issue_count += 1
+            if max_issues is None or len(bucket) < max_issues:
+                bucket.append(message)
+        
         last_level = 0
+        list_markers = set()
+        in_code = False
+        prev_blank = False
+        changed = False
         
         for i, line in enumerate(lines, 1):
             if line.startswith('#'):
                 level = len(line) - len(line.lstrip('#'))
-                # Allow jump from 0 to 1, but not 1 to 3
                 if level > last_level + 1 and last_level > 0:
-                    issues.append(f"Line {i}: Heading hierarchy skips level (H{last_level} → H{level})")
+                    report(headings, f"Line {i}: Heading hierarchy skips level (H{last_level} → H{level})")
                 last_level = level
-        
-        return issues
-    
-    def check_list_consistency(self, lines: List[str]) -> List[str]:
-        """Check for consistent list formatting."""
-        issues = []
-        list_markers = set()
-        
-        for i, line in enumerate(lines, 1):
-            if line.lstrip().startswith(('-', '*', '+')):
-                marker = line.lstrip()[0]
-                list_markers.add(marker)
+            
+            stripped = line.lstrip()
+            if stripped.startswith(('-', '*', '+')):
+                list_markers.add(stripped[0])
                 if len(list_markers) > 1:
-                    issues.append(f"Line {i}: Mixed list markers {list_markers}")
-        
-        return issues
-    
-    def check_code_blocks(self, lines: List[str]) -> List[str]:
-        """Check code block formatting."""
-        issues = []
-        in_code = False
-        
-        for i, line in enumerate(lines, 1):
+                    report(lists, f"Line {i}: Mixed list markers {list_markers}")
+            
             if line.startswith('```'):
-                if in_code:
-                    in_code = False
-                else:
-                    in_code = True
-                    # Check if language is specified
-                    if len(line.strip()) == 3:
-                        logger.debug(f"Line {i}: Code block without language specified")
-        
-        if in_code:
-            issues.append("Unclosed code block at end of file")
-        
-        return issues
-    
-    def check_trailing_spaces(self, lines: List[str]) -> Tuple[List[str], List[str]]:
-        """Find and fix trailing spaces."""
-        issues = []
-        fixed_lines = []
-        
-        for i, line in enumerate(lines, 1):
+                in_code = not in_code
+                if in_code and len(line.strip()) == 3:
+                    logger.debug(f"Line {i}: Code block without language specified")
+            
+            if '__' in line and not line.startswith('__'):
+                report(formatting, f"Line {i}: Uses __bold__ instead of **bold**")
+            if re.search(r'[^*]_[a-zA-Z]', line):
+                report(formatting, f"Line {i}: Uses _italic_ instead of *italic*")
+            
+            # Auto-fix trailing spaces and extra blanks
             if line.rstrip() != line.rstrip('\n'):
-                issues.append(f"Line {i}: Trailing whitespace")
-                fixed_lines.append(line.rstrip())
-            else:
-                fixed_lines.append(line)
-        
-        return issues, fixed_lines
-    
-    def check_extra_blank_lines(self, lines: List[str]) -> Tuple[List[str], List[str]]:
-        """Find and fix extra blank lines (>1 consecutive)."""
-        issues = []
-        fixed_lines = []
-        prev_blank = False
-        
-        for i, line in enumerate(lines, 1):
+                report(trailing, f"Line {i}: Trailing whitespace")
+                line = line.rstrip() + ('\n' if line.endswith('\n') else '')
+                changed = True
+            
             if line.strip() == '':
                 if prev_blank:
-                    issues.append(f"Line {i}: Extra blank line")
+                    report(blanks, f"Line {i}: Extra blank line")
+                    changed = True
                     continue
                 prev_blank = True
             else:
                 prev_blank = False
-            fixed_lines.append(line)
+            
+            write(line)
         
-        return issues, fixed_lines
-    
-    def check_formatting_consistency(self, lines: List[str]) -> List[str]:
-        """Check bold/italic formatting consistency."""
-        issues = []
+        if in_code:
+            report(code, "Unclosed code block at end of file")
         
-        for i, line in enumerate(lines, 1):
-            # Check for __bold__ vs **bold**
-            if '__' in line and not line.startswith('__'):
-                issues.append(f"Line {i}: Uses __bold__ instead of **bold**")
-            # Check for _italic_ vs *italic*
-            if re.search(r'[^*]_[a-zA-Z]', line):
-                issues.append(f"Line {i}: Uses _italic_ instead of *italic*")
+        issues = [issue for bucket in buckets for issue in bucket]
+        if max_issues is not None:
+            issues = issues[:max_issues]
         
-        return issues
+        return issue_count, issues, changed
     
     def lint_file(self, file_path: Path) -> Tuple[List[str], str]:
         """
@@ -173,35 +195,71 @@ class MarkdownLinter:
         Returns:
             Tuple of (issues list, fixed content)
         """
+        fixed = io.StringIO()
         with open(file_path, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
+            _, all_issues, _ = self.lint_stream(f, fixed.write)
         
-        all_issues = []
+        return all_issues, fixed.getvalue()
+    
+    def lint_file_streaming(self, file_path: Path, max_issues: int = 10,
+                            tmp_dir: Path = None) -> Tuple[int, List[str], Optional[Path]]:
+        """
+        Lint a (large) markdown file line by line, writing the fixed output
+        to a temp file.
         
-        # Run all checks
-        all_issues.extend(self.check_heading_hierarchy(lines))
-        all_issues.extend(self.check_list_consistency(lines))
-        all_issues.extend(self.check_code_blocks(lines))
-        all_issues.extend(self.check_formatting_consistency(lines))
+        Memory use is bounded by the longest line rather than the file size.
+        The caller is responsible for moving the temp file into place or
+        deleting it.
         
-        # Auto-fix trailing spaces and extra blanks
-        trailing_issues, lines = self.check_trailing_spaces(lines)
-        all_issues.extend(trailing_issues)
+        Args:
+            file_path: Markdown file to lint
+            max_issues: Keep at most this many issue messages
+            tmp_dir: Directory for the temp file (defaults to the file's
+                directory, so it can be moved over the original atomically)
+        
+        Returns:
+            Tuple of (total issue count, first max_issues issues, temp file
+            path or None if the fixes left the content unchanged)
+        """
+        file_path = Path(file_path)
+        fd, tmp_name = tempfile.mkstemp(
+            prefix=f".{file_path.name}.", suffix='.lint', dir=tmp_dir or file_path.parent
+        )
+        try:
+            with open(file_path, 'r', encoding='utf-8') as src, \
+                    os.fdopen(fd, 'w', encoding='utf-8') as dst:
+                issue_count, issues, changed = self.lint_stream(src, dst.write, max_issues)
+            shutil.copymode(file_path, tmp_name)
+        except Exception:
+            os.unlink(tmp_name)
+            raise
         
-        extra_blank_issues, lines = self.check_extra_blank_lines(lines)
-        all_issues.extend(extra_blank_issues)
+        if not changed:
+            os.unlink(tmp_name)
+            return issue_count, issues, None
         
-        fixed_content = ''.join(lines)
-        return all_issues, fixed_content
+        return issue_count, issues, Path(tmp_name)
 
 
-def lint_markdown(source_dir: Path, output_dir: Path) -> Dict:
+def lint_markdown(source_dir: Path, output_dir: Path,
+                  stream_threshold_kb: float = 1024,
+                  exclude: Set[str] = None,
+                  fix_mode: str = 'in_place') -> Dict:
     """
     Lint all markdown files and auto-fix where possible.
     
+    Fixes are only written when they actually change the content, and are
+    written atomically (temp file + rename).
+    
     Args:
         source_dir: Directory containing source files
         output_dir: Directory to save linting results
+        stream_threshold_kb: Files at least this large are linted line by
+            line into a temp file instead of being read into memory
+        exclude: Relative paths to skip (e.g. duplicates from Task 1.1)
+        fix_mode: 'in_place' rewrites files in source_dir; 'copy' leaves
+            source_dir untouched and writes fixed copies under
+            output_dir/fixed (same relative paths)
     
     Returns:
         Dictionary with linting statistics
@@ -213,30 +271,57 @@ def lint_markdown(source_dir: Path, output_dir: Path) -> Dict:
     review_required = []
     files_checked = 0
     files_fixed = 0
+    fixed_dir = output_dir / "fixed"
     
     for md_file in source_dir.rglob("*.md"):
         if not md_file.is_file():
             continue
         
+        relative_name = str(md_file.relative_to(source_dir))
+        if exclude and relative_name in exclude:
+            continue
+        
         files_checked += 1
-        issues, fixed_content = linter.lint_file(md_file)
+        target = md_file if fix_mode == 'in_place' else fixed_dir / relative_name
+        
+        if os.path.getsize(md_file) / 1024 >= stream_threshold_kb:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            issue_count, issues, tmp_path = linter.lint_file_streaming(md_file, tmp_dir=target.parent)
+            fixed_content = None
+        else:
+            fixed = io.StringIO()
+            with open(md_file, 'r', encoding='utf-8') as f:
+                issue_count, issues, changed = linter.lint_stream(f, fixed.write)
+            tmp_path = None
+            fixed_content = fixed.getvalue() if changed else None
         
-        if issues:
-            # If there are auto-fixable issues, fix them
-            if len(issues) <= 5:  # Small number of issues = probably auto-fixable
-                with open(md_file, 'w', encoding='utf-8') as f:
-                    f.write(fixed_content)
+        if not issue_count:
+            continue
+        
+        # Small number of issues = probably auto-fixable
+        if issue_count <= 5:
+            written = False
+            if tmp_path is not None:
+                tmp_path.replace(target)
+                written = True
+            elif fixed_content is not None:
+                target.parent.mkdir(parents=True, exist_ok=True)
+                written = write_if_changed(target, fixed_content)
+            
+            if written:
                 files_fixed += 1
-                linting_errors.extend([
-                    {'file': str(md_file.relative_to(source_dir)), 'issue': issue, 'fixed': True}
-                    for issue in issues
-                ])
-            else:  # Complex issues require manual review
-                review_required.append({
-                    'file': str(md_file.relative_to(source_dir)),
-                    'issues_count': len(issues),
-                    'issues': '; '.join(issues[:3])  # First 3 issues
-                })
+            linting_errors.extend([
+                {'file': relative_name, 'issue': issue, 'fixed': written}
+                for issue in issues
+            ])
+        else:  # Complex issues require manual review
+            if tmp_path is not None:
+                tmp_path.unlink()
+            review_required.append({
+                'file': relative_name,
+                'issues_count': issue_count,
+                'issues': '; '.join(issues[:3])  # First 3 issues
+            })
     
     # Save results
     if linting_errors:
@@ -251,14 +336,18 @@ def lint_markdown(source_dir: Path, output_dir: Path) -> Dict:
         'files_checked': files_checked,
         'files_fixed': files_fixed,
         'errors_found': len(linting_errors),
-        'files_needing_review': len(review_required)
+        'files_needing_review': len(review_required),
+        'fixed_dir': fixed_dir if fix_mode == 'copy' else None
     }
 
 
 # Task 1.3: Normalize Spelling & Grammar
 # =========================================================================
 
-def normalize_spelling(source_dir: Path, custom_dict: str, output_dir: Path) -> Dict:
+def normalize_spelling(source_dir: Path, custom_dict: str, output_dir: Path,
+                       suggestion_engine: str = 'symspell',
+                       index_path: str = None, max_edit_distance: int = 2,
+                       exclude: Set[str] = None) -> Dict:
     """
     Identify spelling and grammar issues.
     
@@ -266,6 +355,11 @@ def normalize_spelling(source_dir: Path, custom_dict: str, output_dir: Path) ->
         source_dir: Directory containing markdown files
         custom_dict: Path to custom dictionary JSON
         output_dir: Directory to save results
+        suggestion_engine: 'symspell' (precomputed delete index) or
+            'pyspellchecker' (candidate generation per word)
+        index_path: Where the serialized SymSpell index is cached
+        max_edit_distance: Maximum edit distance for suggestions
+        exclude: Relative paths to skip (e.g. duplicates from Task 1.1)
     
     Returns:
         Dictionary with spelling statistics
@@ -273,11 +367,25 @@ def normalize_spelling(source_dir: Path, custom_dict: str, output_dir: Path) ->
     logger.info("Checking spelling and grammar...")
     
     # Load custom dictionary
-    spell = SpellChecker()
+    spell = SpellChecker(distance=max_edit_distance)
     if custom_dict and Path(custom_dict).exists():
         with open(custom_dict, 'r') as f:
             custom_terms = json.load(f)
-        spell.word_list.update(custom_terms.get('technical_terms', []))
+        spell.word_frequency.load_words(
+            word for term in custom_terms.get('technical_terms', [])
+            for word in re.findall(r'[a-z]+', term.lower())
+        )
+    
+    if suggestion_engine == 'symspell':
+        index = load_or_build_index(
+            dict(spell.word_frequency.dictionary),
+            custom_dict=custom_dict,
+            index_path=index_path,
+            max_edit_distance=max_edit_distance
+        )
+        suggest = index.lookup
+    else:
+        suggest = spell.correction
     
     spelling_issues = []
     grammar_issues = []
@@ -285,29 +393,19 @@ def normalize_spelling(source_dir: Path, custom_dict: str, output_dir: Path) ->
     for md_file in source_dir.rglob("*.md"):
         if not md_file.is_file():
             continue
+        if exclude and str(md_file.relative_to(source_dir)) in exclude:
+            continue
         
         with open(md_file, 'r', encoding='utf-8') as f:
             content = f.read()
         
-        # Skip code blocks and frontmatter
-        lines = content.split('\n')
-        in_frontmatter = lines[0].startswith('---')
-        in_code = False
+        # Prose lines only: the tokenizer skips code blocks and frontmatter
+        doc = tokenize(content)
+        words_by_line = doc.words_by_line()
         
-        for i, line in enumerate(lines, 1):
-            if line.startswith('---'):
-                in_frontmatter = not in_frontmatter
-                continue
-            if line.startswith('```'):
-                in_code = not in_code
-                continue
-            
-            if in_frontmatter or in_code:
-                continue
-            
+        for i, line in doc.prose_lines:
             # Simple spell check
-            words = re.findall(r'\b[a-z]+\b', line.lower())
-            misspelled = spell.unknown(words)
+            misspelled = spell.unknown(words_by_line.get(i, []))
             
             if misspelled:
                 spelling_issues.append({
@@ -315,8 +413,7 @@ def normalize_spelling(source_dir: Path, custom_dict: str, output_dir: Path) ->
                     'line': i,
                     'misspelled_words': '; '.join(misspelled),
                     'suggestions': '; '.join(
-                        ['; '.join(spell.correction(word) if spell.correction(word) else word 
-                                   for word in misspelled)]
+                        suggest(word) or word for word in misspelled
                     )
                 })
             
@@ -379,19 +476,17 @@ def extract_existing_metadata(source_dir: Path, output_dir: Path) -> pd.DataFram
         }
         
         # Check for YAML frontmatter
-        if content.startswith('---'):
-            end_marker = content.find('\n---\n')
-            if end_marker != -1:
-                try:
-                    yaml_str = content[4:end_marker]
-                    metadata = yaml.safe_load(yaml_str)
-                    file_metadata['metadata_format'] = 'YAML'
-                    if isinstance(metadata, dict):
-                        file_metadata['existing_title'] = metadata.get('title')
-                        file_metadata['created_date'] = metadata.get('date') or metadata.get('created_date')
-                        file_metadata['existing_tags'] = metadata.get('tags')
-                except:
-                    pass
+        yaml_str, _ = split_frontmatter(content)
+        if yaml_str is not None:
+            try:
+                metadata = parse_frontmatter(yaml_str)
+                file_metadata['metadata_format'] = 'YAML'
+                if isinstance(metadata, dict):
+                    file_metadata['existing_title'] = metadata.get('title')
+                    file_metadata['created_date'] = metadata.get('date') or metadata.get('created_date')
+                    file_metadata['existing_tags'] = metadata.get('tags')
+            except Exception:
+                pass
         
         # Check for Logseq properties format
         if '::' in content:
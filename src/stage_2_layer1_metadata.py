@@ -8,83 +8,38 @@ Tasks:
 - 2.3: Validate Layer 1 integrity
 """
 
-import re
+import importlib
 from pathlib import Path
 from typing import Dict, List, Tuple
 from datetime import datetime, timedelta
 import pandas as pd
-import yaml
 import logging
 
+from frontmatter import split_frontmatter, fast_dump_frontmatter
+from frontmatter_schema import FrontmatterValidator, default_validator, read_frontmatter
+from io_pipeline import run_pipeline
+from note_store import NoteStore, open_notes
+from source_types import get_source_type
+
 logger = logging.getLogger(__name__)
 
 
 # Task 2.1: Map Hierarchy
 # =========================================================================
 
-def parse_lighthouse_path(file_path: str) -> Dict:
-    """Parse Lighthouse Labs file structure."""
-    hierarchy = {}
-    
-    # Pattern: Course_X/Week_Y/filename.md or similar variations
-    parts = file_path.split('/')
-    
-    for part in parts:
-        if part.lower().startswith('course'):
-            match = re.search(r'course[_\s]*(\d+)', part, re.IGNORECASE)
-            if match:
-                hierarchy['course'] = int(match.group(1))
-        elif part.lower().startswith('week'):
-            match = re.search(r'week[_\s]*(\d+)', part, re.IGNORECASE)
-            if match:
-                hierarchy['week'] = int(match.group(1))
-    
-    # Extract topic from filename
-    filename = Path(file_path).stem
-    hierarchy['topic'] = filename.replace('_', ' ').title()
-    
-    return hierarchy
+# Per-path parsers now live with their source type and are only imported
+# when asked for
+_LEGACY_PARSERS = {
+    'parse_lighthouse_path': 'source_types.lighthouse_labs',
+    'parse_perplexity_path': 'source_types.perplexity',
+    'parse_journal_path': 'source_types.journals',
+}
 
 
-def parse_perplexity_path(file_path: str) -> Dict:
-    """Parse Perplexity research file structure."""
-    hierarchy = {}
-    
-    parts = file_path.split('/')
-    
-    # Try to extract chat ID and topic
-    if len(parts) >= 2:
-        hierarchy['source'] = 'Perplexity'
-        hierarchy['category'] = parts[0].title()
-        hierarchy['topic'] = Path(parts[-1]).stem.replace('_', ' ').title()
-    
-    return hierarchy
-
-
-def parse_journal_path(file_path: str) -> Dict:
-    """Parse journal file structure."""
-    hierarchy = {}
-    
-    filename = Path(file_path).stem
-    
-    # Look for date patterns: YYYY_MM_DD, YYYY-MM-DD, daily.journal.YYYY.MM.DD, etc.
-    date_match = re.search(
-        r'(\d{4})[_\-](\d{1,2})[_\-](\d{1,2})',
-        filename
-    )
-    
-    if date_match:
-        year, month, day = date_match.groups()
-        hierarchy['year'] = year
-        hierarchy['month'] = month.zfill(2)
-        hierarchy['day'] = day.zfill(2)
-        hierarchy['date'] = f"{year}-{month.zfill(2)}-{day.zfill(2)}"
-        hierarchy['type'] = 'journal'
-    else:
-        hierarchy['type'] = 'note'
-        hierarchy['topic'] = filename.replace('_', ' ').replace('-', ' ').title()
-    
-    return hierarchy
+def __getattr__(name):
+    if name in _LEGACY_PARSERS:
+        return getattr(importlib.import_module(_LEGACY_PARSERS[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def map_file_to_hierarchy(manifest_df: pd.DataFrame, source_type: str, 
@@ -92,6 +47,9 @@ def map_file_to_hierarchy(manifest_df: pd.DataFrame, source_type: str,
     """
     Map each file to its source hierarchy.
     
+    Paths are parsed column-wise with precompiled patterns; only paths the
+    vectorized grammar flags as irregular fall back to the per-path parser.
+    
     Args:
         manifest_df: DataFrame from Stage 1.1 with file manifest
         source_type: Type of source (lighthouse_labs, perplexity, journals, etc.)
@@ -102,27 +60,33 @@ def map_file_to_hierarchy(manifest_df: pd.DataFrame, source_type: str,
     """
     logger.info(f"Mapping {len(manifest_df)} files to hierarchy (source_type: {source_type})")
     
-    hierarchies = []
+    if manifest_df.empty:
+        df = pd.DataFrame()
+        df.to_csv(output_dir / "hierarchy-mapping.csv", index=False)
+        logger.info("Hierarchy mapping created: 0 files mapped")
+        return df
     
     # Select parser based on source type
-    if source_type == 'lighthouse_labs':
-        parser = parse_lighthouse_path
-    elif source_type == 'perplexity':
-        parser = parse_perplexity_path
-    elif source_type == 'journals':
-        parser = parse_journal_path
-    else:
-        # Generic parser
-        parser = lambda path: {'topic': Path(path).stem.replace('_', ' ').title()}
-    
-    for _, row in manifest_df.iterrows():
-        file_path = row['source_file']
-        hierarchy = parser(file_path)
-        hierarchy['file_name'] = Path(file_path).name
-        hierarchy['source_file_path'] = file_path
-        hierarchies.append(hierarchy)
-    
-    df = pd.DataFrame(hierarchies)
+    source = get_source_type(source_type)
+    
+    paths = manifest_df['source_file'].astype(str).reset_index(drop=True)
+    df, irregular = source.map_paths(paths)
+    
+    # Irregular paths go through the per-path parser
+    if irregular.any():
+        logger.debug(f"{int(irregular.sum())} irregular paths parsed individually")
+        df = df.astype(object)
+        for idx in irregular[irregular].index:
+            hierarchy = source.parse_path(paths[idx])
+            for col in df.columns:
+                df.at[idx, col] = hierarchy.get(col)
+        df = df.infer_objects()
+    
+    # Levels that no file has are left out, as with per-row dicts
+    df = df.dropna(axis=1, how='all')
+    df['file_name'] = paths.str.extract(r'([^/]*)$', expand=False)
+    df['source_file_path'] = paths
+    
     df.to_csv(output_dir / "hierarchy-mapping.csv", index=False)
     logger.info(f"Hierarchy mapping created: {len(df)} files mapped")
     
@@ -159,45 +123,7 @@ def build_layer1_frontmatter_dict(hierarchy: Dict, batch_id: str,
     }
     
     # Build hierarchy field
-    if 'course' in hierarchy and 'week' in hierarchy:
-        frontmatter['hierarchy'] = {
-            'level': ['course', 'week', 'topic'],
-            'course': hierarchy.get('course'),
-            'week': hierarchy.get('week'),
-            'topic': hierarchy.get('topic')
-        }
-        frontmatter['hierarchy-full'] = \
-            f"Course {hierarchy.get('course')} > Week {hierarchy.get('week')} > {hierarchy.get('topic')}"
-    
-    elif 'date' in hierarchy:
-        # Journal file
-        frontmatter['hierarchy'] = {
-            'level': ['year', 'month', 'day'],
-            'year': hierarchy.get('year'),
-            'month': hierarchy.get('month'),
-            'day': hierarchy.get('day')
-        }
-        frontmatter['hierarchy-full'] = \
-            f"{hierarchy.get('year')}-{hierarchy.get('month')}-{hierarchy.get('day')}"
-        frontmatter['created-date'] = hierarchy.get('date')
-    
-    elif 'category' in hierarchy:
-        # Perplexity or other categorized
-        frontmatter['hierarchy'] = {
-            'level': ['category', 'topic'],
-            'category': hierarchy.get('category'),
-            'topic': hierarchy.get('topic')
-        }
-        frontmatter['hierarchy-full'] = \
-            f"{hierarchy.get('category')} > {hierarchy.get('topic')}"
-    
-    else:
-        # Generic
-        frontmatter['hierarchy'] = {
-            'level': ['topic'],
-            'topic': hierarchy.get('topic')
-        }
-        frontmatter['hierarchy-full'] = hierarchy.get('topic')
+    frontmatter.update(get_source_type(source_type).build_layer1_hierarchy(hierarchy))
     
     # Calculate chronological date if not set
     if not frontmatter['created-chronological']:
@@ -216,6 +142,27 @@ def build_layer1_frontmatter_dict(hierarchy: Dict, batch_id: str,
     return frontmatter
 
 
+def apply_layer1_to_content(content: str, frontmatter_dict: Dict) -> str:
+    """
+    Replace any existing frontmatter in content with Layer 1 frontmatter.
+    
+    Args:
+        content: Markdown file content
+        frontmatter_dict: Frontmatter dictionary
+    
+    Returns:
+        Content with frontmatter prepended
+    """
+    # Skip existing frontmatter
+    _, content = split_frontmatter(content)
+    
+    # Generate YAML frontmatter (fixed Layer 1 shape -> template serializer)
+    frontmatter_yaml = fast_dump_frontmatter(frontmatter_dict)
+    
+    # Combine frontmatter + content
+    return f"---\n{frontmatter_yaml}---\n{content}"
+
+
 def apply_layer1_to_file(file_path: Path, frontmatter_dict: Dict) -> str:
     """
     Add Layer 1 frontmatter to file content.
@@ -227,79 +174,82 @@ def apply_layer1_to_file(file_path: Path, frontmatter_dict: Dict) -> str:
     Returns:
         Content with frontmatter prepended
     """
-    # Read existing content
     with open(file_path, 'r', encoding='utf-8') as f:
         content = f.read()
     
-    # Skip existing frontmatter
-    if content.startswith('---'):
-        # Find end of existing frontmatter
-        end_marker = content.find('\n---\n')
-        if end_marker != -1:
-            content = content[end_marker + 5:]
-    
-    # Generate YAML frontmatter
-    frontmatter_yaml = yaml.dump(frontmatter_dict, default_flow_style=False, sort_keys=False)
-    
-    # Combine frontmatter + content
-    result = f"---\n{frontmatter_yaml}---\n{content}"
-    
-    return result
+    return apply_layer1_to_content(content, frontmatter_dict)
 
 
 def build_layer1_frontmatter(source_dir: Path, hierarchy_df: pd.DataFrame, 
                             batch_id: str, import_date: str, 
-                            output_dir: Path) -> Dict:
+                            output_dir: Path, fixed_dir: Path = None,
+                            source_type: str = 'unknown',
+                            max_workers: int = 4, max_pending: int = 50,
+                            store: NoteStore = None) -> Dict:
     """
     Build and apply Layer 1 frontmatter to all files.
     
+    Source files are read and results written on thread pools (see
+    io_pipeline) while frontmatter is built on the calling thread, so
+    storage latency overlaps with the transform.
+    
     Args:
         source_dir: Source directory with original files
         hierarchy_df: DataFrame from Task 2.1 with hierarchy mapping
         batch_id: Batch identifier
         import_date: Import date
         output_dir: Output directory for modified files
+        fixed_dir: Directory with lint-fixed copies (Stage 1 'copy' fix
+            mode); a copy there takes precedence over the source file
+        source_type: Source type, selects the Layer 1 hierarchy builder
+        max_workers: Reader threads and writer threads
+        max_pending: Files read ahead / queued for writing at most
+        store: Keep results in this note store instead of writing them
+            to output_dir (fused writes)
     
     Returns:
         Dictionary with processing statistics
     """
     logger.info(f"Building Layer 1 frontmatter for {len(hierarchy_df)} files...")
     
-    files_processed = 0
-    files_skipped = 0
+    def source_path_for(record: Dict) -> Path:
+        if fixed_dir and (fixed_dir / record['source_file_path']).exists():
+            return fixed_dir / record['source_file_path']
+        return source_dir / record['source_file_path']
+    
+    def read(record: Dict) -> str:
+        with open(source_path_for(record), 'r', encoding='utf-8') as f:
+            return f.read()
+    
+    def transform(record: Dict, content: str) -> str:
+        frontmatter_dict = build_layer1_frontmatter_dict(
+            record,
+            batch_id=batch_id,
+            import_date=import_date,
+            source_type=source_type
+        )
+        return apply_layer1_to_content(content, frontmatter_dict)
+    
+    target = open_notes(output_dir, store)
+    
+    def write(record: Dict, content: str) -> None:
+        target.write(record['file_name'], content)
+    
+    files_processed, errors = run_pipeline(
+        hierarchy_df.to_dict('records'),
+        read, transform, write,
+        write_key=lambda record: record['file_name'],
+        readers=max_workers,
+        writers=max_workers,
+        max_pending=max_pending
+    )
     
-    for _, row in hierarchy_df.iterrows():
-        file_name = row['file_name']
-        source_path = source_dir / row['source_file_path']
-        output_path = output_dir / file_name
-        
-        if not source_path.exists():
-            logger.warning(f"File not found: {source_path}")
-            files_skipped += 1
-            continue
-        
-        try:
-            # Build frontmatter
-            hierarchy_dict = row.to_dict()
-            frontmatter_dict = build_layer1_frontmatter_dict(
-                hierarchy_dict,
-                batch_id=batch_id,
-                import_date=import_date,
-                source_type='unknown'  # Will be updated in higher level
-            )
-            
-            # Apply to file
-            content_with_layer1 = apply_layer1_to_file(source_path, frontmatter_dict)
-            
-            # Save to output
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(content_with_layer1)
-            
-            files_processed += 1
-            
-        except Exception as e:
-            logger.error(f"Error processing {file_name}: {str(e)}")
-            files_skipped += 1
+    for record, error in errors:
+        if isinstance(error, FileNotFoundError):
+            logger.warning(f"File not found: {source_path_for(record)}")
+        else:
+            logger.error(f"Error processing {record['file_name']}: {str(error)}")
+    files_skipped = len(errors)
     
     logger.info(f"Layer 1 applied: {files_processed} processed, {files_skipped} skipped")
     
@@ -313,117 +263,79 @@ def build_layer1_frontmatter(source_dir: Path, hierarchy_df: pd.DataFrame,
 # Task 2.3: Validate Layer 1
 # =========================================================================
 
-def validate_frontmatter_structure(frontmatter_dict: Dict) -> Tuple[bool, List[str]]:
+def validate_frontmatter_structure(frontmatter_dict: Dict,
+                                   validator: FrontmatterValidator = None) -> Tuple[bool, List[str]]:
     """
     Validate Layer 1 frontmatter structure.
     
     Args:
         frontmatter_dict: Frontmatter dictionary to validate
+        validator: Compiled validator (defaults to the bundled schema)
     
     Returns:
         Tuple of (is_valid, list of issues)
     """
-    issues = []
-    required_fields = [
-        'source', 'import-batch', 'import-date', 'status',
-        'created-chronological', 'hierarchy', 'hierarchy-full'
-    ]
-    
-    # Check required fields
-    for field in required_fields:
-        if field not in frontmatter_dict:
-            issues.append(f"Missing required field: {field}")
-    
-    # Validate date formats
-    if 'import-date' in frontmatter_dict:
-        date_str = frontmatter_dict['import-date']
-        try:
-            datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-        except:
-            issues.append(f"Invalid import-date format: {date_str}")
-    
-    if 'created-chronological' in frontmatter_dict:
-        chrono = frontmatter_dict['created-chronological']
-        if not re.match(r'^\d{4}-W\d{2}$', chrono):
-            issues.append(f"Invalid chronological format: {chrono} (expected YYYY-WXX)")
-    
-    # Validate hierarchy
-    if 'hierarchy' in frontmatter_dict:
-        hierarchy = frontmatter_dict['hierarchy']
-        if not isinstance(hierarchy, dict):
-            issues.append("Hierarchy must be a dictionary")
-    
-    return len(issues) == 0, issues
+    return (validator or default_validator()).validate(frontmatter_dict)
 
 
-def validate_layer1(source_dir: Path, output_dir: Path) -> Dict:
+def validate_layer1(source_dir: Path, output_dir: Path,
+                    validator: FrontmatterValidator = None,
+                    store: NoteStore = None) -> Dict:
     """
     Validate Layer 1 frontmatter in all files.
     
     Args:
         source_dir: Directory with files containing Layer 1
         output_dir: Directory to save validation results
+        validator: Compiled validator (defaults to the bundled schema)
+        store: Read notes from this note store instead of source_dir
     
     Returns:
         Dictionary with validation statistics
     """
     logger.info("Validating Layer 1 integrity...")
     
+    validator = validator or default_validator()
+    notes = open_notes(source_dir, store)
     files_checked = 0
     files_passed = 0
     validation_issues = []
+    parsed = []
     
-    for md_file in source_dir.glob("*.md"):
+    for name in notes.names():
         files_checked += 1
         
         try:
-            with open(md_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # Extract frontmatter
-            if not content.startswith('---'):
-                validation_issues.append({
-                    'file': md_file.name,
-                    'status': 'FAIL',
-                    'issue': 'No frontmatter found'
-                })
-                continue
-            
-            end_marker = content.find('\n---\n')
-            if end_marker == -1:
-                validation_issues.append({
-                    'file': md_file.name,
-                    'status': 'FAIL',
-                    'issue': 'Frontmatter not properly closed'
-                })
-                continue
-            
-            yaml_str = content[4:end_marker]
-            frontmatter_dict = yaml.safe_load(yaml_str)
-            
-            # Validate structure
-            is_valid, issues = validate_frontmatter_structure(frontmatter_dict)
-            
-            if is_valid:
-                files_passed += 1
-                validation_issues.append({
-                    'file': md_file.name,
-                    'status': 'PASS',
-                    'issue': None
-                })
-            else:
-                validation_issues.append({
-                    'file': md_file.name,
-                    'status': 'FAIL',
-                    'issue': '; '.join(issues[:3])
-                })
-        
+            content = notes.read(name)
         except Exception as e:
             validation_issues.append({
-                'file': md_file.name,
+                'file': name,
                 'status': 'ERROR',
                 'issue': str(e)
             })
+            continue
+        
+        frontmatter_dict, issue = read_frontmatter(content)
+        if issue:
+            validation_issues.append({
+                'file': name,
+                'status': 'FAIL',
+                'issue': issue
+            })
+        else:
+            row = {'file': name, 'status': None, 'issue': None}
+            validation_issues.append(row)
+            parsed.append((row, frontmatter_dict))
+    
+    # Validate structure for the whole batch at once
+    batch_issues = validator.validate_batch(frontmatter_dict for _, frontmatter_dict in parsed)
+    for (row, _), issues in zip(parsed, batch_issues):
+        if issues:
+            row['status'] = 'FAIL'
+            row['issue'] = '; '.join(issues)
+        else:
+            row['status'] = 'PASS'
+            files_passed += 1
     
     # Save results
     pd.DataFrame(validation_issues).to_csv(
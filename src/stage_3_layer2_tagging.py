@@ -8,16 +8,31 @@ Tasks:
 - 3.3: Validate and apply tags
 """
 
-import re
 from pathlib import Path
-from typing import Dict, List, Set, Tuple
-import pandas as pd
+from typing import Dict, Iterator, List, Set, Tuple
 import json
 import logging
 from collections import Counter
 
+from frontmatter import split_frontmatter, frontmatter_end
+from note_store import DirectoryNotes, NoteStore, open_notes
+from term_matcher import TermMatcher
+from keyword_scoring import DocumentFrequencies, keyword_tokens
+from tokenizer import scan_outline, tokenize
+from domain_index import DomainIndex
+from layer2_results import NoteKeywords, NoteTags, ReportWriter, iter_report, split_list, write_report
+from result_cache import ResultCache, fingerprint, file_fingerprint
+from tag_validation import TagValidator, validate_tag_format
+from tokenizer import content_key
+
 logger = logging.getLogger(__name__)
 
+# Bump when extraction or mapping logic changes, so cached results stop matching
+RESULT_CACHE_VERSION = 2
+
+# Rows read per chunk when a task re-reads an earlier task's report
+REPORT_CHUNK_SIZE = 1000
+
 
 # Task 3.1: Extract Keywords
 # =========================================================================
@@ -25,19 +40,33 @@ logger = logging.getLogger(__name__)
 class KeywordExtractor:
     """Extract keywords and infer domain from content."""
     
-    def __init__(self, domain_db: str = None, tech_terms_db: str = None):
-        """Initialize with optional databases."""
+    def __init__(self, domain_db: str = None, tech_terms_db: str = None,
+                 cache: ResultCache = None):
+        """
+        Initialize with optional databases.
+        
+        Args:
+            domain_db: Path to domain database
+            tech_terms_db: Path to technical terms database
+            cache: Reuse results for content seen with the same terms
+        """
         self.domains = {}
         self.technical_terms = set()
+        self.cache = cache
         
         if tech_terms_db and Path(tech_terms_db).exists():
             with open(tech_terms_db, 'r') as f:
                 data = json.load(f)
-                self.technical_terms = set(data.get('terms', []))
+                self.technical_terms = set(data.get('technical_terms', data.get('terms', [])))
+        
+        # Built once: finds every term in a single pass over each file
+        self.term_matcher = TermMatcher(sorted(self.technical_terms))
         
         if domain_db and Path(domain_db).exists():
             with open(domain_db, 'r') as f:
                 self.domains = json.load(f)
+        
+        self.fingerprint = fingerprint(RESULT_CACHE_VERSION, sorted(self.technical_terms))
     
     def extract_from_content(self, content: str) -> Dict:
         """
@@ -46,36 +75,39 @@ class KeywordExtractor:
         Returns:
             Dict with keywords, domain, topics, and confidence
         """
+        if self.cache is None:
+            return self._extract(content)
+        
+        # Extraction only looks at the body, and frontmatter carries per-run
+        # values (import-date), so the body alone keys the result
+        key = ResultCache.key('keywords', self.fingerprint,
+                              content_key(content[frontmatter_end(content):]))
+        extracted = self.cache.get(key)
+        if extracted is None:
+            extracted = self._extract(content)
+            self.cache.put(key, extracted)
+        return dict(extracted)
+    
+    def _extract(self, content: str) -> Dict:
+        # One shared scan: words, title (first H1) and H1-H3 headings
+        # outside frontmatter and code
+        doc = tokenize(content)
+        title = doc.title()
+        headings = doc.heading_texts(3)
+        
+        # First paragraph only: the outline scan stops as soon as it is found
+        first_para = scan_outline(content, max_level=0, para_chars=200,
+                                  max_headings=0, find_title=False).first_para
+        
         # Skip frontmatter
-        if content.startswith('---'):
-            end_marker = content.find('\n---\n')
-            if end_marker != -1:
-                content = content[end_marker + 5:]
-        
-        # Extract title (usually first heading)
-        title = None
-        title_match = re.search(r'^#\s+(.+)$', content, re.MULTILINE)
-        if title_match:
-            title = title_match.group(1)
-        
-        # Extract first paragraph
-        first_para = None
-        para_match = re.search(r'\n\n(.+?)(?:\n\n|\n#)', content, re.DOTALL)
-        if para_match:
-            first_para = para_match.group(1)[:200]
-        
-        # Extract all headings
-        headings = re.findall(r'^#{1,3}\s+(.+)$', content, re.MULTILINE)
-        
-        # Find technical terms mentioned
-        mentioned_terms = []
-        for term in self.technical_terms:
-            if term.lower() in content.lower():
-                mentioned_terms.append(term)
+        _, content = split_frontmatter(content)
+        
+        # Find technical terms mentioned (whole words), most frequent first
+        term_counts = self.term_matcher.count(content)
+        mentioned_terms = sorted(term_counts, key=lambda term: (-term_counts[term], term))
         
         # Extract key concepts (words appearing multiple times)
-        words = re.findall(r'\b[a-z][a-z\-]+\b', content.lower())
-        word_counts = Counter(words)
+        word_counts = Counter(word for word, _, _, _ in doc.words)
         
         # Filter out common words
         common_words = {'the', 'and', 'or', 'is', 'a', 'an', 'to', 'of', 'in', 'for', 'with', 'on', 'at', 'by'}
@@ -88,13 +120,48 @@ class KeywordExtractor:
             'title': title or 'Untitled',
             'keywords': key_concepts[:10],
             'technical_terms': mentioned_terms,
+            'technical_term_counts': {term: term_counts[term] for term in mentioned_terms},
             'headings': headings,
             'first_para': first_para or '',
         }
 
 
+def _chunks(items: List, size: int = None) -> Iterator[List]:
+    """Consecutive slices of at most size items (one slice if size is None)."""
+    size = size or max(1, len(items))
+    for first in range(0, len(items), size):
+        yield items[first:first + size]
+
+
+def corpus_frequencies(notes, names: List[str] = None) -> DocumentFrequencies:
+    """
+    Document frequencies of keyword tokens over a batch, reading one note
+    at a time (first pass of chunked TF-IDF).
+    
+    Args:
+        notes: NoteStore or DirectoryNotes with the batch
+        names: Notes to count (default: all)
+    
+    Returns:
+        DocumentFrequencies
+    """
+    frequencies = DocumentFrequencies()
+    for name in (notes.names() if names is None else names):
+        try:
+            frequencies.add(keyword_tokens(notes.read(name)))
+        except Exception as e:
+            logger.warning(f"Error reading {name}: {str(e)}")
+    return frequencies
+
+
 def extract_keywords(source_dir: Path, domain_db: str = None, 
-                    tech_terms_db: str = None, output_dir: Path = None) -> Dict:
+                    tech_terms_db: str = None, output_dir: Path = None,
+                    store: NoteStore = None, method: str = 'tfidf',
+                    top_k: int = 10, min_count: int = 2,
+                    reports: ReportWriter = None, cache: ResultCache = None,
+                    names: List[str] = None, frequencies: DocumentFrequencies = None,
+                    batch_size: int = None, append: bool = False,
+                    extractor: KeywordExtractor = None) -> Dict:
     """
     Extract keywords from all files.
     
@@ -103,44 +170,77 @@ def extract_keywords(source_dir: Path, domain_db: str = None,
         domain_db: Path to domain database
         tech_terms_db: Path to technical terms database
         output_dir: Output directory for results
+        store: Read notes from this note store instead of source_dir
+        method: 'tfidf' ranks keywords by TF-IDF across the whole batch;
+            'frequency' by raw count within each file
+        top_k: Keywords kept per file (tfidf)
+        min_count: Minimum occurrences of a keyword in its file (tfidf)
+        reports: Write content-keywords.csv in the background
+        cache: Persistent result cache (unchanged notes skip extraction)
+        names: Only process these notes (one chunk of a larger batch)
+        frequencies: Document frequencies of the whole batch (tfidf);
+            counted from the processed notes if not given
+        batch_size: Notes read, scored and reported per chunk
+        append: Append to content-keywords.csv (written by an earlier chunk)
+        extractor: Loaded term databases (built from domain_db and
+            tech_terms_db if not given)
     
     Returns:
-        Dictionary with extraction statistics
+        Dictionary with extraction statistics; 'results' holds the
+        NoteKeywords for Task 3.2
     """
     logger.info("Extracting keywords from content...")
     
-    extractor = KeywordExtractor(domain_db, tech_terms_db)
+    if extractor is None:
+        extractor = KeywordExtractor(domain_db, tech_terms_db, cache)
+    notes = open_notes(source_dir, store)
+    names = notes.names() if names is None else names
+    
+    # TF-IDF needs corpus-wide document frequencies before any chunk is ranked
+    if method == 'tfidf' and frequencies is None:
+        frequencies = corpus_frequencies(notes, names)
     
     keywords_list = []
     files_processed = 0
     
-    for md_file in source_dir.glob("*.md"):
-        try:
-            with open(md_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            extracted = extractor.extract_from_content(content)
-            extracted['file_name'] = md_file.name
-            keywords_list.append(extracted)
-            files_processed += 1
-            
-        except Exception as e:
-            logger.warning(f"Error extracting keywords from {md_file.name}: {str(e)}")
-    
-    # Save results
-    if output_dir:
-        df = pd.DataFrame(keywords_list)
-        # Convert lists to strings for CSV
-        for col in ['keywords', 'technical_terms', 'headings']:
-            df[col] = df[col].apply(lambda x: '; '.join(x) if isinstance(x, list) else x)
-        
-        df.to_csv(output_dir / "content-keywords.csv", index=False)
+    for chunk in _chunks(names, batch_size):
+        chunk_keywords = []
+        token_lists = []
+        for name in chunk:
+            try:
+                content = notes.read(name)
+                
+                extracted = NoteKeywords(file_name=name, **extractor.extract_from_content(content))
+                if method == 'tfidf':
+                    token_lists.append(keyword_tokens(content))
+                chunk_keywords.append(extracted)
+                files_processed += 1
+                
+            except Exception as e:
+                logger.warning(f"Error extracting keywords from {name}: {str(e)}")
+        
+        # Rank keywords against the whole batch
+        if method == 'tfidf' and chunk_keywords:
+            ranked = frequencies.top_k_tfidf(token_lists, k=top_k, min_count=min_count)
+            for extracted, keywords in zip(chunk_keywords, ranked):
+                extracted.keywords = keywords
+        
+        # Save results
+        if output_dir:
+            write_report([extracted.to_row() for extracted in chunk_keywords],
+                         output_dir / "content-keywords.csv", reports, append)
+            append = True
+        keywords_list.extend(chunk_keywords)
+    
+    if output_dir and not append:
+        write_report([], output_dir / "content-keywords.csv", reports)
     
     logger.info(f"Keywords extracted from {files_processed} files")
     
     return {
         'files_processed': files_processed,
-        'keywords_extracted': len(keywords_list)
+        'keywords_extracted': len(keywords_list),
+        'results': keywords_list
     }
 
 
@@ -150,52 +250,80 @@ def extract_keywords(source_dir: Path, domain_db: str = None,
 class TagMapper:
     """Map keywords to multi-dimensional tags."""
     
-    def __init__(self, tag_schema: str = None, source_mappings: Dict = None):
-        """Initialize with tag schema."""
+    def __init__(self, tag_schema: str = None, source_mappings: Dict = None,
+                 cache: ResultCache = None):
+        """
+        Initialize with tag schema.
+        
+        Args:
+            tag_schema: Path to tag schema JSON
+            source_mappings: Source type -> domain mapping CSV path (or a
+                dict of title pattern -> domain tag)
+            cache: Reuse results for keywords seen with the same schema and
+                mappings
+        """
         self.tag_schema = {}
         self.source_mappings = source_mappings or {}
+        self.cache = cache
+        self._domain_indexes = {}
+        self._fingerprints = {}
         
         if tag_schema and Path(tag_schema).exists():
             with open(tag_schema, 'r') as f:
                 self.tag_schema = json.load(f)
     
-    def map_to_domain_tags(self, keywords: List[str], title: str, 
-                           source_type: str = None) -> List[str]:
-        """Map keywords to domain tags."""
-        tags = []
-        
-        # Check source-specific mappings first
-        if source_type and source_type in self.source_mappings:
-            mapping = self.source_mappings[source_type]
-            # Try to match title or keywords against mapping
-            for key_pattern, tag_value in mapping.items():
-                if key_pattern.lower() in title.lower():
-                    tags.append(tag_value)
-                    break
-        
-        # Default domain inference
-        domain_keywords = {
-            'cybersecurity': ['security', 'network', 'firewall', 'encryption', 'attack', 'threat'],
-            'networking': ['network', 'router', 'protocol', 'tcp', 'ip', 'dns'],
-            'systems': ['system', 'server', 'os', 'linux', 'windows', 'admin'],
-            'development': ['code', 'program', 'api', 'database', 'app', 'script'],
-            'virtualization': ['virtual', 'hypervisor', 'vm', 'container', 'docker'],
-        }
-        
-        primary_domain = None
-        max_matches = 0
+    def domain_index(self, source_type: str = None) -> DomainIndex:
+        """Domain rules for a source type, compiled on first use."""
+        if source_type not in self._domain_indexes:
+            self._domain_indexes[source_type] = DomainIndex.from_sources(
+                self.tag_schema, self.source_mappings.get(source_type)
+            )
+        return self._domain_indexes[source_type]
+    
+    def cache_key(self, keywords: Dict, source_type: str = None) -> bytes:
+        """
+        Result cache key for one file's keywords under this schema and mappings.
         
-        for domain, keywords_list in domain_keywords.items():
-            matches = sum(1 for kw in keywords if kw.lower() in title.lower() 
-                         or any(dk in kw.lower() for dk in keywords_list))
-            if matches > max_matches:
-                max_matches = matches
-                primary_domain = domain
+        TF-IDF keywords are ranked against the whole batch, so a note's tags
+        are reused when the batch is imported again unchanged; a note that
+        moves to a different batch gets new keywords and is mapped afresh.
+        """
+        if source_type not in self._fingerprints:
+            mapping = self.source_mappings.get(source_type)
+            self._fingerprints[source_type] = fingerprint(
+                RESULT_CACHE_VERSION, source_type, self.tag_schema,
+                mapping if isinstance(mapping, dict) else [mapping, file_fingerprint(mapping)]
+            )
+        inputs = fingerprint(keywords.get('title', ''), keywords.get('keywords', []),
+                             keywords.get('headings', []), len(keywords.get('first_para', '')))
+        return ResultCache.key('tags', self._fingerprints[source_type], inputs.encode())
+    
+    def is_cached(self, keywords: Dict, source_type: str = None) -> bool:
+        """Whether map_keywords_to_all_tags would be answered from the cache."""
+        return self.cache is not None and self.cache_key(keywords, source_type) in self.cache
+    
+    def map_to_domain_tags_batch(self, documents: List[Tuple],
+                                 source_type: str = None) -> List[List[str]]:
+        """
+        Map many documents' keywords, titles and headings to domain tags at
+        once. Each tag is the deepest confident taxonomy path, e.g.
+        #domain/cybersecurity/network-security/firewalls.
         
-        if primary_domain:
-            tags.append(f"#domain/{primary_domain}")
+        Args:
+            documents: (keywords, title) or (keywords, title, headings) per
+                document
+            source_type: Selects the source-specific domain mappings
         
-        return tags
+        Returns:
+            List of domain tag lists, one per document
+        """
+        domains = self.domain_index(source_type).best_domains(documents)
+        return [[f"#domain/{domain}"] if domain else [] for domain in domains]
+    
+    def map_to_domain_tags(self, keywords: List[str], title: str, 
+                           source_type: str = None, headings: List[str] = None) -> List[str]:
+        """Map keywords to domain tags."""
+        return self.map_to_domain_tags_batch([(keywords, title, headings or [])], source_type)[0]
     
     def map_to_activity_tags(self, title: str, content_length: int) -> List[str]:
         """Infer activity tags from content."""
@@ -229,13 +357,26 @@ class TagMapper:
         tags = [source_tag, "#quality/unverified"]
         return tags
     
-    def map_keywords_to_all_tags(self, keywords: Dict, source_type: str = None) -> Dict:
+    def map_keywords_to_all_tags(self, keywords: Dict, source_type: str = None,
+                                 domain_tags: List[str] = None) -> Dict:
         """
         Map keywords to all 8 tag dimensions.
         
+        Args:
+            keywords: Title, keywords, headings and first paragraph of a file
+            source_type: Type of source
+            domain_tags: Domain tags already computed in a batch
+        
         Returns:
             Dictionary with tags for each dimension
         """
+        key = None
+        if self.cache is not None:
+            key = self.cache_key(keywords, source_type)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return {name: list(tags) for name, tags in cached.items()}
+        
         all_tags = {}
         
         # Extract components
@@ -244,7 +385,10 @@ class TagMapper:
         content_length = len(keywords.get('first_para', ''))
         
         # Domain tags
-        all_tags['domain_tags'] = self.map_to_domain_tags(keyword_list, title, source_type)
+        if domain_tags is None:
+            domain_tags = self.map_to_domain_tags(keyword_list, title, source_type,
+                                                  keywords.get('headings', []))
+        all_tags['domain_tags'] = domain_tags
         
         # Activity tags
         all_tags['activity_tags'] = self.map_to_activity_tags(title, content_length)
@@ -267,101 +411,165 @@ class TagMapper:
         # Source tags
         all_tags['source_tags'] = self.map_to_source_tags(source_type or 'unknown')
         
+        if key is not None:
+            self.cache.put(key, {name: list(tags) for name, tags in all_tags.items()})
+        
         return all_tags
 
 
-def map_keywords_to_tags(source_dir: Path, keywords_file: Path, 
-                        source_type: str, tag_schema: str = None,
-                        source_mappings: Dict = None, output_dir: Path = None) -> Dict:
+def _keyword_chunks(keywords: List[NoteKeywords], keywords_file: Path,
+                   batch_size: int = None) -> Iterator[List[NoteKeywords]]:
+    """Task 3.1 results in chunks, from memory or from content-keywords.csv."""
+    if keywords is not None:
+        yield from _chunks(keywords, batch_size)
+    else:
+        for rows in iter_report(keywords_file, batch_size or REPORT_CHUNK_SIZE):
+            yield [NoteKeywords.from_row(row) for row in rows]
+
+
+def map_keywords_to_tags(source_dir: Path, keywords_file: Path = None, 
+                        source_type: str = None, tag_schema: str = None,
+                        source_mappings: Dict = None, output_dir: Path = None,
+                        keywords: List[NoteKeywords] = None,
+                        reports: ReportWriter = None, cache: ResultCache = None,
+                        predicted_tags: Dict[str, Dict[str, str]] = None,
+                        batch_size: int = None, append: bool = False,
+                        mapper: TagMapper = None) -> Dict:
     """
     Map keywords to tags for all files.
     
     Args:
         source_dir: Directory with markdown files
-        keywords_file: CSV file with extracted keywords
+        keywords_file: CSV file with extracted keywords (read only when
+            keywords is not given)
         source_type: Type of source (for source tags)
         tag_schema: Path to tag schema JSON
-        source_mappings: Dictionary of source-specific mappings
+        source_mappings: Source type -> domain mapping CSV (config
+            'domain_mappings')
         output_dir: Output directory for results
+        keywords: Task 3.1 results, handed over in memory
+        reports: Write tags-mapped.csv in the background
+        cache: Persistent result cache (unchanged keywords skip mapping)
+        predicted_tags: File name -> {'domain': tag, 'activity': tag} from
+            the LSA classifier; these replace the heuristic tags
+        batch_size: Notes mapped and reported per chunk (and rows read per
+            chunk from keywords_file)
+        append: Append to tags-mapped.csv (written by an earlier chunk)
+        mapper: Loaded schema and domain rules (built from tag_schema and
+            source_mappings if not given)
     
     Returns:
-        Dictionary with tagging statistics
+        Dictionary with tagging statistics; 'results' holds the NoteTags
+        for Task 3.3
     """
     logger.info("Mapping keywords to tags...")
     
-    mapper = TagMapper(tag_schema, source_mappings)
-    
-    # Load keywords
-    keywords_df = pd.read_csv(keywords_file)
+    if mapper is None:
+        mapper = TagMapper(tag_schema, source_mappings, cache)
     
     all_tags_list = []
     files_processed = 0
     
-    for _, row in keywords_df.iterrows():
-        try:
-            keywords_dict = {
-                'title': row['title'],
-                'keywords': row['keywords'].split('; ') if pd.notna(row['keywords']) else [],
-                'first_para': row['first_para'] if pd.notna(row['first_para']) else '',
+    for chunk in _keyword_chunks(keywords, keywords_file, batch_size):
+        chunk_tags = []
+        keywords_dicts = [
+            {
+                'title': note.title,
+                'keywords': note.keywords,
+                'headings': note.headings,
+                'first_para': note.first_para,
             }
-            
-            tags_dict = mapper.map_keywords_to_all_tags(keywords_dict, source_type)
-            tags_dict['file_name'] = row['file_name']
-            all_tags_list.append(tags_dict)
-            files_processed += 1
-            
-        except Exception as e:
-            logger.warning(f"Error mapping tags for {row['file_name']}: {str(e)}")
-    
-    # Save results
-    if output_dir:
-        df = pd.DataFrame(all_tags_list)
-        # Convert lists to strings for CSV
-        for col in df.columns:
-            if col != 'file_name':
-                df[col] = df[col].apply(lambda x: '; '.join(x) if isinstance(x, list) else x)
+            for note in chunk
+        ]
         
-        df.to_csv(output_dir / "tags-mapped.csv", index=False)
+        # Domain inference for the whole chunk at once (cached files excluded)
+        pending = [i for i, keywords_dict in enumerate(keywords_dicts)
+                   if not mapper.is_cached(keywords_dict, source_type)]
+        domain_tags = [None] * len(chunk)
+        for i, domains in zip(pending, mapper.map_to_domain_tags_batch(
+                [(chunk[i].keywords, chunk[i].title, chunk[i].headings) for i in pending],
+                source_type)):
+            domain_tags[i] = domains
+        
+        for note, keywords_dict, domains in zip(chunk, keywords_dicts, domain_tags):
+            try:
+                tags_dict = mapper.map_keywords_to_all_tags(keywords_dict, source_type, domain_tags=domains)
+                for dimension, tag in (predicted_tags or {}).get(note.file_name, {}).items():
+                    tags_dict[f"{dimension}_tags"] = [tag]
+                chunk_tags.append(NoteTags(file_name=note.file_name, **tags_dict))
+                files_processed += 1
+                
+            except Exception as e:
+                logger.warning(f"Error mapping tags for {note.file_name}: {str(e)}")
+        
+        # Save results
+        if output_dir:
+            write_report([tags.to_row() for tags in chunk_tags],
+                         output_dir / "tags-mapped.csv", reports, append)
+            append = True
+        all_tags_list.extend(chunk_tags)
+    
+    if output_dir and not append:
+        write_report([], output_dir / "tags-mapped.csv", reports)
     
     logger.info(f"Tags mapped for {files_processed} files")
     
     return {
         'files_processed': files_processed,
-        'tags_mapped': len(all_tags_list)
+        'tags_mapped': len(all_tags_list),
+        'results': all_tags_list
     }
 
 
 # Task 3.3: Validate & Apply Tags
 # =========================================================================
 
-def validate_tag_format(tag: str) -> Tuple[bool, str]:
+def apply_tags_to_content(content: str, tags_dict: Dict) -> str:
     """
-    Validate a single tag format.
+    Insert the Layer 2 tags section after the frontmatter.
+    
+    Args:
+        content: Markdown file content
+        tags_dict: Dictionary with all tags
     
     Returns:
-        Tuple of (is_valid, error_message)
+        Content with tags section
     """
-    if not tag.startswith('#'):
-        return False, "Tag must start with #"
-    
-    # Remove # for further validation
-    tag_content = tag[1:]
-    
-    # Check for valid characters
-    if not re.match(r'^[a-z0-9/_\-:]+$', tag_content):
-        return False, "Tag contains invalid characters"
-    
-    # If it has a level (::), validate it
-    if '::' in tag:
-        parts = tag_content.split('::')
-        if len(parts) != 2:
-            return False, "Invalid level specification (should be tag::level)"
+    # Find where to insert tags (after frontmatter, before content)
+    body_start = frontmatter_end(content)
+    before_content = content[:body_start]
+    main_content = content[body_start:]
+    
+    # Build tags section
+    tags_section = "## Tags\n\n"
+    
+    # Collect all tags (lists, or '; '-joined strings as in tags-mapped.csv)
+    all_tags = []
+    for key, tags in tags_dict.items():
+        if key == 'file_name':
+            continue
+        if isinstance(tags, str):
+            tags = split_list(tags)
+        if isinstance(tags, list):
+            all_tags.extend([t.strip() for t in tags if t.strip()])
+    
+    # Remove duplicates and placeholders
+    all_tags = list(set([t for t in all_tags if t and '/' in t]))
+    
+    tags_section += " ".join(sorted(all_tags)) + "\n\n"
+    
+    return before_content + tags_section + main_content
+
+
+def _apply_tags(notes, file_name: str, tags_dict: Dict) -> bool:
+    """Apply tags to one note of a note store or directory."""
+    try:
+        notes.write(file_name, apply_tags_to_content(notes.read(file_name), tags_dict))
+        return True
         
-        valid_levels = ['novice', 'beginner', 'intermediate', 'competent', 'expert', 'gap', 'strength', 'ready']
-        if parts[1] not in valid_levels:
-            return False, f"Invalid level: {parts[1]}"
-    
-    return True, ""
+    except Exception as e:
+        logger.error(f"Error applying tags to {file_name}: {str(e)}")
+        return False
 
 
 def apply_tags_to_file(file_path: Path, tags_dict: Dict) -> bool:
@@ -375,123 +583,98 @@ def apply_tags_to_file(file_path: Path, tags_dict: Dict) -> bool:
     Returns:
         True if successful
     """
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # Find where to insert tags (after frontmatter, before content)
-        if content.startswith('---'):
-            end_marker = content.find('\n---\n')
-            if end_marker != -1:
-                frontmatter_end = end_marker + 5
-                before_content = content[:frontmatter_end]
-                main_content = content[frontmatter_end:]
-            else:
-                before_content = ''
-                main_content = content
-        else:
-            before_content = ''
-            main_content = content
-        
-        # Build tags section
-        tags_section = "## Tags\n\n"
-        
-        # Collect all tags
-        all_tags = []
-        for key, tags in tags_dict.items():
-            if key != 'file_name' and isinstance(tags, str):
-                all_tags.extend([t.strip() for t in tags.split(';') if t.strip()])
-        
-        # Remove duplicates and placeholders
-        all_tags = list(set([t for t in all_tags if t and '/' in t]))
-        
-        tags_section += " ".join(sorted(all_tags)) + "\n\n"
-        
-        # Combine and save
-        new_content = before_content + tags_section + main_content
-        
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(new_content)
-        
-        return True
-        
-    except Exception as e:
-        logger.error(f"Error applying tags to {file_path}: {str(e)}")
-        return False
+    return _apply_tags(DirectoryNotes(file_path.parent), file_path.name, tags_dict)
+
+
+def _tag_chunks(tags: List[NoteTags], tags_file: Path,
+                batch_size: int = None) -> Iterator[List[NoteTags]]:
+    """Task 3.2 results in chunks, from memory or from tags-mapped.csv."""
+    if tags is not None:
+        yield from _chunks(tags, batch_size)
+    else:
+        for rows in iter_report(tags_file, batch_size or REPORT_CHUNK_SIZE):
+            yield [NoteTags.from_row(row) for row in rows]
 
 
-def validate_tags(source_dir: Path, tags_file: Path, tag_schema: str = None,
-                 output_dir: Path = None) -> Dict:
+def validate_tags(source_dir: Path, tags_file: Path = None, tag_schema: str = None,
+                 output_dir: Path = None, store: NoteStore = None,
+                 tags: List[NoteTags] = None, reports: ReportWriter = None,
+                 validator: TagValidator = None, batch_size: int = None,
+                 append: bool = False) -> Dict:
     """
     Validate and apply tags to all files.
     
     Args:
         source_dir: Directory with markdown files
-        tags_file: CSV file with tags to apply
+        tags_file: CSV file with tags to apply (read only when tags is not
+            given)
         tag_schema: Path to tag schema for validation
         output_dir: Output directory for results
+        store: Apply tags to the notes in this note store instead of the
+            files in source_dir
+        tags: Task 3.2 results, handed over in memory
+        reports: Write tags-validation-results.csv in the background
+        validator: Compiled tag rules (built from tag_schema if not given)
+        batch_size: Notes validated and reported per chunk (and rows read
+            per chunk from tags_file)
+        append: Append to tags-validation-results.csv (written by an
+            earlier chunk)
     
     Returns:
         Dictionary with validation statistics
     """
     logger.info("Validating and applying tags...")
     
-    tags_df = pd.read_csv(tags_file)
+    notes = open_notes(source_dir, store)
+    if validator is None:
+        validator = TagValidator.from_config(tag_schema=tag_schema)
     
-    validation_results = []
     files_checked = 0
     files_passed = 0
     
-    for _, row in tags_df.iterrows():
-        file_path = source_dir / row['file_name']
-        files_checked += 1
-        
-        issues = []
-        
-        # Collect all tags from row
-        all_tags = []
-        for col in tags_df.columns:
-            if col != 'file_name' and pd.notna(row[col]):
-                tags_list = [t.strip() for t in str(row[col]).split(';')]
-                all_tags.extend(tags_list)
-        
-        # Validate each tag
-        for tag in all_tags:
-            if tag:
-                is_valid, error = validate_tag_format(tag)
-                if not is_valid:
-                    issues.append(f"{tag}: {error}")
-        
-        if not issues:
-            # Apply tags to file
-            if apply_tags_to_file(file_path, row.to_dict()):
-                files_passed += 1
-                validation_results.append({
-                    'file': row['file_name'],
-                    'status': 'PASS',
-                    'tags_count': len([t for t in all_tags if t]),
-                    'issues': None
-                })
+    for chunk in _tag_chunks(tags, tags_file, batch_size):
+        validation_results = []
+        
+        # Each distinct tag is checked once per chunk
+        tag_lists = [note_tags.all_tags() for note_tags in chunk]
+        batch_issues = validator.validate_batch(tag_lists)
+        
+        for note_tags, all_tags, issues in zip(chunk, tag_lists, batch_issues):
+            files_checked += 1
+            
+            if not issues:
+                # Apply tags to file
+                if _apply_tags(notes, note_tags.file_name, note_tags.dimensions()):
+                    files_passed += 1
+                    validation_results.append({
+                        'file': note_tags.file_name,
+                        'status': 'PASS',
+                        'tags_count': len([t for t in all_tags if t]),
+                        'issues': None
+                    })
+                else:
+                    validation_results.append({
+                        'file': note_tags.file_name,
+                        'status': 'FAIL',
+                        'tags_count': len(all_tags),
+                        'issues': 'Failed to apply tags'
+                    })
             else:
                 validation_results.append({
-                    'file': row['file_name'],
+                    'file': note_tags.file_name,
                     'status': 'FAIL',
                     'tags_count': len(all_tags),
-                    'issues': 'Failed to apply tags'
+                    'issues': '; '.join(issues[:3])
                 })
-        else:
-            validation_results.append({
-                'file': row['file_name'],
-                'status': 'FAIL',
-                'tags_count': len(all_tags),
-                'issues': '; '.join(issues[:3])
-            })
-    
-    # Save results
-    if output_dir:
-        pd.DataFrame(validation_results).to_csv(
-            output_dir / "tags-validation-results.csv", index=False
-        )
+        
+        # Save results
+        if output_dir:
+            write_report(validation_results, output_dir / "tags-validation-results.csv",
+                         reports, append)
+            append = True
+    
+    if output_dir and not append:
+        write_report([], output_dir / "tags-validation-results.csv", reports)
     
     logger.info(f"Tag validation: {files_passed}/{files_checked} passed")
     
@@ -503,6 +686,30 @@ def validate_tags(source_dir: Path, tags_file: Path, tag_schema: str = None,
 
 
 if __name__ == '__main__':
+    import random
+    import tempfile
+    
+    # Importing an unchanged batch again, in any order, is answered from the cache
+    rng = random.Random(7)
+    words = ["docker", "container", "firewall", "network", "packet", "python", "module",
+             "function", "kubernetes", "cluster", "routing", "socket", "process", "memory"]
+    with tempfile.TemporaryDirectory() as tmp:
+        batch_dir = Path(tmp)
+        for i in range(120):
+            body = ' '.join(rng.choice(words) for _ in range(rng.randint(20, 80)))
+            (batch_dir / f"note{i:03d}.md").write_text(f"# Note {i}\n\n{body}\n", encoding='utf-8')
+        names = sorted(DirectoryNotes(batch_dir).names())
+        cache = ResultCache()
+        for run in range(2):
+            cache.hits = cache.misses = 0
+            order = rng.sample(names, len(names)) if run else names
+            keywords_result = extract_keywords(batch_dir, cache=cache, names=order, batch_size=50)
+            map_keywords_to_tags(batch_dir, source_type='test', cache=cache,
+                                 keywords=keywords_result['results'], batch_size=50)
+        assert cache.misses == 0 and cache.hits == 2 * len(names), (cache.hits, cache.misses)
+        assert len(cache) == 2 * len(names), len(cache)
+    print("result cache reuse: ok")
+    
     # For testing
     test_dir = Path('./test_files')
     output = Path('./stage_3_output')
@@ -8,119 +8,197 @@ Tasks:
 - 4.3: Validate structure
 """
 
-import re
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, Iterator, List, Tuple
 import pandas as pd
 import logging
 
+from ann_index import AnnIndex
+from connection_index import (
+    DEFAULT_MAX_DOCUMENT_SHARE, DEFAULT_MIN_SCORE, DEFAULT_TOP_K, TITLE_WEIGHT,
+    ConnectionIndex, NoteConnections, iter_graph_pages, note_terms, page_name,
+    page_terms, tag_features
+)
+from frontmatter import frontmatter_end
+from graph_index import GraphIndex
+from keyword_scoring import keyword_tokens
+from layer2_results import NoteKeywords, NoteTags, iter_report, write_report
+from note_store import DirectoryNotes, NoteStore, open_notes
+from tokenizer import tokenize
+
 logger = logging.getLogger(__name__)
 
 
+def _batch_features(source_dir: Path, notes, chunk_size: int) -> Iterator[Tuple[str, Dict[str, float], str, int]]:
+    """
+    (file name, weighted terms, domain, level) of every batch note, from the
+    Stage 3 reports in source_dir, or from the notes themselves without them.
+    """
+    keywords_file = source_dir / "content-keywords.csv"
+    tags_file = source_dir / "tags-mapped.csv"
+    
+    if not keywords_file.exists():
+        for name in notes.names():
+            content = notes.read(name)
+            domain, level = tag_features(tag for tag, _, _, _ in tokenize(content).tags)
+            yield name, page_terms(page_name(name), content), domain, level
+        return
+    
+    tag_features_by_file = {}
+    if tags_file.exists():
+        for rows in iter_report(tags_file, chunk_size):
+            for row in rows:
+                tags = NoteTags.from_row(row)
+                tag_features_by_file[tags.file_name] = tag_features(tags.all_tags())
+    
+    for rows in iter_report(keywords_file, chunk_size):
+        for row in rows:
+            keywords = NoteKeywords.from_row(row)
+            domain, level = tag_features_by_file.get(keywords.file_name, ('', None))
+            terms = note_terms(keywords.title, keywords.keywords, keywords.technical_terms)
+            for token in keyword_tokens(page_name(keywords.file_name).replace('/', ' ')):
+                terms[token] = TITLE_WEIGHT
+            yield keywords.file_name, terms, domain, level
+
+
+def _graph_features(graph_index: GraphIndex, graph_pages: str,
+                    skip=()) -> Iterator[Tuple[str, Dict[str, float], str, int]]:
+    """
+    (page title, weighted terms, domain, level) of every existing page, from
+    the graph index, or read from graph_pages without one.
+    """
+    if graph_index is None:
+        if graph_pages:
+            yield from iter_graph_pages(graph_pages, skip)
+        return
+    for page in graph_index.pages():
+        if page.title in skip:
+            continue
+        domain, level = tag_features(page.tags)
+        yield page.title, page.terms, domain, level
+
+
+def _resolve_link(name: str, index: ConnectionIndex, graph_index: GraphIndex = None) -> str:
+    """
+    Page a See Also neighbour links to: a batch note, or the current title of
+    an existing page ('' if the page is gone since it was indexed).
+    """
+    if graph_index is None:
+        return name
+    doc = index.doc_id(name)
+    if doc is not None and graph_index.find(name) is None:
+        return index.names[doc]
+    return graph_index.resolve(name) or ''
+
+
 def detect_layer3_connections(source_dir: Path, graph_structure: str = None,
-                             output_dir: Path = None) -> Dict:
+                             output_dir: Path = None, store: NoteStore = None,
+                             graph_pages: str = None, top_k: int = DEFAULT_TOP_K,
+                             min_score: float = DEFAULT_MIN_SCORE,
+                             max_document_share: float = DEFAULT_MAX_DOCUMENT_SHARE,
+                             batch_size: int = 1000, graph_index: GraphIndex = None,
+                             graph_index_dir: str = None,
+                             ann_index: AnnIndex = None,
+                             see_also_top_k: int = 5, see_also_min_similarity: float = 0.2) -> Dict:
     """
     Detect potential Layer 3 connections for each file.
     
+    Batch notes and the pages of the existing graph go into one inverted
+    index (see connection_index); each note gets the best scored pages as
+    prerequisite, enabled and See Also candidates. With an ann_index, the
+    batch notes (and graph pages it does not hold yet) are added to it and
+    See Also lists its nearest neighbours instead.
+    
     Args:
-        source_dir: Directory with markdown files
+        source_dir: Directory with the Stage 3 reports (content-keywords.csv,
+            tags-mapped.csv) and markdown files
         graph_structure: Path to existing graph structure map
         output_dir: Output directory for candidates
+        store: Read notes from this note store instead of source_dir
+        graph_pages: Pages directory of the existing Logseq graph, read
+            directly when there is no graph index
+        top_k: Candidates per section
+        min_score: Minimum similarity of a candidate
+        max_document_share: Terms in more notes than this share are not
+            indexed
+        batch_size: Report rows read and candidate rows written per chunk
+        graph_index: Index of the existing graph (pages, aliases, terms)
+        graph_index_dir: Graph index directory (see graph_index), opened
+            when graph_index is not given
+        ann_index: Persistent nearest-neighbour index for See Also
+            (updated here; the caller saves it)
+        see_also_top_k: Nearest neighbours listed under See Also
+        see_also_min_similarity: Minimum cosine similarity of a neighbour
     
     Returns:
         Dictionary with detection statistics
     """
     logger.info("Detecting Layer 3 connections...")
     
-    candidates_list = []
-    files_processed = 0
+    notes = open_notes(source_dir, store)
+    index = ConnectionIndex()
+    file_names = []
+    ann_names, ann_terms = [], []
     
-    for md_file in source_dir.glob("*.md"):
-        try:
-            with open(md_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            candidates = {
-                'file_name': md_file.name,
-                'potential_prerequisites': [],
-                'potential_enables': [],
-                'potential_project_connections': [],
-                'potential_goal_connections': [],
-                'confidence': 'medium'
-            }
-            
-            # Look for prerequisite keywords
-            if any(word in content.lower() for word in ['prerequisite', 'requires', 'must', 'before']):
-                candidates['confidence'] = 'high'
-            
-            # Look for enable keywords
-            if any(word in content.lower() for word in ['enables', 'allows', 'foundation', 'basis']):
-                candidates['potential_enables'].append('placeholder')
-                candidates['confidence'] = 'high'
-            
-            candidates_list.append(candidates)
-            files_processed += 1
-            
-        except Exception as e:
-            logger.warning(f"Error detecting connections in {md_file.name}: {str(e)}")
+    for file_name, terms, domain, level in _batch_features(Path(source_dir), notes, batch_size):
+        index.add(page_name(file_name), terms, domain, level)
+        file_names.append(file_name)
+        if ann_index is not None:
+            ann_names.append(page_name(file_name))
+            ann_terms.append(terms)
     
-    # Save results
-    if output_dir:
-        df = pd.DataFrame(candidates_list)
-        df.to_csv(output_dir / "layer3-candidates.csv", index=False)
+    if graph_index is None and graph_index_dir and Path(graph_index_dir).expanduser().is_dir():
+        graph_index = GraphIndex(graph_index_dir)
+    pages_added = 0
+    for name, terms, domain, level in _graph_features(graph_index, graph_pages, skip=index):
+        index.add(name, terms, domain, level)
+        pages_added += 1
+        if ann_index is not None and (name not in ann_index or
+                                      (graph_index is not None and name in graph_index.changed)):
+            ann_names.append(name)
+            ann_terms.append(terms)
+    logger.info(f"Connection index: {len(file_names)} batch notes, {pages_added} graph pages")
+    
+    if ann_index is not None:
+        ann_index.update(ann_names, ann_terms)
+        del ann_names, ann_terms
+        logger.info(f"See Also index: {len(ann_index)} notes")
+    
+    files_processed = 0
+    connections_found = 0
+    for first in range(0, len(file_names), batch_size):
+        chunk = index.connections(file_names[first:first + batch_size], top_k, min_score,
+                                  max_document_share)
+        if ann_index is not None:
+            neighbours = ann_index.query([page_name(connections.file_name) for connections in chunk],
+                                         see_also_top_k + 2 * top_k, see_also_min_similarity)
+            for connections, similar in zip(chunk, neighbours):
+                linked = set(connections.prerequisites) | set(connections.enables)
+                similar = [_resolve_link(name, index, graph_index) for name, _ in similar]
+                connections.see_also = [name for name in dict.fromkeys(similar)
+                                        if name and name not in linked][:see_also_top_k]
+                if connections.see_also and connections.confidence == 'low':
+                    connections.confidence = 'medium'
+        files_processed += len(chunk)
+        connections_found += sum(connections.count() for connections in chunk)
+        
+        # Save results
+        if output_dir:
+            write_report([connections.to_row() for connections in chunk],
+                         output_dir / "layer3-candidates.csv", append=first > 0)
+    
+    if output_dir and not file_names:
+        write_report([], output_dir / "layer3-candidates.csv")
     
     logger.info(f"Connection detection complete: {files_processed} files analyzed")
     
     return {
         'files_analyzed': files_processed,
-        'connections_found': sum(len(c.get('potential_prerequisites', [])) + 
-                                len(c.get('potential_enables', []))
-                                for c in candidates_list)
+        'connections_found': connections_found
     }
 
 
-def build_layer3_placeholders(source_dir: Path, candidates_file: Path,
-                             output_dir: Path = None) -> Dict:
-    """
-    Build Layer 3 placeholder sections for all files.
-    
-    Args:
-        source_dir: Directory with Layer 2 files
-        candidates_file: CSV file with connection candidates
-        output_dir: Output directory
-    
-    Returns:
-        Dictionary with processing statistics
-    """
-    logger.info("Building Layer 3 placeholders...")
-    
-    candidates_df = pd.read_csv(candidates_file)
-    files_processed = 0
-    
-    for _, row in candidates_df.iterrows():
-        file_path = source_dir / row['file_name']
-        
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # Find where to insert placeholders (after tags, before main content)
-            tags_marker = content.find('## Tags\n')
-            if tags_marker == -1:
-                # No tags section, insert after frontmatter
-                if content.startswith('---'):
-                    tags_marker = content.find('\n---\n') + 5
-                else:
-                    tags_marker = 0
-            else:
-                # Skip past tags section to next heading
-                next_heading = content.find('\n## ', tags_marker + 8)
-                if next_heading == -1:
-                    next_heading = content.find('\n# ', tags_marker + 8)
-                tags_marker = next_heading if next_heading != -1 else len(content)
-            
-            # Build placeholder sections
-            placeholder_section = """
+LAYER3_PLACEHOLDERS = """
 ## Prerequisites
 - [ ] [[]]  # Will you populate these?
 - [ ] [[]]
@@ -140,54 +218,141 @@ Connection candidates for your consideration:
 - [[]]  # Related topics from similar content
 
 """
-            
-            # Insert placeholders
-            new_content = (content[:tags_marker] + placeholder_section + 
-                          content[tags_marker:])
-            
-            # Write back
-            output_path = output_dir / row['file_name'] if output_dir else file_path
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(new_content)
-            
-            files_processed += 1
-            
-        except Exception as e:
-            logger.error(f"Error building placeholders for {row['file_name']}: {str(e)}")
+
+
+def _link_lines(pages: List[str], empty: List[str], checkbox: bool = True) -> List[str]:
+    """Candidate links of a section, or its empty placeholder lines."""
+    if not pages:
+        return empty
+    prefix = "- [ ] " if checkbox else "- "
+    return [f"{prefix}[[{page}]]" for page in pages]
+
+
+def layer3_sections(connections: NoteConnections = None) -> str:
+    """
+    Layer 3 sections, with candidate links where connections has them.
+    
+    Args:
+        connections: Task 4.1 candidates for the note
+    
+    Returns:
+        Markdown for the Layer 3 sections
+    """
+    if connections is None or not connections.count():
+        return LAYER3_PLACEHOLDERS
+    
+    lines = ["", "## Prerequisites"]
+    lines += _link_lines(connections.prerequisites,
+                         ["- [ ] [[]]  # Will you populate these?", "- [ ] [[]]"])
+    lines += ["", "## Enables"]
+    lines += _link_lines(connections.enables,
+                         ["- [ ] [[]]  # Concepts this material helps you learn", "- [ ] [[]]"])
+    lines += ["", "## Project Connections", "- [ ] [[]]  # Relevant projects or applications"]
+    lines += ["", "## Goal Connections", "- [ ] [[]]  # Career goals this supports"]
+    lines += ["", "## See Also", "Connection candidates for your consideration:"]
+    lines += _link_lines(connections.see_also,
+                         ["- [[]]  # Related topics from similar content"], checkbox=False)
+    return "\n".join(lines) + "\n\n"
+
+
+def apply_layer3_to_content(content: str, connections: NoteConnections = None) -> str:
+    """
+    Insert the Layer 3 placeholder sections after the tags section.
+    
+    Args:
+        content: Markdown file content
+        connections: Candidate links to fill the sections with
+    
+    Returns:
+        Content with placeholder sections
+    """
+    # Find where to insert placeholders (after tags, before main content)
+    tags_marker = content.find('## Tags\n')
+    if tags_marker == -1:
+        # No tags section, insert after frontmatter
+        tags_marker = frontmatter_end(content)
+    else:
+        # Skip past tags section to next heading
+        next_heading = content.find('\n## ', tags_marker + 8)
+        if next_heading == -1:
+            next_heading = content.find('\n# ', tags_marker + 8)
+        tags_marker = next_heading if next_heading != -1 else len(content)
+    
+    # Insert placeholders
+    return content[:tags_marker] + layer3_sections(connections) + content[tags_marker:]
+
+
+def build_layer3_placeholders(source_dir: Path, candidates_file: Path,
+                             output_dir: Path = None, store: NoteStore = None,
+                             batch_size: int = 1000) -> Dict:
+    """
+    Build Layer 3 placeholder sections for all files.
+    
+    Args:
+        source_dir: Directory with Layer 2 files
+        candidates_file: CSV file with connection candidates
+        output_dir: Output directory
+        store: Edit the notes in this note store instead of reading
+            source_dir and writing output_dir
+        batch_size: Candidate rows read per chunk
+    
+    Returns:
+        Dictionary with processing statistics
+    """
+    logger.info("Building Layer 3 placeholders...")
+    
+    notes = open_notes(source_dir, store)
+    target = store if store is not None else DirectoryNotes(output_dir or source_dir)
+    files_processed = 0
+    total = 0
+    
+    for rows in iter_report(candidates_file, batch_size):
+        for row in rows:
+            total += 1
+            connections = NoteConnections.from_row(row)
+            try:
+                content = notes.read(connections.file_name)
+                target.write(connections.file_name, apply_layer3_to_content(content, connections))
+                files_processed += 1
+                
+            except Exception as e:
+                logger.error(f"Error building placeholders for {connections.file_name}: {str(e)}")
     
     logger.info(f"Layer 3 placeholders created for {files_processed} files")
     
     return {
         'files_processed': files_processed,
-        'total': len(candidates_df)
+        'total': total
     }
 
 
-def validate_layer3(source_dir: Path, output_dir: Path = None) -> Dict:
+def validate_layer3(source_dir: Path, output_dir: Path = None,
+                    store: NoteStore = None) -> Dict:
     """
     Validate Layer 3 placeholder structure in all files.
     
     Args:
         source_dir: Directory with files
         output_dir: Output directory for results
+        store: Read notes from this note store instead of source_dir
     
     Returns:
         Dictionary with validation statistics
     """
     logger.info("Validating Layer 3 structure...")
     
+    notes = open_notes(source_dir, store)
     files_checked = 0
     files_passed = 0
     validation_issues = []
     
     required_sections = ['Prerequisites', 'Enables', 'Project Connections', 'Goal Connections']
     
-    for md_file in source_dir.glob("*.md"):
+    for name in notes.names():
         files_checked += 1
         
         try:
-            with open(md_file, 'r', encoding='utf-8') as f:
-                content = f.read()
+            content = notes.read(name)
             
             missing_sections = []
             for section in required_sections:
@@ -203,14 +368,14 @@ def validate_layer3(source_dir: Path, output_dir: Path = None) -> Dict:
                 issues = f"Missing sections: {'; '.join(missing_sections)}"
             
             validation_issues.append({
-                'file': md_file.name,
+                'file': name,
                 'status': status,
                 'issues': issues
             })
             
         except Exception as e:
             validation_issues.append({
-                'file': md_file.name,
+                'file': name,
                 'status': 'ERROR',
                 'issues': str(e)
             })
@@ -13,63 +13,64 @@ import re
 from pathlib import Path
 from typing import Dict, List
 import pandas as pd
-import yaml
 import logging
 from datetime import datetime
 
+from frontmatter import split_frontmatter, parse_frontmatter
+from frontmatter_schema import FrontmatterValidator, default_validator, read_frontmatter
+from connection_index import page_name
+from graph_index import GraphIndex
+from note_store import NoteStore, open_notes
+from tokenizer import tokenize
+
 logger = logging.getLogger(__name__)
 
 
-def validate_file_integrity(source_dir: Path, output_dir: Path = None) -> Dict:
+def validate_file_integrity(source_dir: Path, output_dir: Path = None,
+                            validator: FrontmatterValidator = None,
+                            max_file_size_mb: float = 5,
+                            store: NoteStore = None) -> Dict:
     """
     Validate integrity of all processed files.
     
     Args:
         source_dir: Directory with markdown files to validate
         output_dir: Output directory for results
+        validator: Compiled Layer 1 validator (defaults to the bundled schema)
+        max_file_size_mb: Files larger than this fail
+        store: Read notes from this note store instead of source_dir
     
     Returns:
         Dictionary with validation statistics
     """
     logger.info("Running file integrity validation...")
     
+    validator = validator or default_validator()
+    notes = open_notes(source_dir, store)
     files_checked = 0
-    files_passed = 0
     validation_results = []
+    parsed = []
     
-    for md_file in source_dir.glob("*.md"):
+    for name in notes.names():
         files_checked += 1
         issues = []
         
         try:
-            with open(md_file, 'r', encoding='utf-8') as f:
-                content = f.read()
+            content = notes.read(name)
             
             # Check readable
             if not content:
                 issues.append("Empty file")
             
-            # Check frontmatter
-            if content.startswith('---'):
-                end_marker = content.find('\n---\n')
-                if end_marker == -1:
-                    issues.append("Unclosed frontmatter")
-                else:
-                    yaml_str = content[4:end_marker]
-                    try:
-                        yaml.safe_load(yaml_str)
-                    except:
-                        issues.append("Invalid YAML frontmatter")
-            else:
-                issues.append("No frontmatter found")
+            # Check frontmatter (Layer 1 fields are validated as a batch below)
+            frontmatter_dict, frontmatter_issue = read_frontmatter(content)
+            if frontmatter_issue:
+                issues.append(frontmatter_issue)
             
             # Check tags section
             if '## Tags' not in content:
                 issues.append("No tags section")
             
-            # Check UTF-8
-            md_file.read_text(encoding='utf-8')
-            
             # Check Layer 3 placeholders
             required_sections = ['Prerequisites', 'Enables', 'Project Connections', 'Goal Connections']
             missing = [s for s in required_sections if f"## {s}" not in content]
@@ -77,31 +78,46 @@ def validate_file_integrity(source_dir: Path, output_dir: Path = None) -> Dict:
                 issues.append(f"Missing Layer 3 sections: {', '.join(missing)}")
             
             # Check size
-            size_mb = md_file.stat().st_size / (1024 * 1024)
-            if size_mb > 5:
+            size_bytes = notes.size(name)
+            size_mb = size_bytes / (1024 * 1024)
+            if size_mb > max_file_size_mb:
                 issues.append(f"File too large: {size_mb:.2f}MB")
             
-            if not issues:
-                files_passed += 1
-                status = 'PASS'
-            else:
-                status = 'FAIL'
-            
-            validation_results.append({
-                'file': md_file.name,
-                'status': status,
-                'size_kb': md_file.stat().st_size / 1024,
-                'issues': '; '.join(issues) if issues else None
-            })
+            row = {
+                'file': name,
+                'status': None,
+                'size_kb': size_bytes / 1024,
+                'issues': issues
+            }
+            validation_results.append(row)
+            if frontmatter_dict is not None:
+                parsed.append((row, frontmatter_dict))
             
         except Exception as e:
             validation_results.append({
-                'file': md_file.name,
+                'file': name,
                 'status': 'ERROR',
                 'size_kb': 0,
                 'issues': str(e)
             })
     
+    # Layer 1 structure, validated for the whole batch at once
+    batch_issues = validator.validate_batch(frontmatter_dict for _, frontmatter_dict in parsed)
+    for (row, _), issues in zip(parsed, batch_issues):
+        row['issues'].extend(issues)
+    
+    files_passed = 0
+    for row in validation_results:
+        if row['status'] == 'ERROR':
+            continue
+        if row['issues']:
+            row['status'] = 'FAIL'
+            row['issues'] = '; '.join(row['issues'])
+        else:
+            row['status'] = 'PASS'
+            row['issues'] = None
+            files_passed += 1
+    
     # Save results
     if output_dir:
         pd.DataFrame(validation_results).to_csv(
@@ -117,48 +133,51 @@ def validate_file_integrity(source_dir: Path, output_dir: Path = None) -> Dict:
     }
 
 
-def validate_batch_consistency(source_dir: Path, output_dir: Path = None) -> Dict:
+def validate_batch_consistency(source_dir: Path, output_dir: Path = None,
+                               store: NoteStore = None, graph_index: GraphIndex = None) -> Dict:
     """
     Check consistency across entire batch of files.
     
     Args:
         source_dir: Directory with files
         output_dir: Output directory for results
+        store: Read notes from this note store instead of source_dir
+        graph_index: Index of the existing graph; notes whose page name is
+            already a page title or alias there are reported as collisions
     
     Returns:
         Dictionary with consistency check results
     """
     logger.info("Running batch consistency check...")
     
+    notes = open_notes(source_dir, store)
+    note_names = notes.names()
     consistency_checks = []
     files_by_name = {}
     import_batches = set()
     import_dates = set()
     sources = set()
     
-    for md_file in source_dir.glob("*.md"):
+    for name in note_names:
         # Check for duplicates
-        if md_file.name in files_by_name:
+        if name in files_by_name:
             consistency_checks.append({
                 'check': 'Duplicate file names',
                 'status': 'FAIL',
-                'details': f"Duplicate: {md_file.name}"
+                'details': f"Duplicate: {name}"
             })
-        files_by_name[md_file.name] = md_file
+        files_by_name[name] = name
         
         # Extract batch info from frontmatter
         try:
-            with open(md_file, 'r', encoding='utf-8') as f:
-                content = f.read()
+            content = notes.read(name)
             
-            if content.startswith('---'):
-                end_marker = content.find('\n---\n')
-                if end_marker != -1:
-                    yaml_str = content[4:end_marker]
-                    metadata = yaml.safe_load(yaml_str) or {}
-                    import_batches.add(metadata.get('import-batch', 'unknown'))
-                    import_dates.add(metadata.get('import-date', 'unknown'))
-                    sources.add(metadata.get('source', 'unknown'))
+            yaml_str, _ = split_frontmatter(content)
+            if yaml_str is not None:
+                metadata = parse_frontmatter(yaml_str) or {}
+                import_batches.add(metadata.get('import-batch', 'unknown'))
+                import_dates.add(metadata.get('import-date', 'unknown'))
+                sources.add(metadata.get('source', 'unknown'))
         except:
             pass
     
@@ -167,7 +186,7 @@ def validate_batch_consistency(source_dir: Path, output_dir: Path = None) -> Dic
     
     # Check 1: No duplicate files
     checks_total += 1
-    if len(files_by_name) == len(list(source_dir.glob("*.md"))):
+    if len(files_by_name) == len(note_names):
         consistency_checks.append({
             'check': 'No duplicate files',
             'status': 'PASS',
@@ -210,6 +229,36 @@ def validate_batch_consistency(source_dir: Path, output_dir: Path = None) -> Dic
     })
     checks_passed += 1
     
+    # Check 5: No collisions with pages of the existing graph
+    if graph_index is not None:
+        checks_total += 1
+        collisions = []
+        for name in note_names:
+            existing = graph_index.find(page_name(name))
+            if existing is not None:
+                collisions.append({
+                    'file': name,
+                    'page': page_name(name),
+                    'existing_file': graph_index.page(existing).file_name,
+                    'existing_title': graph_index.title(existing)
+                })
+        if not collisions:
+            consistency_checks.append({
+                'check': 'No collisions with existing pages',
+                'status': 'PASS',
+                'details': f"{len(note_names)} names checked against {len(graph_index)} pages"
+            })
+            checks_passed += 1
+        else:
+            consistency_checks.append({
+                'check': 'No collisions with existing pages',
+                'status': 'FAIL',
+                'details': f"{len(collisions)} collisions: "
+                           f"{', '.join(c['file'] for c in collisions[:5])}"
+            })
+            if output_dir:
+                pd.DataFrame(collisions).to_csv(output_dir / "page-collisions.csv", index=False)
+    
     # Save results
     if output_dir:
         pd.DataFrame(consistency_checks).to_csv(
@@ -225,19 +274,23 @@ def validate_batch_consistency(source_dir: Path, output_dir: Path = None) -> Dic
     }
 
 
-def analyze_tag_coverage(source_dir: Path, output_dir: Path = None) -> Dict:
+def analyze_tag_coverage(source_dir: Path, output_dir: Path = None,
+                         store: NoteStore = None) -> Dict:
     """
     Analyze tag coverage and identify anomalies.
     
     Args:
         source_dir: Directory with files
         output_dir: Output directory for results
+        store: Read notes from this note store instead of source_dir
     
     Returns:
         Dictionary with tag statistics
     """
     logger.info("Analyzing tag coverage...")
     
+    notes = open_notes(source_dir, store)
+    
     tag_stats = {
         'total_files': 0,
         'files_with_tags': 0,
@@ -249,39 +302,30 @@ def analyze_tag_coverage(source_dir: Path, output_dir: Path = None) -> Dict:
         'anomalies': []
     }
     
-    for md_file in source_dir.glob("*.md"):
+    for name in notes.names():
         tag_stats['total_files'] += 1
         
         try:
-            with open(md_file, 'r', encoding='utf-8') as f:
-                content = f.read()
+            content = notes.read(name)
             
             # Extract tags section
-            tags_start = content.find('## Tags\n')
-            if tags_start == -1:
+            tags = tokenize(content).section_tags('Tags')
+            if tags is None:
                 tag_stats['anomalies'].append({
-                    'file': md_file.name,
+                    'file': name,
                     'issue': 'No tags section'
                 })
                 continue
             
-            tags_start += len('## Tags\n')
-            tags_end = content.find('\n## ', tags_start)
-            if tags_end == -1:
-                tags_end = len(content)
-            
-            tags_text = content[tags_start:tags_end]
-            tags = re.findall(r'#[\w\-/]+(?:::\w+)?', tags_text)
-            
             if not tags:
                 tag_stats['anomalies'].append({
-                    'file': md_file.name,
+                    'file': name,
                     'issue': 'No tags found in tags section'
                 })
                 continue
             
             tag_stats['files_with_tags'] += 1
-            tag_stats['tag_counts'][md_file.name] = len(tags)
+            tag_stats['tag_counts'][name] = len(tags)
             
             # Categorize tags
             for tag in tags:
@@ -300,18 +344,18 @@ def analyze_tag_coverage(source_dir: Path, output_dir: Path = None) -> Dict:
             # Check for anomalies
             if len(tags) > 15:
                 tag_stats['anomalies'].append({
-                    'file': md_file.name,
+                    'file': name,
                     'issue': f'Over-tagged: {len(tags)} tags'
                 })
             
             if len(tags) < 2:
                 tag_stats['anomalies'].append({
-                    'file': md_file.name,
+                    'file': name,
                     'issue': f'Under-tagged: {len(tags)} tags'
                 })
         
         except Exception as e:
-            logger.warning(f"Error analyzing tags in {md_file.name}: {str(e)}")
+            logger.warning(f"Error analyzing tags in {name}: {str(e)}")
     
     # Save results
     if output_dir:
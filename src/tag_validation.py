@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Layer 2 tag format validation.
+
+A TagValidator is compiled once from config.json's 'validation' section
+(valid_proficiency_levels) and schemas/tag-schema.json (the valid_levels /
+valid_statuses of each dimension). validate_batch explodes every file's tags
+into one column, interns the unique tags, checks each unique tag once and
+joins the issues back per file: most tags (#quality/unverified,
+#source/lighthouse_labs, the connection placeholders) repeat in every file.
+
+Used by Stage 3 (validate_tags).
+"""
+
+import json
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+import numpy as np
+import pandas as pd
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCHEMA_PATH = Path(__file__).parent / 'schemas' / 'tag-schema.json'
+
+# Levels accepted before per-dimension rules existed; used for '::' tags of
+# dimensions the schema gives no levels for
+DEFAULT_LEVELS = ['novice', 'beginner', 'intermediate', 'competent', 'expert', 'gap', 'strength', 'ready']
+
+TAG_CHARACTERS = re.compile(r'[a-z0-9/_\-:]+')
+
+_LEVEL_KEYS = ('valid_levels', 'valid_statuses')
+
+
+class TagValidator:
+    """Precompiled tag format checks."""
+
+    def __init__(self, levels: Dict[str, Iterable[str]] = None,
+                 default_levels: Iterable[str] = None):
+        """
+        Args:
+            levels: Dimension ('activity', 'proficiency', ...) -> levels
+                allowed after '::'
+            default_levels: Levels allowed for other dimensions
+        """
+        self.levels = {dimension: frozenset(values) for dimension, values in (levels or {}).items()}
+        self.default_levels = frozenset(default_levels if default_levels is not None else DEFAULT_LEVELS)
+
+    @classmethod
+    def from_config(cls, validation_config: Dict = None, tag_schema=None) -> 'TagValidator':
+        """
+        Build a validator from config.json's 'validation' section and the tag
+        schema (a path or an already loaded dict).
+        """
+        validation_config = validation_config or {}
+        schema = tag_schema if isinstance(tag_schema, dict) else {}
+        if not isinstance(tag_schema, dict):
+            path = Path(tag_schema) if tag_schema else DEFAULT_SCHEMA_PATH
+            if path.exists():
+                with open(path, 'r', encoding='utf-8') as f:
+                    schema = json.load(f)
+            else:
+                logger.warning(f"Tag schema not found: {path}; using default tag levels")
+
+        levels = {}
+        for dimension, spec in schema.get('dimensions', {}).items():
+            for key in _LEVEL_KEYS:
+                if key in spec:
+                    levels.setdefault(dimension, set()).update(spec[key])
+        if validation_config.get('valid_proficiency_levels'):
+            levels['proficiency'] = set(validation_config['valid_proficiency_levels'])
+
+        return cls(levels)
+
+    def validate(self, tag: str) -> str:
+        """
+        Check one tag.
+
+        Returns:
+            Error message, or '' if the tag is valid
+        """
+        if not tag.startswith('#'):
+            return "Tag must start with #"
+
+        tag_content = tag[1:]
+        if not TAG_CHARACTERS.fullmatch(tag_content):
+            return "Tag contains invalid characters"
+
+        if '::' in tag_content:
+            parts = tag_content.split('::')
+            if len(parts) != 2:
+                return "Invalid level specification (should be tag::level)"
+            dimension = parts[0].split('/', 1)[0]
+            if parts[1] not in self.levels.get(dimension, self.default_levels):
+                return f"Invalid level: {parts[1]}"
+
+        return ""
+
+    def validate_batch(self, tag_lists: List[List[str]]) -> List[List[str]]:
+        """
+        Validate the tags of many files.
+
+        Args:
+            tag_lists: Tags of each file
+
+        Returns:
+            List of issues ('tag: error') for each file, in input order
+        """
+        issues: List[List[str]] = [[] for _ in tag_lists]
+        exploded = pd.Series(list(tag_lists), dtype=object).explode()
+        exploded = exploded[exploded.notna() & (exploded != '')]
+        if exploded.empty:
+            return issues
+
+        codes, unique_tags = pd.factorize(exploded)
+        errors = np.array([self.validate(tag) for tag in unique_tags], dtype=object)[codes]
+        failed = errors != ''
+        for file_idx, tag, error in zip(exploded.index[failed], exploded.values[failed], errors[failed]):
+            issues[file_idx].append(f"{tag}: {error}")
+        return issues
+
+
+_default_validator = None
+
+
+def default_validator() -> TagValidator:
+    """Validator with the bundled tag schema."""
+    global _default_validator
+    if _default_validator is None:
+        _default_validator = TagValidator.from_config()
+    return _default_validator
+
+
+def validate_tag_format(tag: str, validator: TagValidator = None) -> Tuple[bool, str]:
+    """
+    Validate a single tag format.
+
+    Returns:
+        Tuple of (is_valid, error_message)
+    """
+    error = (validator or default_validator()).validate(tag)
+    return error == "", error
+
+
+if __name__ == '__main__':
+    validator = TagValidator.from_config({'valid_proficiency_levels': ['beginner', 'gap']})
+    files = [
+        ['#activity/execute::hands-on', '#proficiency/topic::beginner', '#quality/unverified'],
+        [],
+        ['#proficiency/topic::expert', 'domain/x', '#Domain/X', '#a::b::c', '#quality/unverified'],
+        ['#readiness/analyst::ready', '#custom/thing::ready', '#custom/thing::hands-on'],
+    ]
+    issues = validator.validate_batch(files)
+    assert issues == [
+        [],
+        [],
+        ['#proficiency/topic::expert: Invalid level: expert', 'domain/x: Tag must start with #',
+         '#Domain/X: Tag contains invalid characters',
+         '#a::b::c: Invalid level specification (should be tag::level)'],
+        ['#custom/thing::hands-on: Invalid level: hands-on'],
+    ]
+    assert issues == [[f"{t}: {e}" for t in tags for e in [validator.validate(t)] if e] for tags in files]
+    print("tag validation: ok")
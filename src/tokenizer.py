@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+Shared markdown tokenizer.
+
+Spelling (Stage 1), keyword extraction (Stage 3) and tag coverage (Stage 5)
+all need the words, headings or tags of the same notes. tokenize() scans a
+document once, line by line, and records:
+
+- the frontmatter region and fenced code block regions
+- prose lines (outside frontmatter and code)
+- headings (level, text, line, offset)
+- word tokens: lowercase letter runs, hyphenated compounds kept whole
+- tag tokens (#domain/networking, #proficiency/topic::beginner, ...)
+
+Token tuples carry their span in the original content and their 1-based
+line number. Results are cached by content hash, so every stage that looks
+at the same text reuses one scan. A cached document takes roughly 30 times
+the memory of its text, so the cache is capped by the total length of the
+cached texts and very long documents are not cached at all; the orchestrator
+clears it between stages. Cached documents are shared between callers and
+must not be mutated.
+
+scan_outline() is the lighter companion for the title / first paragraph /
+heading outline: a forward scan with str.find jumps and no backtracking
+patterns, which can stop as soon as enough has been found.
+"""
+
+import hashlib
+import re
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from frontmatter import frontmatter_end
+
+logger = logging.getLogger(__name__)
+
+WORD_PATTERN = re.compile(r'\b[a-z]+(?:-[a-z]+)*\b')
+_WORD_PATTERN_ANY_CASE = re.compile(WORD_PATTERN.pattern, re.IGNORECASE)
+TAG_PATTERN = re.compile(r'#[\w\-/]+(?:::[\w\-]+)?')
+HEADING_PATTERN = re.compile(r'(#{1,6})\s+(.+)$')
+CODE_FENCE = '```'
+_NON_BLANK = re.compile(r'\S')
+
+# Total characters of the documents kept in the cache (~60 MB of tokens)
+TOKEN_CACHE_MAX_CHARS = 2 * 1024 * 1024
+# Documents longer than this are tokenized but never cached
+TOKEN_CACHE_MAX_DOCUMENT = 256 * 1024
+
+_token_cache: 'OrderedDict[bytes, Tuple[TokenizedDocument, int]]' = OrderedDict()
+_token_cache_chars = 0
+
+
+class TokenizedDocument:
+    """Result of one tokenizer pass over a document."""
+
+    __slots__ = ('frontmatter', 'code_blocks', 'prose_lines', 'headings', 'words', 'tags')
+
+    def __init__(self):
+        # (start, end) offsets, or None without a closed frontmatter block
+        self.frontmatter: Optional[Tuple[int, int]] = None
+        # (start, end) offsets of fenced code blocks, fences included
+        self.code_blocks: List[Tuple[int, int]] = []
+        # (line number, line text)
+        self.prose_lines: List[Tuple[int, str]] = []
+        # (level, text, line number, offset)
+        self.headings: List[Tuple[int, str, int, int]] = []
+        # (lowercase text, start, end, line number)
+        self.words: List[Tuple[str, int, int, int]] = []
+        # (tag, start, end, line number)
+        self.tags: List[Tuple[str, int, int, int]] = []
+
+    def title(self) -> Optional[str]:
+        """Text of the first level-1 heading."""
+        for level, text, _, _ in self.headings:
+            if level == 1:
+                return text
+        return None
+
+    def heading_texts(self, max_level: int = 3) -> List[str]:
+        """Texts of headings up to max_level, in document order."""
+        return [text for level, text, _, _ in self.headings if level <= max_level]
+
+    def words_by_line(self) -> Dict[int, List[str]]:
+        """Simple words (compounds split at hyphens) per prose line."""
+        by_line: Dict[int, List[str]] = {}
+        for text, _, _, line in self.words:
+            by_line.setdefault(line, []).extend(text.split('-'))
+        return by_line
+
+    def section_tags(self, heading: str) -> Optional[List[str]]:
+        """
+        Tags under the level-2 heading with the given text, up to the next
+        heading of level 1 or 2.
+
+        Returns:
+            List of tags, or None if there is no such section
+        """
+        start = end = None
+        for level, text, _, offset in self.headings:
+            if start is None:
+                if level == 2 and text.strip() == heading:
+                    start = offset
+            elif level <= 2:
+                end = offset
+                break
+        if start is None:
+            return None
+        return [tag for tag, tag_start, _, _ in self.tags
+                if tag_start > start and (end is None or tag_start < end)]
+
+
+def _scan(content: str) -> TokenizedDocument:
+    doc = TokenizedDocument()
+    body_start = frontmatter_end(content)
+    if body_start:
+        doc.frontmatter = (0, body_start)
+
+    offset = 0
+    code_start = None
+    for line_no, line in enumerate(content.split('\n'), 1):
+        line_start = offset
+        offset += len(line) + 1
+
+        if line_start < body_start:
+            continue
+
+        if line.startswith(CODE_FENCE):
+            if code_start is None:
+                code_start = line_start
+            else:
+                doc.code_blocks.append((code_start, min(offset, len(content))))
+                code_start = None
+            continue
+        if code_start is not None:
+            continue
+
+        doc.prose_lines.append((line_no, line))
+
+        if line.startswith('#'):
+            heading = HEADING_PATTERN.match(line)
+            if heading:
+                doc.headings.append((len(heading.group(1)), heading.group(2), line_no, line_start))
+
+        lowered = line.lower()
+        if len(lowered) == len(line):
+            doc.words.extend([(match.group(), line_start + match.start(), line_start + match.end(), line_no)
+                              for match in WORD_PATTERN.finditer(lowered)])
+        else:
+            # Lowercasing changed the length (rare non-ASCII); keep original offsets
+            doc.words.extend([(match.group().lower(), line_start + match.start(),
+                               line_start + match.end(), line_no)
+                              for match in _WORD_PATTERN_ANY_CASE.finditer(line)])
+
+        if '#' in line:
+            for match in TAG_PATTERN.finditer(line):
+                doc.tags.append((match.group(), line_start + match.start(),
+                                 line_start + match.end(), line_no))
+
+    if code_start is not None:
+        doc.code_blocks.append((code_start, len(content)))
+
+    return doc
+
+
+def _next_line_starting(content: str, pos: int, prefixes: Tuple[str, ...]) -> int:
+    """Start of the first line at or after pos (a line start) beginning with a prefix."""
+    if content.startswith(prefixes, pos):
+        return pos
+    found = [content.find('\n' + prefix, pos) for prefix in prefixes]
+    found = [index for index in found if index >= 0]
+    return min(found) + 1 if found else len(content)
+
+
+class NoteOutline:
+    """Title, first paragraph and heading outline of a note."""
+
+    __slots__ = ('title', 'first_para', 'headings')
+
+    def __init__(self):
+        # Text of the first level-1 heading
+        self.title: Optional[str] = None
+        # First run of non-blank, non-heading prose lines
+        self.first_para: str = ''
+        # (level, text) of headings up to the requested level
+        self.headings: List[Tuple[int, str]] = []
+
+
+def scan_outline(content: str, max_level: int = 3, para_chars: int = 200,
+                 max_headings: Optional[int] = None, find_title: bool = True) -> NoteOutline:
+    """
+    Extract a note's outline in one forward pass over its lines.
+
+    Only str.find and an anchored per-line heading match are used, so the
+    cost is linear in the part of the document scanned whatever its shape
+    (no backtracking over long runs without paragraph breaks). Frontmatter
+    and fenced code are skipped as in tokenize().
+
+    Args:
+        content: Note content
+        max_level: Deepest heading level kept in the outline
+        para_chars: The first paragraph is cut to this many characters
+        max_headings: Stop scanning once the title, the first paragraph and
+            this many headings are found (None scans the whole note)
+        find_title: With False, the early stop does not wait for a title
+            (for callers that take it from tokenize())
+
+    Returns:
+        NoteOutline
+    """
+    outline = NoteOutline()
+    para_lines: List[str] = []
+    para_length = 0
+    para_done = False
+    in_code = False
+
+    pos = frontmatter_end(content)
+    length = len(content)
+    while pos < length:
+        # Jump over lines that cannot matter with one C-level search
+        if in_code:
+            pos = _next_line_starting(content, pos, (CODE_FENCE,))
+        elif para_done:
+            pos = _next_line_starting(content, pos, ('#', CODE_FENCE))
+        elif not para_lines:
+            match = _NON_BLANK.search(content, pos)
+            if match is None:
+                break
+            pos = content.rfind('\n', pos, match.start()) + 1 or pos
+        if pos >= length:
+            break
+
+        # Lines are tested in place; only headings and the part of a prose
+        # line that can reach the first paragraph are copied out
+        start = pos
+        end = content.find('\n', pos)
+        if end < 0:
+            end = length
+        pos = end + 1
+
+        if content.startswith(CODE_FENCE, start):
+            in_code = not in_code
+            para_done = para_done or bool(para_lines)
+            continue
+        if in_code:
+            continue
+
+        if content.startswith('#', start):
+            para_done = para_done or bool(para_lines)
+            heading = HEADING_PATTERN.match(content[start:end])
+            if heading:
+                level = len(heading.group(1))
+                if level == 1 and outline.title is None:
+                    outline.title = heading.group(2)
+                if level <= max_level:
+                    outline.headings.append((level, heading.group(2)))
+        elif _NON_BLANK.search(content, start, end) is None:
+            para_done = para_done or bool(para_lines)
+        elif not para_done:
+            para_lines.append(content[start:min(end, start + para_chars - para_length)])
+            para_length += end - start + 1
+            para_done = para_length >= para_chars
+
+        if (para_done and (outline.title is not None or not find_title)
+                and max_headings is not None and len(outline.headings) >= max_headings):
+            break
+
+    outline.first_para = '\n'.join(para_lines)[:para_chars]
+    return outline
+
+
+def content_key(content: str) -> bytes:
+    """Cache key for a document's content."""
+    return hashlib.blake2b(content.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+
+def tokenize(content: str) -> TokenizedDocument:
+    """Tokenize a document, reusing the result for content seen before."""
+    global _token_cache_chars
+    if len(content) > TOKEN_CACHE_MAX_DOCUMENT:
+        return _scan(content)
+
+    key = content_key(content)
+    cached = _token_cache.get(key)
+    if cached is not None:
+        _token_cache.move_to_end(key)
+        return cached[0]
+
+    doc = _scan(content)
+    _token_cache[key] = (doc, len(content))
+    _token_cache_chars += len(content)
+    while _token_cache_chars > TOKEN_CACHE_MAX_CHARS:
+        _, (_, chars) = _token_cache.popitem(last=False)
+        _token_cache_chars -= chars
+    return doc
+
+
+def clear_cache() -> None:
+    """Drop all cached tokenizer results."""
+    global _token_cache_chars
+    _token_cache.clear()
+    _token_cache_chars = 0
+
+
+if __name__ == '__main__':
+    sample = (
+        "---\ntitle: Not Prose\n---\n# Firewall Basics\n\nWell-known rules filter traffic.\n\n"
+        "```bash\n# not a heading\niptables -L\n```\n\n## Tags\n\n#domain/networking #source/test\n\n"
+        "## Notes\n#not-a-tag-section\n"
+    )
+    doc = tokenize(sample)
+    assert doc.frontmatter == (0, sample.index('# Firewall'))
+    assert doc.title() == 'Firewall Basics'
+    assert doc.heading_texts() == ['Firewall Basics', 'Tags', 'Notes']
+    assert [w for w, _, _, _ in doc.words][:4] == ['firewall', 'basics', 'well-known', 'rules']
+    assert all(sample[s:e].lower() == w for w, s, e, _ in doc.words)
+    assert 'iptables' not in {w for w, _, _, _ in doc.words}
+    assert doc.section_tags('Tags') == ['#domain/networking', '#source/test']
+    assert doc.words_by_line()[6] == ['well', 'known', 'rules', 'filter', 'traffic']
+    assert tokenize(sample) is doc
+
+    # The cache is bounded by the length of the cached texts
+    long_note = "word " * (TOKEN_CACHE_MAX_DOCUMENT // 5 + 1)
+    assert tokenize(long_note) is not tokenize(long_note)
+    for i in range(2 * TOKEN_CACHE_MAX_CHARS // 100000):
+        tokenize(f"note {i} " + "x" * 100000)
+    assert _token_cache_chars <= TOKEN_CACHE_MAX_CHARS
+    assert _token_cache_chars == sum(chars for _, chars in _token_cache.values())
+    clear_cache()
+    assert not _token_cache and _token_cache_chars == 0
+    print("tokenizer: ok")
+
+    outline = scan_outline(sample)
+    assert outline.title == doc.title()
+    assert [text for _, text in outline.headings] == doc.heading_texts()
+    assert outline.first_para == 'Well-known rules filter traffic.'
+    assert scan_outline("# T\nLine one\nline two\n\nNext").first_para == 'Line one\nline two'
+    assert scan_outline("x" * 500).first_para == "x" * 200
+    early = scan_outline(sample, max_level=0, max_headings=0)
+    assert early.title == 'Firewall Basics' and early.headings == []
+    untitled = "Intro line.\n\n" + "## H\nmore text\n" * 5
+    assert scan_outline(untitled, max_level=0, max_headings=0, find_title=False).first_para == 'Intro line.'
+
+    # Title and outline agree with the tokenizer on random documents
+    import random
+    rng = random.Random(2)
+    pieces = ['# A', '## B', '### C', '#### D', '#tag', '', '  ', 'text', '```', '```py', '---', 'x: 1']
+    for _ in range(3000):
+        text = '\n'.join(rng.choice(pieces) for _ in range(rng.randint(0, 12)))
+        outline, doc = scan_outline(text), _scan(text)
+        assert outline.title == doc.title(), text
+        assert [t for _, t in outline.headings] == doc.heading_texts(), text
+    print("outline: ok")
+
+    # Regression benchmark: adversarial shapes that made the old
+    # first-paragraph regex (and line-spanning patterns) scan far past the
+    # paragraph. The scanner must stay linear: doubling the input may at
+    # most roughly double the time.
+    import time
+    import timeit
+
+    old_first_para = re.compile(r'\n\n(.+?)(?:\n\n|\n#)', re.DOTALL)
+    adversarial = {
+        'one huge line': lambda n: "# T\n\n" + "word " * n,
+        'no blank lines': lambda n: "# T\n\n" + "a line of text\n" * n,
+        'whitespace-only lines': lambda n: "# T\n\n" + " \n\t\n" * n,
+        'hash runs': lambda n: "# T\n\n" + ("#" * 80 + " x\n") * n,
+        'unclosed fence': lambda n: "# T\n```\n" + "code\n" * n,
+        'heading-only': lambda n: "".join(f"## H{i}\n" for i in range(n)),
+    }
+
+    def best_of(fn, text, repeat=5):
+        """Best time per call, each timing looping until it takes >= 20ms."""
+        timer = timeit.Timer(lambda: fn(text))
+        number = max(1, int(0.02 / max(timer.timeit(1), 1e-9)))
+        return min(timer.repeat(repeat, number)) / number
+
+    for name, make in adversarial.items():
+        small, large = make(100000), make(200000)
+        t_small = best_of(scan_outline, small)
+        t_large = best_of(scan_outline, large)
+        t_regex = best_of(old_first_para.search, large, repeat=1)
+        t_early = best_of(lambda text: scan_outline(text, max_level=0, max_headings=0), large)
+        print(f"{name:22s} {len(large) // 1024:6d}KB  scanner {t_large * 1000:7.1f}ms  "
+              f"(x{t_large / max(t_small, 1e-6):.1f} for 2x input)  early stop {t_early * 1000:6.2f}ms  "
+              f"old regex {t_regex * 1000:7.1f}ms")
+        assert t_large < 3 * t_small, f"{name}: scanner is not linear"